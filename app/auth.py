@@ -1,11 +1,14 @@
 # app/auth.py
 import os
 import time
-import requests
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 
+from .cache import TokenCache
+from .http import http_client  # shared keep-alive client to Supabase Auth, timed as supabase_auth
+from .timing import phase
+
 PROJECT_REF = os.getenv("SUPABASE_PROJECT_REF")  # e.g. lrxyfyzgrkvnoezjfycv
 ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")  # <- HS256 secret
@@ -15,32 +18,37 @@ if not PROJECT_REF:
 
 JWKS_URL = f"https://{PROJECT_REF}.supabase.co/auth/v1/.well-known/jwks.json"
 ISSUER = f"https://{PROJECT_REF}.supabase.co/auth/v1"
+USER_URL = f"https://{PROJECT_REF}.supabase.co/auth/v1/user"
+
+# Tokens we could only verify remotely are re-checked at least this often,
+# so a revoked session stops working within the window.
+REMOTE_VERIFY_TTL = float(os.getenv("AUTH_REMOTE_VERIFY_TTL", "300"))
 
 security = HTTPBearer()
 _cache = {"jwks": None, "fetched_at": 0}
+_tokens = TokenCache(maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")), name="app.auth")
 
 
-def _get_jwks():
+async def _get_jwks():
     now = time.time()
     if not _cache["jwks"] or now - _cache["fetched_at"] > 600:
         headers = {}
         if ANON_KEY:
             headers = {"apikey": ANON_KEY, "Authorization": f"Bearer {ANON_KEY}"}
-        resp = requests.get(JWKS_URL, headers=headers, timeout=10)
+        resp = await http_client().get(JWKS_URL, headers=headers)
         resp.raise_for_status()
         _cache["jwks"] = resp.json()
         _cache["fetched_at"] = now
     return _cache["jwks"]
 
 
-def _fetch_user_id_from_supabase(token: str) -> str:
+async def _fetch_user_id_from_supabase(token: str) -> str:
     """Fallback: ask Supabase who this token belongs to."""
     headers = {
         "Authorization": f"Bearer {token}",
         "apikey": ANON_KEY or "",
     }
-    url = f"https://{PROJECT_REF}.supabase.co/auth/v1/user"
-    r = requests.get(url, headers=headers, timeout=10)
+    r = await http_client().get(USER_URL, headers=headers)
     if r.status_code != 200:
         raise HTTPException(status_code=401, detail="Could not verify token with Supabase")
     data = r.json() or {}
@@ -50,30 +58,29 @@ def _fetch_user_id_from_supabase(token: str) -> str:
     return uid
 
 
-def verify_and_get_user_id(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> str:
-    """
-    Accepts Supabase access tokens signed with:
-      - HS256 (JWT secret)  -> verify with SUPABASE_JWT_SECRET
-      - RS256 (JWKS)        -> verify with JWKS
-    Falls back to /auth/v1/user if needed.
-    """
-    token = credentials.credentials
+def _unverified_exp(token: str):
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
 
+async def _verify(token: str) -> tuple[str, float | None, bool]:
+    """Returns (sub, exp, verified_locally)."""
     # Determine algorithm without verifying signature
     try:
         unverified_header = jwt.get_unverified_header(token)
         alg = unverified_header.get("alg", "")
     except Exception:
         # If header can't be parsed, try fallback to Supabase
-        return _fetch_user_id_from_supabase(token)
+        return await _fetch_user_id_from_supabase(token), None, False
 
     # HS256 path (most Supabase projects)
     if alg.upper() == "HS256":
         if not JWT_SECRET:
             # No secret available — fallback to Supabase
-            return _fetch_user_id_from_supabase(token)
+            return await _fetch_user_id_from_supabase(token), _unverified_exp(token), False
         try:
             claims = jwt.decode(
                 token,
@@ -87,11 +94,11 @@ def verify_and_get_user_id(
         sub = claims.get("sub")
         if not sub:
             raise HTTPException(status_code=401, detail="Token missing subject (sub)")
-        return sub
+        return sub, claims.get("exp"), True
 
     # RS256 path (rare in Supabase)
     if alg.upper() == "RS256":
-        jwks = _get_jwks()
+        jwks = await _get_jwks()
         kid = unverified_header.get("kid")
         key = next((k for k in jwks.get("keys", []) if k.get("kid") == kid), None)
         if not key:
@@ -109,8 +116,32 @@ def verify_and_get_user_id(
         sub = claims.get("sub")
         if not sub:
             raise HTTPException(status_code=401, detail="Token missing subject (sub)")
-        return sub
+        return sub, claims.get("exp"), True
 
     # Unknown/other alg — fallback
-    return _fetch_user_id_from_supabase(token)
+    return await _fetch_user_id_from_supabase(token), _unverified_exp(token), False
+
+
+async def verify_and_get_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> str:
+    """
+    Accepts Supabase access tokens signed with:
+      - HS256 (JWT secret)  -> verify with SUPABASE_JWT_SECRET
+      - RS256 (JWKS)        -> verify with JWKS
+    Falls back to /auth/v1/user if needed.
+
+    Verified tokens are cached (by SHA-256) until their `exp`; remotely
+    verified ones for at most REMOTE_VERIFY_TTL seconds.
+    """
+    token = credentials.credentials
+    sub = _tokens.get(token)
+    if sub is not None:
+        return sub
 
+    started = time.perf_counter()
+    with phase("auth"):
+        sub, exp, local = await _verify(token)
+    _tokens.record_miss(time.perf_counter() - started)
+    _tokens.put(token, sub, exp, max_ttl=None if local else REMOTE_VERIFY_TTL)
+    return sub
@@ -0,0 +1,153 @@
+# app/batch.py
+"""
+POST /batch: several API calls in one round trip.
+
+The body is an ordered list of sub-requests against the existing routes:
+
+    {"requests": [
+        {"id": "c", "method": "GET", "path": "/clients"},
+        {"id": "j", "method": "GET", "path": "/jobs?limit=50", "headers": {"If-None-Match": "\\"…\\""}},
+        {"id": "n", "method": "POST", "path": "/jobs", "body": {"client_id": "…", "title": "…", "price_cents": 100}}
+    ]}
+
+The bearer token is verified once; sub-requests run through the app in
+process with that user attached. Consecutive GETs run concurrently; any
+other method waits for everything before it and runs alone, so writes keep
+their order relative to the reads around them. Each sub-request gets its
+own status, a few headers and its body (JSON inlined as-is; sub-requests
+always answer in JSON, whatever format the batch itself was sent in):
+
+    {"responses": [{"id": "c", "status": 200, "headers": {...}, "body": [...]}, ...]}
+
+A failing sub-request doesn't stop the others. The batch itself is 200
+unless it is malformed, over BATCH_MAX_REQUESTS, or unauthenticated.
+Streaming routes (/events) and nested batches are refused per item.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Request
+from pydantic import BaseModel, Field
+
+from .deps import BATCH_USER, get_user
+from .fastjson import RawJSONResponse, dumps
+
+router = APIRouter(tags=["batch"])
+
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "20"))
+BATCH_TIMEOUT_S = float(os.environ.get("BATCH_TIMEOUT_S", "10"))
+
+REFUSED_PATHS = ("/batch", "/events")
+# response headers worth passing back; the rest describe the outer response
+KEPT_HEADERS = ("content-type", "etag", "cache-control", "x-next-cursor", "location")
+
+
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str = Field(pattern=r"^/")
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+
+class BatchIn(BaseModel):
+    requests: List[SubRequest] = Field(min_length=1, max_length=BATCH_MAX_REQUESTS)
+
+
+Result = Tuple[int, List[Tuple[str, str]], bytes]  # status, kept headers, body
+
+
+def _error(status: int, detail: str) -> Result:
+    return status, [("content-type", "application/json")], dumps({"detail": detail})
+
+
+async def _dispatch(request: Request, user: Dict[str, Any], sub: SubRequest) -> Result:
+    path, _, query = sub.path.partition("?")
+    if path.rstrip("/") in REFUSED_PATHS:
+        return _error(400, f"{path} can't be batched")
+    body = b"" if sub.body is None else dumps(sub.body)
+    headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in sub.headers.items()
+               if k.lower() not in ("authorization", "content-length", "host", "accept-encoding", "accept")]
+    headers += [
+        (b"authorization", request.headers.get("authorization", "").encode("latin-1")),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if body and not any(k == b"content-type" for k, _ in headers):
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        **{k: request.scope[k] for k in ("type", "http_version", "scheme", "server", "client", "root_path", "app")
+           if k in request.scope},
+        "method": sub.method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        BATCH_USER: user,
+    }
+
+    sent = False
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # no disconnect until the sub-request is done
+
+    status, kept, chunks = 500, [], []
+    async def send(message):
+        nonlocal status, kept
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            kept = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])
+                    if k.decode("latin-1").lower() in KEPT_HEADERS]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await asyncio.wait_for(request.app(scope, receive, send), timeout=BATCH_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        return _error(504, "Sub-request timed out")
+    except Exception:
+        # the app's error middleware has already logged it (and maybe sent a 500)
+        if not chunks:
+            return _error(500, "Internal Server Error")
+    return status, kept, b"".join(chunks)
+
+
+def _encode(sub: SubRequest, result: Result) -> bytes:
+    status, headers, body = result
+    head = dumps({"id": sub.id, "status": status, "headers": dict(headers)})
+    is_json = any(k == "content-type" and "json" in v for k, v in headers)
+    if not body:
+        inline = b"null"
+    elif is_json:
+        inline = body  # already JSON; no decode/re-encode
+    else:
+        inline = dumps(body.decode("utf-8", "replace"))
+    return head[:-1] + b',"body":' + inline + b"}"
+
+
+@router.post("/batch")
+async def batch(payload: BatchIn, request: Request, user = Depends(get_user)):
+    results: List[Optional[Result]] = [None] * len(payload.requests)
+    reads: List[int] = []
+
+    async def flush_reads():
+        done = await asyncio.gather(*(_dispatch(request, user, payload.requests[i]) for i in reads))
+        for i, r in zip(reads, done):
+            results[i] = r
+        reads.clear()
+
+    for i, sub in enumerate(payload.requests):
+        if sub.method == "GET":
+            reads.append(i)
+            continue
+        await flush_reads()
+        results[i] = await _dispatch(request, user, sub)
+    await flush_reads()
+
+    parts = [_encode(sub, r) for sub, r in zip(payload.requests, results)]
+    return RawJSONResponse(b'{"responses":[' + b",".join(parts) + b"]}")
@@ -0,0 +1,211 @@
+# app/bulk.py
+"""
+Streaming bulk import.
+
+Request bodies are NDJSON (one JSON object per line) or CSV with a header
+row, parsed as the bytes arrive. Records are validated one by one, grouped
+into fixed-size batches and handed to an `apply(batch)` coroutine, so memory
+is bounded by the batch size, not the upload size. A line (or quoted CSV
+record) longer than BULK_MAX_LINE_BYTES is reported as a row error and
+skipped instead of buffered. The response is a per-batch summary plus the
+first few row-level errors.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Type, Union
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+MAX_LINE_BYTES = int(os.environ.get("BULK_MAX_LINE_BYTES", str(64 * 1024)))  # a job row is well under 1 KB
+
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-seq"}
+CSV_TYPES = {"text/csv", "application/csv"}
+
+
+def _decode(raw: bytes, lineno: int) -> Union[str, ValueError]:
+    try:
+        return raw.decode("utf-8-sig" if lineno == 1 else "utf-8").rstrip("\r")
+    except UnicodeDecodeError as e:
+        return ValueError(f"invalid UTF-8 at byte {e.start}")
+
+
+async def _lines(request: Request) -> AsyncIterator[Tuple[int, Union[str, ValueError]]]:
+    """(line number, text) for each line of the body, decoded incrementally.
+
+    A line that isn't valid UTF-8, or is longer than MAX_LINE_BYTES, comes
+    back as a ValueError, so the import reports it as a line error instead of
+    failing. Each chunk is scanned once: a line spanning many chunks is
+    collected in pieces, not re-split, and an overlong one is dropped up to
+    its newline rather than held.
+    """
+    pieces: List[bytes] = []  # the current line, as received so far
+    size = 0
+    lineno = 0
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            stop = len(chunk) if end == -1 else end
+            size += stop - start
+            if size > MAX_LINE_BYTES:
+                pieces = []
+            elif stop > start:
+                pieces.append(chunk[start:stop])
+            if end == -1:
+                break
+            lineno += 1
+            yield lineno, _line(pieces, size, lineno)
+            pieces, size = [], 0
+            start = end + 1
+    if size:
+        lineno += 1
+        yield lineno, _line(pieces, size, lineno)
+
+
+def _line(pieces: List[bytes], size: int, lineno: int) -> Union[str, ValueError]:
+    if size > MAX_LINE_BYTES:
+        return ValueError(f"line longer than {MAX_LINE_BYTES} bytes")
+    return _decode(b"".join(pieces), lineno)
+
+
+async def _ndjson(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    async for lineno, line in _lines(request):
+        if isinstance(line, ValueError):
+            yield lineno, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield lineno, json.loads(line)
+        except ValueError as e:
+            yield lineno, ValueError(f"invalid JSON: {e}")
+
+
+async def _csv(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    header = None
+    pending: List[str] = []
+    quoted = False  # an odd number of quotes so far: the record goes on
+    size = start = 0
+    async for lineno, line in _lines(request):
+        if isinstance(line, ValueError):
+            # a quoted record it belonged to is dropped with it
+            yield (start if pending else lineno), line
+            pending, quoted = [], False
+            continue
+        if not pending:
+            start, size = lineno, 0
+        pending.append(line)
+        # a quoted field may span lines; wait until the quotes balance
+        if line.count('"') % 2:
+            quoted = not quoted
+        if quoted:
+            size += len(line.encode()) + 1
+            if size > MAX_LINE_BYTES:
+                yield start, ValueError(f"quoted record longer than {MAX_LINE_BYTES} bytes")
+                pending, quoted = [], False
+            continue
+        text = "\n".join(pending)
+        pending = []
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        # empty CSV cells mean "not provided"
+        yield start, {k: (v if v != "" else None) for k, v in zip(header, values)}
+    if pending:
+        yield start, ValueError("unterminated quoted field")
+
+
+def records(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    ctype = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    if ctype in NDJSON_TYPES:
+        return _ndjson(request)
+    if ctype in CSV_TYPES:
+        return _csv(request)
+    raise HTTPException(
+        status_code=415,
+        detail="Send application/x-ndjson or text/csv",
+    )
+
+
+class Report:
+    def __init__(self):
+        self.batches: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self.error_count = 0
+        self.received = 0
+
+    def error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "inserted": sum(b["inserted"] for b in self.batches),
+            "skipped": sum(b["skipped"] for b in self.batches),
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "batches": self.batches,
+        }
+
+
+# apply(batch of (line, model)) -> (inserted, skipped, [(line, error)])
+Apply = Callable[[List[Tuple[int, Any]]], Awaitable[Tuple[int, int, List[Tuple[int, str]]]]]
+
+
+async def run_import(request: Request, model: Type[BaseModel], apply: Apply, batch_size: int) -> Dict[str, Any]:
+    report = Report()
+    batch: List[Tuple[int, Any]] = []
+
+    async def flush():
+        if not batch:
+            return
+        failed_before = report.error_count
+        try:
+            inserted, skipped, errors = await apply(batch)
+        except Exception as e:
+            # the batch rolled back as a unit
+            inserted, skipped, errors = 0, 0, [(line, f"batch failed: {e}") for line, _ in batch]
+        for line, message in errors:
+            report.error(line, message)
+        report.batches.append({
+            "batch": len(report.batches) + 1,
+            "first_line": batch[0][0],
+            "rows": len(batch),
+            "inserted": inserted,
+            "skipped": skipped,
+            "errors": report.error_count - failed_before,
+        })
+        batch.clear()
+
+    async for line, rec in records(request):
+        report.received += 1
+        if isinstance(rec, Exception):
+            report.error(line, str(rec))
+            continue
+        try:
+            batch.append((line, model.model_validate(rec)))
+        except ValidationError as e:
+            report.error(line, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+    return report.as_dict()
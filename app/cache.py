@@ -0,0 +1,190 @@
+# app/cache.py
+"""Small in-process caches shared by the auth, data and payment paths."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from .timing import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire (per-entry deadline or default TTL).
+
+    Thread-safe: sync dependencies run in the threadpool, async ones on the loop.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, deadline = item
+            if deadline is not None and deadline <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        expires_at: Optional[float] = None,
+    ) -> None:
+        now = self._clock()
+        ttl = self.ttl if ttl is None else ttl
+        deadline = now + ttl if ttl is not None else None
+        if expires_at is not None:
+            deadline = expires_at if deadline is None else min(deadline, expires_at)
+        if deadline is not None and deadline <= now:
+            return
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TokenCache:
+    """Verified bearer tokens -> whatever the verifier resolved them to.
+
+    Keys are SHA-256 digests, so raw tokens are never held in memory. Entries
+    live until the token's `exp` (optionally capped by `max_ttl`). Miss latency
+    is tracked so the stats can estimate how much verification time hits saved.
+    A named cache is also exported on /metrics, labelled cache="<name>".
+    """
+
+    def __init__(self, maxsize: int = 4096, max_ttl: Optional[float] = None, name: Optional[str] = None):
+        self._cache = TTLCache(maxsize=maxsize)
+        self.max_ttl = max_ttl
+        self._miss_seconds = 0.0
+        self._timed_misses = 0
+        if name is not None:
+            _token_caches[name] = self
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Any:
+        return self._cache.get(self.key(token))
+
+    def put(self, token: str, value: Any, exp: Optional[float], max_ttl: Optional[float] = None) -> None:
+        """Cache until `exp`; tokens without an exp are only cached if a TTL cap applies."""
+        cap = self.max_ttl if max_ttl is None else max_ttl
+        if exp is None and cap is None:
+            return
+        self._cache.set(self.key(token), value, ttl=cap, expires_at=exp)
+
+    def record_miss(self, seconds: float) -> None:
+        self._miss_seconds += seconds
+        self._timed_misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        out = self._cache.stats()
+        avg = self._miss_seconds / self._timed_misses if self._timed_misses else 0.0
+        out["avg_verify_ms"] = round(avg * 1000, 3)
+        out["est_saved_ms"] = round(avg * out["hits"] * 1000, 1)
+        return out
+
+
+_token_caches: Dict[str, TokenCache] = {}
+
+
+def _token_cache_metrics() -> List[str]:
+    if not _token_caches:
+        return []
+    stats = {name: c.stats() for name, c in _token_caches.items()}
+    lines = [
+        "# HELP auth_token_cache_lookups_total Bearer-token cache lookups by result.",
+        "# TYPE auth_token_cache_lookups_total counter",
+    ]
+    for name, s in stats.items():
+        lines.append(f'auth_token_cache_lookups_total{{cache="{name}",result="hit"}} {s["hits"]}')
+        lines.append(f'auth_token_cache_lookups_total{{cache="{name}",result="miss"}} {s["misses"]}')
+    lines += ["# HELP auth_token_cache_entries Tokens currently cached.", "# TYPE auth_token_cache_entries gauge"]
+    lines += [f'auth_token_cache_entries{{cache="{name}"}} {s["size"]}' for name, s in stats.items()]
+    lines += [
+        "# HELP auth_token_verify_seconds_total Time spent verifying tokens the cache missed.",
+        "# TYPE auth_token_verify_seconds_total counter",
+    ]
+    lines += [f'auth_token_verify_seconds_total{{cache="{name}"}} {c._miss_seconds:.6f}' for name, c in _token_caches.items()]
+    return lines
+
+
+metrics.add_collector(_token_cache_metrics)
+
+
+class SingleFlight:
+    """Collapse concurrent async calls for the same key into one in-flight task.
+
+    Callers that arrive while a call is running await the same result. The
+    task is shielded, so a caller that disconnects doesn't cancel it for the rest.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+
+            def _done(t, key=key):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,133 @@
+# app/changes.py
+"""
+Per-user data versions and conditional GETs.
+
+Every write path awaits `publish(user_id, kinds, op, rows)` after it commits, which
+bumps that user's version and runs subscribers (sync or async) before
+returning, so the writer's next read already sees their effect. A MessagePack
+or CBOR body is a different representation of the same data, so its tag
+carries the format as a suffix ("…-msgpack", "…-cbor"); app/wire.py adds
+`Vary: Accept`.
+
+List endpoints derive a strong ETag from the user's data version, the
+process epoch and version, and the query string, so a poll whose
+If-None-Match still matches is answered 304 before the list query runs.
+The data version is the user's last public.change_log seq
+(`repo.data_version`), which every app/ write path appends to in its own
+transaction, so a write on any worker changes the tag on all of them. The
+in-process version adds what isn't logged (a rollup rebuild); the epoch
+keeps a tag from another worker or an earlier run from matching that part.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import itertools
+import os
+import secrets
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .cache import TTLCache
+from .fastjson import wire_format
+
+# clients revalidate every poll; private since lists are per user
+CACHE_CONTROL = "private, no-cache"
+
+# idle users' versions are dropped; see ChangeFeed.version
+VERSIONS_SIZE = int(os.environ.get("CHANGE_VERSIONS_SIZE", "65536"))
+VERSIONS_TTL = float(os.environ.get("CHANGE_VERSIONS_TTL", "3600"))
+
+
+class Change:
+    __slots__ = ("user_id", "kinds", "op", "version", "rows")
+
+    def __init__(self, user_id: str, kinds: Tuple[str, ...], op: str, version: int, rows: Optional[list] = None):
+        self.user_id = user_id
+        self.kinds = kinds  # e.g. ("jobs",), ("jobs", "clients")
+        self.op = op        # e.g. "create", "checkout", "paid"
+        self.version = version
+        self.rows = rows    # the affected rows when the writer has them (for push), else None
+
+    def __repr__(self) -> str:
+        return f"Change({self.user_id!r}, {self.kinds!r}, {self.op!r}, v{self.version})"
+
+
+Subscriber = Callable[[Change], Any]  # may return an awaitable
+
+
+class ChangeFeed:
+    def __init__(self, maxsize: int = VERSIONS_SIZE, ttl: float = VERSIONS_TTL):
+        self.epoch = secrets.token_hex(4)
+        self._versions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._seq = itertools.count(1)
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def version(self, user_id) -> int:
+        """Increasing per user, not consecutive: versions come from one
+        sequence, and a dropped one is replaced by a fresh number, never by
+        one a tag was already issued for."""
+        uid = str(user_id)
+        with self._lock:
+            v = self._versions.get(uid)
+            if v is None:
+                v = next(self._seq)
+                self._versions.set(uid, v)
+        return v
+
+    async def publish(self, user_id, kinds: Iterable[str], op: str, rows: Optional[list] = None) -> Change:
+        uid = str(user_id)
+        with self._lock:
+            v = next(self._seq)
+            self._versions.set(uid, v)
+        change = Change(uid, tuple(kinds), op, v, rows)
+        for fn in list(self._subscribers):
+            result = fn(change)
+            if inspect.isawaitable(result):
+                await result
+        return change
+
+    def subscribe(self, fn: Subscriber) -> Subscriber:
+        self._subscribers.append(fn)
+        return fn
+
+    def etag(self, user_id, *shape: str, data_version: int = 0) -> str:
+        """Strong ETag for this user's data as seen through `shape` (route, query)."""
+        h = hashlib.sha256("|".join(shape).encode()).hexdigest()[:12]
+        return f'"{data_version}-{self.epoch}-{self.version(user_id)}-{h}"'
+
+
+changes = ChangeFeed()
+publish = changes.publish
+
+
+def _matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return any(t.strip().removeprefix("W/") == tag for t in if_none_match.split(","))
+
+
+def list_etag(request: Request, user_id, data_version: int) -> str:
+    """`data_version` from repo.data_version, read before the list query."""
+    tag = changes.etag(user_id, request.url.path, request.url.query, data_version=data_version)
+    fmt = wire_format.get()  # set by WireFormatMiddleware
+    return tag if fmt is None else f'{tag[:-1]}-{fmt.media_type.rsplit("/", 1)[1]}"'
+
+
+def not_modified(request: Request, tag: str) -> Optional[Response]:
+    """A 304 for `tag` if the client already has it, else None."""
+    if _matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def set_etag(response: Response, tag: str) -> None:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,119 @@
+# app/checkout.py
+"""
+Reuse of open Stripe Checkout Sessions.
+
+Tapping "Pay" twice used to create two sessions (full Stripe latency each
+time, plus an orphaned session). Sessions are now cached per key, e.g.
+(job id, amount, currency), until shortly before they expire:
+
+- a cached, unexpired session is returned without calling Stripe;
+- on a miss, a session id we already know about (e.g. jobs.checkout_session_id)
+  is retrieved and reused if Stripe still reports it open;
+- otherwise a new session is created with an idempotency key derived from the
+  cache key and the session it replaces, so retries and concurrent workers
+  converge on one session. A replayed create (`Idempotent-Replayed: true`)
+  carries the original response, still "open" after the customer paid, so
+  with `retrieve` its real status is fetched before it's handed out;
+- concurrent requests for one key share a single Stripe call.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .cache import SingleFlight, TTLCache
+from .timing import phase
+
+# don't hand out a session that expires before the customer can finish paying
+EXPIRY_MARGIN = 120.0
+
+
+def _usable(sess: Any, now: float) -> bool:
+    expires_at = sess.get("expires_at") or 0
+    return sess.get("status", "open") == "open" and expires_at - EXPIRY_MARGIN > now
+
+
+def _replayed(sess: Any) -> bool:
+    headers = getattr(getattr(sess, "last_response", None), "headers", None) or {}
+    return any(k.lower() == "idempotent-replayed" and str(v).lower() == "true" for k, v in headers.items())
+
+
+class CheckoutSessions:
+    def __init__(self, maxsize: int = 4096):
+        self._cache = TTLCache(maxsize=maxsize)
+        self._by_session = TTLCache(maxsize=maxsize)  # session id -> key
+        # key -> last completed session, so the next idempotency key differs
+        # from the one that created it (a replay would return the paid session)
+        self._finished = TTLCache(maxsize=maxsize, ttl=86400)
+        self._flight = SingleFlight()
+        self.created = 0
+        self.reused = 0
+
+    def _remember(self, key: Hashable, sess: Any) -> Dict[str, Any]:
+        out = {"id": sess["id"], "url": sess["url"], "expires_at": sess["expires_at"]}
+        self._cache.set(key, out, expires_at=out["expires_at"] - EXPIRY_MARGIN)
+        self._by_session.set(out["id"], key, expires_at=out["expires_at"])
+        return out
+
+    @staticmethod
+    def idempotency_key(key: Hashable, replaces: Optional[str]) -> str:
+        raw = f"{key!r}|{replaces or ''}"
+        return "checkout-" + hashlib.sha256(raw.encode()).hexdigest()[:48]
+
+    async def get_or_create(
+        self,
+        key: Hashable,
+        create: Callable[[str], Any],
+        retrieve: Optional[Callable[[str], Any]] = None,
+        known_session_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Return {"id", "url", "expires_at"} for an open session under `key`.
+
+        `create(idempotency_key)` and `retrieve(session_id)` are blocking Stripe
+        calls; they run in the threadpool.
+        """
+        cached = self._cache.get(key)
+        if cached is not None and known_session_id in (None, cached["id"]):
+            self.reused += 1
+            return cached
+
+        async def resolve() -> Dict[str, Any]:
+            now = time.time()
+            if known_session_id and retrieve is not None:
+                try:
+                    with phase("stripe"):
+                        sess = await run_in_threadpool(retrieve, known_session_id)
+                except Exception:
+                    sess = None
+                if sess is not None and _usable(sess, now):
+                    self.reused += 1
+                    return self._remember(key, sess)
+
+            replaces = known_session_id or self._finished.get(key)
+            with phase("stripe"):
+                sess = await run_in_threadpool(create, self.idempotency_key(key, replaces))
+                if retrieve is not None and _replayed(sess):
+                    sess = await run_in_threadpool(retrieve, sess["id"]) or sess
+            if not _usable(sess, now):
+                # an idempotent replay of a session that has since expired or been paid
+                with phase("stripe"):
+                    sess = await run_in_threadpool(create, self.idempotency_key(key, sess["id"]))
+            self.created += 1
+            return self._remember(key, sess)
+
+        return await self._flight.do(key, resolve)
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop a session once it's completed (webhook) so it isn't handed out again."""
+        key = self._by_session.pop(session_id, None)
+        if key is not None:
+            self._finished.set(key, session_id)
+            cached = self._cache.get(key)
+            if cached is not None and cached["id"] == session_id:
+                self._cache.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"created": self.created, "reused": self.reused, **self._cache.stats()}
@@ -1,19 +1,77 @@
 # app/clients.py
-from fastapi import APIRouter, Depends
-from .deps import sb, get_user
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import repo
+from .bulk import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, run_import
+from .changes import list_etag, not_modified, publish, set_etag
+from .db import get_session
+from .deps import get_read_session, get_user
+from .fastjson import RawJSONResponse, dumps
+from .listcache import list_cache
 from .models import ClientIn
+from .search import search_index
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
 @router.get("")
-async def list_clients(user = Depends(get_user)):
-    r = sb.table("clients").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-    return r.data
+async def list_clients(
+    request: Request,
+    user = Depends(get_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    version = await repo.data_version(db, user["id"])
+    tag = list_etag(request, user["id"], version)
+    if (hit := not_modified(request, tag)) is not None:
+        return hit
+
+    async def load():
+        return dumps(await repo.list_clients(db, user["id"])), None
+
+    body, _ = await list_cache.get_or_load("clients", user["id"], "all", load, version)
+    response = RawJSONResponse(body)
+    set_etag(response, tag)
+    return response
 
 @router.post("")
-async def create_client(payload: ClientIn, user = Depends(get_user)):
-    r = sb.table("clients").insert({
-        "user_id": user["id"],
-        **payload.model_dump()
-    }).select("*").execute()
-    return r.data[0]
+async def create_client(payload: ClientIn, user = Depends(get_user), db: AsyncSession = Depends(get_session)):
+    row = await repo.insert_client(db, user["id"], payload.model_dump())
+    await repo.log_changes(db, user["id"], "client", [row["id"]])
+    await db.commit()
+    search_index.add_clients(user["id"], [row])
+    await publish(user["id"], ("clients",), "create", [row])
+    return row
+
+@router.post("/bulk")
+async def bulk_create_clients(
+    request: Request,
+    batch_size: int = Query(default=DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    user = Depends(get_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Import clients from an NDJSON or CSV body; names that already exist are skipped."""
+    known: set = set()  # client names already in the table or imported earlier in this upload
+
+    async def apply(batch):
+        unseen = list({m.name for _, m in batch} - known)
+        try:
+            existing = {r["name"] for r in await repo.find_clients_by_names(db, user["id"], unseen)}
+            fresh, names, skipped = [], set(), 0
+            for _, m in batch:
+                if m.name in known or m.name in existing or m.name in names:
+                    skipped += 1
+                    continue
+                names.add(m.name)
+                fresh.append(m.model_dump())
+            created = await repo.insert_clients(db, user["id"], fresh)
+            await repo.log_changes(db, user["id"], "client", [r["id"] for r in created])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        if fresh:
+            search_index.add_clients(user["id"], created)
+            await publish(user["id"], ("clients",), "create")
+        known.update(existing, names)
+        return len(fresh), skipped, []
+
+    return await run_import(request, ClientIn, apply, batch_size)
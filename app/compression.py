@@ -0,0 +1,338 @@
+# app/compression.py
+"""
+Content-negotiated response compression for main.app and app.main.app.
+
+`CompressionMiddleware` picks the best encoding the client accepts from
+zstd, br and gzip. zstd and br are used only when `zstandard` / `brotli`
+are installed; gzip is always there. Every response that could have been
+encoded carries `Vary: Accept-Encoding`, whether or not this one was, and
+an encoded response's ETag is made weak (W/) since its bytes are not the
+origin's. Responses are left alone when they are
+already encoded, are event streams (SSE needs every frame delivered as it is
+written), have a non-text content type, or are a single body smaller than
+COMPRESS_MIN_BYTES (so /health and other tiny replies skip the work).
+
+Streamed bodies (NDJSON lists, bulk import reports) are compressed chunk
+by chunk and flushed after each one, so the client still receives rows as
+they're produced and memory stays at one chunk.
+
+Levels are set per encoding. COMPRESS_CPU_BUDGET caps the share of one core
+spent compressing, measured over one-second windows: past it, new responses
+go out uncompressed until the next window, so a burst of large lists can't
+starve the event loop. Streams already being compressed carry on.
+
+    COMPRESS_MIN_BYTES=1024  COMPRESS_GZIP_LEVEL=5  COMPRESS_BROTLI_QUALITY=4
+    COMPRESS_ZSTD_LEVEL=3    COMPRESS_CPU_BUDGET=0.25
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .timing import metrics, phase
+
+try:
+    import brotli
+except ImportError:  # optional; br is just not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional; zstd is just not offered
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "5"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "4"))
+COMPRESS_ZSTD_LEVEL = int(os.environ.get("COMPRESS_ZSTD_LEVEL", "3"))
+COMPRESS_CPU_BUDGET = float(os.environ.get("COMPRESS_CPU_BUDGET", "0.25"))  # share of one core
+
+COMPRESSIBLE = (
+    "application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml",
+    "application/msgpack", "application/cbor",  # binary, but ids and text still repeat
+)
+SKIPPED = ("text/event-stream",)
+
+
+# ---- encoders ------------------------------------------------------------------
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._z.compress(data) + self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._c.process(data) + self._c.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._c.compress(data) + self._c.flush()
+
+
+Encoder = Any  # chunk(data) -> bytes flushed so far; finish(data) -> the rest
+# preference order when the client accepts several at the same q
+ENCODERS: Dict[str, Callable[[], Encoder]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = lambda: _Zstd(COMPRESS_ZSTD_LEVEL)
+if brotli is not None:
+    ENCODERS["br"] = lambda: _Brotli(COMPRESS_BROTLI_QUALITY)
+ENCODERS["gzip"] = lambda: _Gzip(COMPRESS_GZIP_LEVEL)
+
+
+def qvalues(header: str) -> Dict[str, float]:
+    """{token: q} from an Accept-style header ("gzip;q=0.5, br" -> {"gzip": 0.5, "br": 1.0})."""
+    qs: Dict[str, float] = {}
+    for part in header.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if name:
+            qs[name.strip()] = q
+    return qs
+
+
+def choose(accept_encoding: str, offered: Tuple[str, ...] = tuple(ENCODERS)) -> Optional[str]:
+    """Best of `offered` by the client's q-values, ties broken by our order; None for identity."""
+    qs = qvalues(accept_encoding)
+    best, best_q = None, 0.0
+    for enc in offered:
+        q = qs.get(enc, qs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+# ---- CPU budget + counters -------------------------------------------------------
+class Budget:
+    """Seconds of compression allowed per one-second window."""
+
+    def __init__(self, share: float = COMPRESS_CPU_BUDGET):
+        self.share = share
+        self._window = 0
+        self._spent = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = int(time.monotonic())
+            if now != self._window:
+                self._window, self._spent = now, 0.0
+            return self._spent < self.share
+
+    def charge(self, seconds: float) -> None:
+        with self._lock:
+            self._spent += seconds
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses: Dict[str, int] = {}     # encoding -> responses
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self.skipped: Dict[str, int] = {}       # reason -> responses
+
+    def record(self, enc: str, n_in: int, n_out: int, seconds: float) -> None:
+        with self._lock:
+            self.responses[enc] = self.responses.get(enc, 0) + 1
+            self.bytes_in[enc] = self.bytes_in.get(enc, 0) + n_in
+            self.bytes_out[enc] = self.bytes_out.get(enc, 0) + n_out
+            self.seconds[enc] = self.seconds.get(enc, 0.0) + seconds
+
+    def skip(self, reason: str) -> None:
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "offered": list(ENCODERS),
+                "min_bytes": COMPRESS_MIN_BYTES,
+                "cpu_budget": budget.share,
+                "responses": dict(self.responses),
+                "bytes_in": dict(self.bytes_in),
+                "bytes_out": dict(self.bytes_out),
+                "seconds": {k: round(v, 4) for k, v in self.seconds.items()},
+                "skipped": dict(self.skipped),
+            }
+
+    def prometheus(self) -> List[str]:
+        d = self.as_dict()
+        out = [
+            "# HELP http_compression_bytes_total Response bytes before (in) and after (out) compression.",
+            "# TYPE http_compression_bytes_total counter",
+        ]
+        for enc in d["bytes_in"]:
+            out.append(f'http_compression_bytes_total{{encoding="{enc}",dir="in"}} {d["bytes_in"][enc]}')
+            out.append(f'http_compression_bytes_total{{encoding="{enc}",dir="out"}} {d["bytes_out"][enc]}')
+        out += [
+            "# HELP http_compression_seconds_total Time spent compressing responses.",
+            "# TYPE http_compression_seconds_total counter",
+        ]
+        out += [f'http_compression_seconds_total{{encoding="{e}"}} {s}' for e, s in d["seconds"].items()]
+        out += [
+            "# HELP http_compression_skipped_total Responses sent uncompressed to a client that accepts compression.",
+            "# TYPE http_compression_skipped_total counter",
+        ]
+        out += [f'http_compression_skipped_total{{reason="{r}"}} {n}' for r, n in d["skipped"].items()]
+        return out
+
+
+budget = Budget()
+stats = Stats()
+metrics.add_collector(stats.prometheus)
+
+
+# ---- middleware ----------------------------------------------------------------
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for k, v in headers:
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return None
+
+
+def _skip_reason(status: int, headers: List[Tuple[bytes, bytes]]) -> Optional[str]:
+    if status < 200 or status in (204, 304):
+        return "status"
+    if _header(headers, b"content-encoding") is not None:
+        return "encoded"
+    ctype = (_header(headers, b"content-type") or "").lower()
+    if ctype.startswith(SKIPPED) or not ctype.startswith(COMPRESSIBLE):
+        return "type"
+    return None
+
+
+def _with_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if "accept-encoding" in vary.lower():
+        return headers
+    return [(k, v + b", Accept-Encoding" if k.lower() == b"vary" else v) for k, v in headers]
+
+
+def _weak_etag(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    # the encoded bytes differ from the origin's, so its strong tag no longer fits;
+    # If-None-Match compares weakly, so the client's W/ tag still gets a 304
+    return [(k, b"W/" + v if k.lower() == b"etag" and not v.startswith(b"W/") else v) for k, v in headers]
+
+
+def _with_encoding(headers: List[Tuple[bytes, bytes]], enc: str, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+    out = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+    if length is not None:
+        out.append((b"content-length", str(length).encode()))
+    out.append((b"content-encoding", enc.encode()))
+    return _weak_etag(_with_vary(out))
+
+
+class CompressionMiddleware:
+    """Pure ASGI, so streamed bodies are compressed as they're sent."""
+
+    def __init__(self, app, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        enc = choose(accept) if accept else None
+
+        start: Optional[Dict[str, Any]] = None
+        encoder: Optional[Encoder] = None
+        passthrough = False
+        n_in = n_out = 0
+        spent = 0.0
+
+        def compress(fn: Callable[[bytes], bytes], data: bytes) -> bytes:
+            nonlocal n_in, n_out, spent
+            t0 = time.perf_counter()
+            with phase("compress"):
+                out = fn(data)
+            took = time.perf_counter() - t0
+            budget.charge(took)
+            n_in, n_out, spent = n_in + len(data), n_out + len(out), spent + took
+            return out
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            kind = message["type"]
+            if kind == "http.response.start":
+                headers = list(message.get("headers", []))
+                status = message["status"]
+                reason = _skip_reason(status, headers)
+                if reason is None and enc is not None:
+                    start = message  # held until the first body chunk says how big it is
+                    return
+                passthrough = True
+                if reason is None:  # identity for this client, but another one gets it encoded
+                    message = {**message, "headers": _with_vary(headers)}
+                elif status == 304:  # stands for a 200 that may have gone out encoded
+                    headers = _with_vary(headers)
+                    message = {**message, "headers": _weak_etag(headers) if enc is not None else headers}
+                return await send(message)
+            if kind != "http.response.body" or passthrough:
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                headers = list(start.get("headers", []))
+                reason = None
+                if not more and len(body) < self.min_bytes:
+                    reason = "small"
+                elif not budget.allow():
+                    reason = "budget"
+                if reason is not None:
+                    if reason != "small":
+                        stats.skip(reason)
+                    passthrough = True
+                    await send({**start, "headers": _with_vary(headers)})
+                    start = None
+                    return await send(message)
+                encoder = ENCODERS[enc]()
+                if not more:
+                    out = compress(encoder.finish, body)
+                    stats.record(enc, n_in, n_out, spent)
+                    await send({**start, "headers": _with_encoding(headers, enc, len(out))})
+                    start = None
+                    return await send({"type": "http.response.body", "body": out})
+                await send({**start, "headers": _with_encoding(headers, enc, None)})
+                start = None
+
+            # streamed: flush what each chunk produced so rows reach the client now
+            out = compress(encoder.chunk if more else encoder.finish, body)
+            if not more:
+                stats.record(enc, n_in, n_out, spent)
+            if out or not more:
+                await send({"type": "http.response.body", "body": out, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
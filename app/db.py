@@ -1,21 +1,115 @@
 import os
+from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from . import replicas as _replicas_mod
+from .changes import changes
+from .dbpool import TimedQueuePool, engine_kwargs, prometheus
+from .timing import instrument_engine, metrics
 
 _engine = None
 _SessionLocal = None
+_replicas = None  # ReplicaSet when SUPABASE_DB_REPLICA_URLS is set
+
+def _make_engine(db_url):
+    # explicit poolclass so a local SQLite stand-in pools like Postgres does;
+    # sizing, pre-ping and recycle come from DB_POOL_* (see app/dbpool.py)
+    engine = create_async_engine(db_url, echo=False, **engine_kwargs())
+    instrument_engine(engine)
+    return engine
+
+def _make_sessions(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
 
 def _ensure_engine():
-    global _engine, _SessionLocal
+    global _engine, _SessionLocal, _replicas
     if _engine is None:
         db_url = os.getenv("SUPABASE_DB_URL")
         if not db_url:
             # defer failure until a DB-using endpoint is called
             raise RuntimeError("SUPABASE_DB_URL is not set")
-        _engine = create_async_engine(db_url, echo=False, pool_size=5, max_overflow=10)
-        _SessionLocal = async_sessionmaker(_engine, expire_on_commit=False)
+        _engine = _make_engine(db_url)
+        _SessionLocal = _make_sessions(_engine)
+        urls = _replicas_mod.replica_urls()
+        if urls:
+            _replicas = _replicas_mod.build(urls, _make_engine, _make_sessions)
+
+def engines():
+    """Primary first, then replicas (e.g. to attach per-connection hooks)."""
+    _ensure_engine()
+    return [_engine] + ([r.engine for r in _replicas.replicas] if _replicas else [])
 
 async def get_session() -> AsyncSession:
     _ensure_engine()
     async with _SessionLocal() as session:
         yield session
 
+@asynccontextmanager
+async def session_scope():
+    """Session outside request DI (background tasks, streamed responses, shared lookups)."""
+    _ensure_engine()
+    async with _SessionLocal() as session:
+        yield session
+
+@asynccontextmanager
+async def read_scope(key=None):
+    """Read-only session: a healthy replica unless `key` (a user id) wrote recently.
+
+    Without replicas this is the primary, same as session_scope().
+    """
+    _ensure_engine()
+    replica = _replicas.pick(key) if _replicas is not None else None
+    if replica is None:
+        async with _SessionLocal() as session:
+            yield session
+        return
+    try:
+        async with replica.sessions() as session:
+            yield session
+    except Exception as e:
+        if _replicas_mod.is_connection_error(e):
+            _replicas.eject(replica, e)
+        raise
+
+def mark_write(key):
+    """Pin `key`'s reads to the primary for the read-your-writes window."""
+    if _replicas is not None:
+        _replicas.mark_write(key)
+
+# every write path publishes to the change feed after committing
+changes.subscribe(lambda change: mark_write(change.user_id))
+
+async def probe_replicas():
+    """Check every replica now (instead of waiting for the next lazy probe)."""
+    _ensure_engine()
+    if _replicas is None:
+        return None
+    await _replicas.probe()
+    return _replicas.stats()
+
+def pool_stats():
+    if _engine is None:
+        return None
+    stats = _engine.pool.stats()
+    if _replicas is not None:
+        stats["read_routing"] = _replicas.stats()
+    return stats
+
+def _pools():
+    if _engine is None:
+        return {}
+    pools = {"primary": _engine.pool}
+    if _replicas is not None:
+        pools.update({r.name: r.engine.pool for r in _replicas.replicas})
+    return {k: p for k, p in pools.items() if isinstance(p, TimedQueuePool)}
+
+metrics.add_collector(lambda: prometheus(_pools()) if _engine is not None else [])
+
+async def dispose():
+    global _engine, _SessionLocal, _replicas
+    if _replicas is not None:
+        await _replicas.close()
+        _replicas = None
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _SessionLocal = None
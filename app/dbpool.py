@@ -0,0 +1,171 @@
+# app/dbpool.py
+"""
+Connection pool for app/db.py that reports how long checkouts wait and
+adapts its overflow limit to the load it sees.
+
+`TimedQueuePool` is SQLAlchemy's AsyncAdaptedQueuePool with `_do_get`
+timed: every checkout's wait goes into a histogram (and the request's
+Server-Timing as `pool_wait`), and timeouts are counted. With adaptation on,
+the overflow limit starts at DB_POOL_MIN_OVERFLOW and, once per
+DB_POOL_ADAPT_INTERVAL seconds, grows when checkouts had to wait and
+shrinks when the previous window never used the headroom, staying within
+[DB_POOL_MIN_OVERFLOW, DB_POOL_MAX_OVERFLOW]. Surplus overflow connections
+are closed as they're returned.
+
+Settings come from the environment, not constructor arguments, so they
+survive SQLAlchemy recreating the pool (dispose, invalidation); `recreate`
+hands the new pool the configured ceiling rather than the adapted limit.
+"""
+from __future__ import annotations
+
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .timing import Histogram, _current, _histogram
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args: Any, **kw: Any):
+        super().__init__(*args, **kw)
+        self.ceiling = self._max_overflow
+        self.adaptive = os.getenv("DB_POOL_ADAPTIVE", "1") != "0" and self.ceiling > 0
+        self.floor = max(0, min(int(os.getenv("DB_POOL_MIN_OVERFLOW", "2")), self.ceiling))
+        self.interval = float(os.getenv("DB_POOL_ADAPT_INTERVAL", "5"))
+        self.slow_wait = float(os.getenv("DB_POOL_SLOW_WAIT_MS", "5")) / 1000
+        if self.adaptive:
+            self._max_overflow = self.floor
+        self._stats_lock = threading.Lock()
+        self.waits = Histogram(WAIT_BUCKETS)
+        self.recent = deque(maxlen=2048)  # for percentiles in stats()
+        self.timeouts = 0
+        self.resizes = 0
+        self._window_start = time.monotonic()
+        self._window_slow = 0
+        self._window_peak = 0
+
+    def recreate(self) -> "TimedQueuePool":
+        # QueuePool.recreate passes the current _max_overflow, which adaptation
+        # may have lowered to the floor; the new pool must start from the ceiling
+        with self._stats_lock:
+            limit, self._max_overflow = self._max_overflow, self.ceiling
+            try:
+                return super().recreate()
+            finally:
+                self._max_overflow = limit
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+                self._window_slow += 1
+            self._adapt()
+            raise
+        waited = time.perf_counter() - started
+        t = _current.get()
+        if t is not None:
+            t.add("pool_wait", waited)
+        with self._stats_lock:
+            self.waits.observe(waited)
+            self.recent.append(waited)
+            if waited >= self.slow_wait:
+                self._window_slow += 1
+            self._window_peak = max(self._window_peak, self.checkedout())
+        self._adapt()
+        return conn
+
+    def _adapt(self) -> None:
+        if not self.adaptive:
+            return
+        now = time.monotonic()
+        with self._stats_lock:
+            if now - self._window_start < self.interval:
+                return
+            limit = self._max_overflow
+            if self._window_slow and limit < self.ceiling:
+                # checkouts queued: allow more connections, quickly
+                limit = min(self.ceiling, limit + max(2, limit // 2))
+            elif not self._window_slow and self._window_peak < self.size() + limit - 1 and limit > self.floor:
+                # the last window never needed this much headroom: give one back
+                limit -= 1
+            if limit != self._max_overflow:
+                self._max_overflow = limit
+                self.resizes += 1
+            self._window_start = now
+            self._window_slow = 0
+            self._window_peak = self.checkedout()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            recent = sorted(self.recent)
+            out = {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(0, self.overflow()),
+                "overflow_limit": self._max_overflow,
+                "overflow_bounds": [self.floor, self.ceiling],
+                "adaptive": self.adaptive,
+                "resizes": self.resizes,
+                "checkouts": self.waits.count,
+                "timeouts": self.timeouts,
+                "pre_ping": bool(self._pre_ping),
+                "recycle_s": self._recycle,
+            }
+        if recent:
+            q = statistics.quantiles(recent, n=100) if len(recent) > 1 else recent * 99
+            out["wait_ms"] = {
+                "p50": round(q[49] * 1000, 3),
+                "p95": round(q[94] * 1000, 3),
+                "p99": round(q[98] * 1000, 3),
+                "max": round(recent[-1] * 1000, 3),
+            }
+        return out
+
+    def _gauges(self) -> Dict[str, int]:
+        return {
+            "db_pool_size": self.size(),
+            "db_pool_checked_out": self.checkedout(),
+            "db_pool_overflow": max(0, self.overflow()),
+            "db_pool_overflow_limit": self._max_overflow,
+            "db_pool_checkout_timeouts_total": self.timeouts,
+        }
+
+
+def prometheus(pools: Dict[str, TimedQueuePool]) -> List[str]:
+    """Exposition lines for several pools, labelled pool="<name>"."""
+    waits, gauges = {}, {}
+    for name, p in pools.items():
+        with p._stats_lock:
+            waits[f'pool="{name}"'] = p.waits
+            gauges[name] = p._gauges()
+    lines = _histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", waits)
+    for metric in ("db_pool_size", "db_pool_checked_out", "db_pool_overflow", "db_pool_overflow_limit",
+                   "db_pool_checkout_timeouts_total"):
+        lines.append(f"# TYPE {metric} {'counter' if metric.endswith('_total') else 'gauge'}")
+        lines += [f'{metric}{{pool="{name}"}} {g[metric]}' for name, g in gauges.items()]
+    return lines
+
+
+def engine_kwargs() -> Dict[str, Any]:
+    """Pool arguments for create_async_engine, from DB_POOL_* (read per call)."""
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),  # ceiling when adaptive
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # below typical server/proxy idle timeouts, so stale sockets get replaced
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") != "0",
+    }
@@ -1,26 +1,153 @@
 # app/deps.py
 import os
-from supabase import create_client, Client
-from fastapi import Header, HTTPException
-from typing import Dict, Any
+import threading
+import time
+from fastapi import Depends, Header, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING, Dict, Any, Optional
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from . import repo
+from .cache import TTLCache, TokenCache, SingleFlight
+from .db import read_scope, session_scope
+from .timing import instrument_httpx, phase
 
-async def get_user(authorization: str = Header(...)) -> Dict[str, Any]:
+if TYPE_CHECKING:
+    from supabase import Client
+
+# built on first use (or by the lifespan warm-up), not at import: the supabase
+# SDK is slow to import and cold starts shouldn't pay for it before /health
+_sb: Optional["Client"] = None
+_sb_lock = threading.Lock()
+
+
+def get_sb() -> "Client":
+    global _sb
+    if _sb is None:
+        with _sb_lock:
+            if _sb is None:
+                from supabase import create_client
+
+                url = os.environ.get("SUPABASE_URL")
+                key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+                if not url or not key:
+                    raise HTTPException(status_code=500, detail="SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY not set")
+                client = create_client(url, key)
+                instrument_httpx(client.auth._http_client, "supabase_auth")
+                _sb = client
+    return _sb
+
+
+def close_sb() -> None:
+    global _sb
+    if _sb is not None:
+        closer = getattr(_sb.auth, "close", None)
+        try:
+            if closer is not None:
+                closer()
+        except Exception:
+            pass
+        _sb = None
+
+# auth user id -> public.users row; also bounds how long a revoked token keeps working
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+_tokens = TokenCache(maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")), max_ttl=USER_CACHE_TTL, name="app.deps")
+_users = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "4096")), ttl=USER_CACHE_TTL)
+_flight = SingleFlight()
+
+
+def _token_exp(token: str) -> Optional[float]:
+    try:
+        from jose import jwt  # lazy: only needed once a request carries a token
+
+        exp = jwt.get_unverified_claims(token).get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
+
+async def _auth_user(token: str) -> Dict[str, str]:
+    """Ask Supabase Auth who the token belongs to (off the event loop, cached until exp)."""
+    hit = _tokens.get(token)
+    if hit is not None:
+        return hit
+
+    async def fetch():
+        started = time.perf_counter()
+        sb = _sb or await run_in_threadpool(get_sb)
+        u = await run_in_threadpool(sb.auth.get_user, token)
+        if not u or not u.user:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        _tokens.record_miss(time.perf_counter() - started)
+        who = {"id": u.user.id, "email": u.user.email or ""}
+        _tokens.put(token, who, _token_exp(token))
+        return who
+
+    return await _flight.do(("token", TokenCache.key(token)), fetch)
+
+
+async def _users_row(auth_user_id: str, email: str) -> Dict[str, Any]:
+    row = _users.get(auth_user_id)
+    if row is not None:
+        return row
+
+    async def resolve():
+        async with session_scope() as db:
+            data = await repo.get_user_by_auth_id(db, auth_user_id)
+            if data is None:
+                data = await repo.insert_user(db, auth_user_id, email)
+                await db.commit()
+        _users.set(auth_user_id, data)
+        return data
+
+    # a burst of first requests for a new user shares one lookup-or-insert
+    return await _flight.do(("users", auth_user_id), resolve)
+
+
+async def _sync_email(auth_user_id: str, email: str) -> Dict[str, Any]:
+    """Follow an address changed in Supabase Auth, then re-read the row."""
+    async def update():
+        async with session_scope() as db:
+            await repo.update_user_email(db, auth_user_id, email)
+            await db.commit()
+        invalidate_user(auth_user_id)
+
+    await _flight.do(("email", auth_user_id), update)
+    return await _users_row(auth_user_id, email)
+
+
+def invalidate_user(auth_user_id: Optional[str] = None) -> None:
+    """Drop a cached users row (or all of them) after it changes out from under us."""
+    if auth_user_id is None:
+        _users.clear()
+    else:
+        _users.pop(auth_user_id)
+
+
+def user_cache_stats() -> Dict[str, Any]:
+    return {"tokens": _tokens.stats(), "users": _users.stats()}
+
+
+# scope key the /batch dispatcher (app/batch.py) sets on its sub-requests;
+# only in-process dispatch can put it there, clients can't
+BATCH_USER = "prello.batch_user"
+
+
+async def get_user(request: Request, authorization: str = Header(...)) -> Dict[str, Any]:
+    user = request.scope.get(BATCH_USER)
+    if user is not None:
+        return user  # authenticated once for the whole batch
     if not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
     token = authorization.split(" ", 1)[1]
-    u = sb.auth.get_user(token)
-    if not u or not u.user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    auth_user_id = u.user.id
-    row = sb.table("users").select("*").eq("auth_user_id", auth_user_id).single().execute()
-    data = row.data
-    if not data:
-        email = u.user.email or ""
-        created = sb.table("users").insert({"auth_user_id": auth_user_id, "email": email}).execute()
-        data = created.data[0]
-    return data  # contains public.users.id
+    with phase("auth"):
+        who = await _auth_user(token)
+        row = await _users_row(who["id"], who["email"])  # contains public.users.id
+        if who["email"] and row.get("email") != who["email"]:
+            row = await _sync_email(who["id"], who["email"])
+        return row
+
+
+async def get_read_session(user: Dict[str, Any] = Depends(get_user)):
+    """Session for read-only handlers: a replica, or the primary right after this user wrote."""
+    async with read_scope(user["id"]) as db:
+        yield db
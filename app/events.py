@@ -0,0 +1,192 @@
+# app/events.py
+"""
+Server-sent events: push each user's changes instead of having them poll.
+
+GET /events is a text/event-stream. Every change the write paths publish to
+the change feed (job and client creates, checkout, the webhook's paid flip)
+is sent to that user's open streams as
+
+    id: 12
+    event: change
+    data: {"v":12,"kinds":["jobs"],"op":"paid","rows":[{"id":"…","status":"completed_paid"}]}
+
+`rows` is null when the writer didn't have them (bulk imports): refetch the
+lists. A stream opens with `event: hello` (refetch once to catch up) and
+sends a `: ping` comment every EVENTS_HEARTBEAT_S so proxies keep it open.
+
+Each stream has a bounded queue (EVENTS_QUEUE_SIZE frames). A consumer that
+falls that far behind has its backlog replaced by a single `event: resync`,
+so memory per connection stays bounded and the client knows to refetch.
+Users get at most EVENTS_MAX_PER_USER streams per process.
+
+Frames are encoded once per change and fanned out through a `Transport`.
+The default delivers in-process; a transport backed by a message bus (e.g.
+Redis pub/sub) makes a write on one worker reach streams held by another.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Protocol, Set
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from .changes import Change, changes
+from .deps import get_user
+from .fastjson import dumps
+
+router = APIRouter(tags=["events"])
+
+EVENTS_HEARTBEAT_S = float(os.environ.get("EVENTS_HEARTBEAT_S", "15"))
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "64"))
+EVENTS_MAX_PER_USER = int(os.environ.get("EVENTS_MAX_PER_USER", "5"))
+
+PING = b": ping\n\n"
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+Deliver = Callable[[str, bytes], None]
+
+
+class Transport(Protocol):
+    async def send(self, user_id: str, frame: bytes) -> None: ...
+    def start(self, deliver: Deliver) -> None: ...
+    async def close(self) -> None: ...
+
+
+class LocalTransport:
+    """Single process: sending is delivering."""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def send(self, user_id: str, frame: bytes) -> None:
+        if self._deliver is not None:
+            self._deliver(user_id, frame)
+
+    def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def close(self) -> None:
+        self._deliver = None
+
+
+class Subscription:
+    __slots__ = ("user_id", "queue", "dropped")
+
+    def __init__(self, user_id: str, size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=size)
+        self.dropped = 0
+
+    def offer(self, frame: bytes) -> None:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # too far behind: replace the backlog with one resync marker
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(RESYNC)
+
+
+class Broadcaster:
+    def __init__(self, transport: Optional[Transport] = None, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()  # /health/events reads _subs from the threadpool
+        self.sent = 0
+        self.resyncs = 0
+        self.use_transport(transport or LocalTransport())
+
+    def use_transport(self, transport: Transport) -> None:
+        self.transport = transport
+        transport.start(self._deliver)
+
+    # ---- publishing ---------------------------------------------------------------
+    async def on_change(self, change: Change) -> None:
+        if change.kinds == ("stats",):
+            return
+        payload = {"v": change.version, "kinds": list(change.kinds), "op": change.op, "rows": change.rows}
+        frame = b"id: %d\nevent: change\ndata: %s\n\n" % (change.version, dumps(payload))
+        await self.transport.send(change.user_id, frame)
+
+    def _deliver(self, user_id: str, frame: bytes) -> None:
+        with self._lock:
+            subs = list(self._subs.get(user_id, ()))
+        for sub in subs:
+            before = sub.dropped
+            sub.offer(frame)
+            self.sent += 1
+            self.resyncs += sub.dropped != before
+
+    # ---- subscribing --------------------------------------------------------------
+    def streams(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._subs.get(user_id, ()))
+
+    def subscribe(self, user_id: str, limit: Optional[int] = None) -> Optional[Subscription]:
+        """A new stream for `user_id`, or None if they already have `limit` open."""
+        with self._lock:
+            subs = self._subs.get(user_id, set())
+            if limit is not None and len(subs) >= limit:
+                return None
+            sub = Subscription(user_id, self.queue_size)
+            subs.add(sub)
+            self._subs[user_id] = subs
+            return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        """Idempotent, so both the stream and the response can call it."""
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            users, streams = len(self._subs), sum(len(s) for s in self._subs.values())
+        return {
+            "users": users,
+            "streams": streams,
+            "frames_sent": self.sent,
+            "resyncs": self.resyncs,
+            "queue_size": self.queue_size,
+            "heartbeat_s": EVENTS_HEARTBEAT_S,
+        }
+
+
+broadcaster = Broadcaster()
+changes.subscribe(broadcaster.on_change)
+
+
+async def _stream(sub: Subscription, heartbeat: float):
+    try:
+        yield b"retry: 3000\nevent: hello\ndata: %s\n\n" % dumps({"v": changes.version(sub.user_id)})
+        while True:
+            try:
+                yield await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield PING
+    finally:
+        # runs when the client disconnects (the response task is cancelled)
+        broadcaster.unsubscribe(sub)
+
+
+@router.get("/events")
+async def events(user = Depends(get_user)):
+    # the cap is checked and the slot taken in one step, so parallel opens can't overshoot it
+    sub = broadcaster.subscribe(str(user["id"]), EVENTS_MAX_PER_USER)
+    if sub is None:
+        raise HTTPException(status_code=429, detail="Too many open event streams")
+    return StreamingResponse(
+        _stream(sub, EVENTS_HEARTBEAT_S),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # also frees the slot if the body never started (the generator's finally can't run)
+        background=BackgroundTask(broadcaster.unsubscribe, sub),
+    )
@@ -0,0 +1,224 @@
+# app/fastjson.py
+"""
+DB rows -> JSON bytes without building pydantic models.
+
+List endpoints used to build an ApiJob per row and then let FastAPI validate
+and serialize each one again through `response_model`. Rows from our own
+database are already trusted and JSON-shaped, so the fast path just keeps
+the fields the response model declares (recursing into nested models) and
+encodes the result once, with orjson when it's installed.
+
+`dump_normalized` is the opt-in alternative to embedding a related row in
+every list row: each row keeps only its foreign key and the related rows are
+sent once, in a map keyed by id.
+
+When the client negotiated a binary format (app/wire.py sets
+`wire_format`), `dump_rows` and `dump_normalized` encode in it directly and
+convert the model's UUID and datetime fields from the strings PostgREST
+returns to native values, compiled once per model. Other responses stay
+JSON here and are transcoded by the middleware.
+
+`response_model` stays on the routes for the OpenAPI schema; returning a
+Response directly makes FastAPI skip its validation.
+"""
+from __future__ import annotations
+
+import json
+import typing
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type
+from uuid import UUID
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from .timing import phase
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+
+def _default(v: Any) -> Any:
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, UUID):
+        return str(v)
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def _encode(obj: Any) -> bytes:
+    if orjson is not None:
+        # orjson encodes UUID/datetime natively
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+
+def dumps(obj: Any) -> bytes:
+    with phase("serialize"):
+        return _encode(obj)
+
+
+class WireFormat(typing.Protocol):
+    media_type: str
+
+    def pack(self, obj: Any) -> bytes: ...
+    def uuid(self, value: Any) -> Any: ...  # a UUID or its string, as this format packs it
+
+
+# the binary format this request's client asked for; None means JSON
+wire_format: ContextVar[Optional[WireFormat]] = ContextVar("wire_format", default=None)
+
+
+class WireBytes(bytes):
+    """Encoded body that knows its media type (a binary format instead of JSON)."""
+
+    media_type: str
+
+    def __new__(cls, data: bytes, media_type: str):
+        self = super().__new__(cls, data)
+        self.media_type = media_type
+        return self
+
+
+class RawJSONResponse(Response):
+    """JSON response that passes pre-encoded bytes through untouched.
+
+    Bytes from the binary fast path (WireBytes) go out with their own media type.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any = None, *args, **kwargs):
+        if isinstance(content, WireBytes):
+            kwargs.setdefault("media_type", content.media_type)
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+Projector = Callable[[Dict[str, Any]], Dict[str, Any]]
+_projectors: Dict[type, Projector] = {}
+
+
+def _nested_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """BaseModel inside X or Optional[X], else None."""
+    candidates = typing.get_args(annotation) or (annotation,)
+    for c in candidates:
+        if isinstance(c, type) and issubclass(c, BaseModel):
+            return c
+    return None
+
+
+def projector(model: Type[BaseModel]) -> Projector:
+    """Compile (once per model) a function that reshapes a row like `model` would."""
+    if model in _projectors:
+        return _projectors[model]
+    plain = []
+    nested = []
+    for name, field in model.model_fields.items():
+        sub = _nested_model(field.annotation)
+        if sub is None:
+            plain.append(name)
+        else:
+            nested.append((name, projector(sub)))
+
+    def project(row: Dict[str, Any]) -> Dict[str, Any]:
+        out = {k: row.get(k) for k in plain}
+        for k, sub_project in nested:
+            v = row.get(k)
+            out[k] = sub_project(v) if isinstance(v, dict) else None
+        return out
+
+    _projectors[model] = project
+    return project
+
+
+def _to_datetime(v: Any) -> Any:
+    if v is None:
+        return None
+    if not isinstance(v, datetime):
+        v = datetime.fromisoformat(str(v))
+    return v if v.tzinfo is not None else v.replace(tzinfo=timezone.utc)
+
+
+_typed_projectors: Dict[Tuple[type, str], Projector] = {}
+
+
+def typed_projector(model: Type[BaseModel], fmt: WireFormat) -> Projector:
+    """Like `projector`, but UUID and datetime fields come out as `fmt`'s native values."""
+    key = (model, fmt.media_type)
+    if key in _typed_projectors:
+        return _typed_projectors[key]
+    to_uuid = lambda v: None if v is None else fmt.uuid(v)
+    fields = []
+    for name, field in model.model_fields.items():
+        sub = _nested_model(field.annotation)
+        kinds = typing.get_args(field.annotation) or (field.annotation,)
+        if sub is not None:
+            fields.append((name, typed_projector(sub, fmt), True))
+        elif UUID in kinds:
+            fields.append((name, to_uuid, False))
+        elif datetime in kinds:
+            fields.append((name, _to_datetime, False))
+        else:
+            fields.append((name, None, False))
+
+    def project(row: Dict[str, Any]) -> Dict[str, Any]:
+        out = {}
+        for k, convert, nested in fields:
+            v = row.get(k)
+            if nested:
+                v = convert(v) if isinstance(v, dict) else None
+            elif convert is not None:
+                v = convert(v)
+            out[k] = v
+        return out
+
+    _typed_projectors[key] = project
+    return project
+
+
+def dump_rows(rows: Iterable[Dict[str, Any]], model: Type[BaseModel]) -> bytes:
+    fmt = wire_format.get()
+    if fmt is not None:
+        project = typed_projector(model, fmt)
+        with phase("serialize"):
+            return WireBytes(fmt.pack([project(r) for r in rows]), fmt.media_type)
+    project = projector(model)
+    with phase("serialize"):
+        return _encode([project(r) for r in rows])
+
+
+def dump_normalized(
+    rows: Iterable[Dict[str, Any]],
+    model: Type[BaseModel],
+    field: str,
+    related: Iterable[Dict[str, Any]],
+    keys: Tuple[str, str],
+) -> bytes:
+    """{keys[0]: rows without `field`, keys[1]: {id: related row}}, projected like `model`."""
+    fmt = wire_format.get()
+    related_model = _nested_model(model.model_fields[field].annotation)
+    if fmt is not None:
+        project, project_related = typed_projector(model, fmt), typed_projector(related_model, fmt)
+        with phase("serialize"):
+            items = []
+            for r in rows:
+                out = project(r)
+                del out[field]
+                items.append(out)
+            by_id = {fmt.uuid(c["id"]): project_related(c) for c in related}
+            return WireBytes(fmt.pack({keys[0]: items, keys[1]: by_id}), fmt.media_type)
+    plain = [k for k in model.model_fields if k != field]
+    project_related = projector(related_model)
+    with phase("serialize"):
+        items = [{k: r.get(k) for k in plain} for r in rows]
+        by_id = {str(c["id"]): project_related(c) for c in related}
+        return _encode({keys[0]: items, keys[1]: by_id})
@@ -0,0 +1,30 @@
+# app/http.py
+"""
+Shared keep-alive HTTP client for Supabase Auth round trips.
+
+Both auth paths (app/auth.py and the top-level auth.py) verify through it,
+so TLS connections are reused across requests and the calls are timed as
+`supabase_auth`. Each app's lifespan closes it on shutdown.
+"""
+from typing import Optional
+
+import httpx
+
+from .timing import instrument_httpx
+
+_http: Optional[httpx.AsyncClient] = None
+
+
+def http_client() -> httpx.AsyncClient:
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(timeout=10)
+        instrument_httpx(_http, "supabase_auth")
+    return _http
+
+
+async def aclose() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
@@ -1,25 +1,169 @@
 # app/jobs.py
-from fastapi import APIRouter, Depends, HTTPException, Query
-from .deps import sb, get_user
-from .models import JobIn
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import repo
+from .bulk import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, run_import
+from .changes import list_etag, not_modified, publish, set_etag
+from .db import get_session, read_scope, session_scope
+from .deps import get_read_session, get_user
+from .fastjson import RawJSONResponse, dumps
+from .timing import phase
+from .listcache import list_cache
+from .search import search_index
+from .stats import insert_deltas
+from .models import JobIn, JobImport
+from .pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    decode_cursor, split_page, aiter_rows, andjson_lines,
+)
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 @router.get("")
-async def list_jobs(status: str | None = Query(default=None), user = Depends(get_user)):
-    q = sb.table("jobs").select("*").eq("user_id", user["id"])
-    if status:
-        q = q.eq("status", status)
-    r = q.order("created_at", desc=True).execute()
-    return r.data
+async def list_jobs(
+    request: Request,
+    status: str | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(default=None),
+    stream: bool = Query(default=False),
+    user = Depends(get_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    if cursor:
+        decode_cursor(cursor)
+
+    if stream:
+        # NDJSON, one page in memory at a time. The request session is closed
+        # before the body is sent, so the stream opens its own.
+        async def rows():
+            async with read_scope(user["id"]) as sdb:
+                async def fetch(c, n):
+                    return await repo.list_jobs(sdb, user["id"], status, c, n)
+                async for row in aiter_rows(fetch, cursor, limit):
+                    yield row
+
+        return StreamingResponse(andjson_lines(rows()), media_type="application/x-ndjson")
+
+    # the tag is taken before the query, so it can only be older than the rows
+    version = await repo.data_version(db, user["id"])
+    tag = list_etag(request, user["id"], version)
+    if (hit := not_modified(request, tag)) is not None:
+        return hit
+
+    async def load():
+        rows, next_cursor = split_page(await repo.list_jobs(db, user["id"], status, cursor, limit + 1), limit)
+        return dumps(rows), next_cursor
+
+    body, next_cursor = await list_cache.get_or_load("jobs", user["id"], f"{status}|{cursor}|{limit}", load, version)
+    response = RawJSONResponse(body)
+    set_etag(response, tag)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+@router.get("/search")
+async def search_jobs(
+    q: str = Query(min_length=1, max_length=200),
+    status: str | None = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    user = Depends(get_user),
+):
+    """Jobs whose title, description or client name contain every word of `q`
+    (the last word as a prefix), newest first."""
+    async def load():
+        # the primary: a snapshot from a lagging replica would stay stale
+        async with session_scope() as db:
+            return await repo.search_source(db, user["id"])
+
+    index = await search_index.get(user["id"], load)
+    with phase("search"):
+        hits = index.search(q, status, limit)
+    return RawJSONResponse(dumps(hits))
 
 @router.post("")
-async def create_job(payload: JobIn, user = Depends(get_user)):
+async def create_job(payload: JobIn, user = Depends(get_user), db: AsyncSession = Depends(get_session)):
     # ensure client belongs to this user
-    c = sb.table("clients").select("id,user_id").eq("id", payload.client_id).single().execute()
-    if not c.data or c.data["user_id"] != user["id"]:
+    c = await repo.get_client(db, payload.client_id)
+    if not c or str(c["user_id"]) != str(user["id"]):
         raise HTTPException(status_code=400, detail="Client not found or not yours")
-    r = sb.table("jobs").insert({
-        "user_id": user["id"], **payload.model_dump()
-    }).select("*").execute()
-    return r.data[0]
+    row = await repo.insert_job(db, user["id"], payload.model_dump())
+    await repo.bump_rollups(db, user["id"], insert_deltas([row]))
+    await repo.log_changes(db, user["id"], "job", [row["id"]])
+    await db.commit()
+    search_index.add_jobs(user["id"], [row])
+    await publish(user["id"], ("jobs",), "create", [row])
+    return row
+
+def _valid_uuid(value: str) -> bool:
+    try:
+        UUID(value)
+        return True
+    except ValueError:
+        return False
+
+@router.post("/bulk")
+async def bulk_create_jobs(
+    request: Request,
+    batch_size: int = Query(default=DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    user = Depends(get_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Import jobs from an NDJSON or CSV body.
+
+    Each row names an existing `client_id` or a `client_name`; unknown names
+    are created once (deduped across the whole upload) and reused.
+    """
+    by_name: dict = {}  # client name -> id, for this upload
+    owned: set = set()  # client ids verified as this user's
+
+    async def apply(batch):
+        names = {m.client_name for _, m in batch if not m.client_id and m.client_name} - by_name.keys()
+        ids = {m.client_id for _, m in batch if m.client_id and _valid_uuid(m.client_id)} - owned
+        try:
+            found = {r["name"]: str(r["id"]) for r in await repo.find_clients_by_names(db, user["id"], list(names))}
+            emails = {}
+            for _, m in batch:
+                if m.client_name in names and m.client_name not in found:
+                    emails.setdefault(m.client_name, m.client_email)
+            created = await repo.insert_clients(
+                db, user["id"], [{"name": n, "email": e} for n, e in emails.items()]
+            )
+            found.update({r["name"]: str(r["id"]) for r in created})
+            mine = await repo.owned_client_ids(db, user["id"], list(ids))
+
+            rows, errors = [], []
+            for line, m in batch:
+                if m.client_id:
+                    if m.client_id not in owned and m.client_id not in mine:
+                        errors.append((line, "Client not found or not yours"))
+                        continue
+                    client_id = m.client_id
+                elif m.client_name:
+                    client_id = by_name.get(m.client_name) or found[m.client_name]
+                else:
+                    errors.append((line, "client_id or client_name is required"))
+                    continue
+                rows.append({
+                    "client_id": client_id,
+                    "title": m.title,
+                    "description": m.description,
+                    "price_cents": m.price_cents,
+                    "status": m.status,
+                })
+            inserted = await repo.insert_jobs(db, user["id"], rows)
+            await repo.bump_rollups(db, user["id"], insert_deltas(inserted))
+            await repo.log_changes(db, user["id"], "client", [r["id"] for r in created])
+            await repo.log_changes(db, user["id"], "job", [r["id"] for r in inserted])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        search_index.drop(user["id"])  # rows aren't returned; rebuilt on the next search
+        await publish(user["id"], ("jobs", "clients") if created else ("jobs",), "create")
+        by_name.update(found)
+        owned.update(mine)
+        return len(inserted), 0, errors
+
+    return await run_import(request, JobImport, apply, batch_size)
@@ -0,0 +1,142 @@
+# app/listcache.py
+"""
+Read-through cache for per-user list endpoints.
+
+Entries are the encoded response body (plus the next-page cursor), keyed by
+(kind, user, generation, data version, query shape). A write bumps the
+(kind, user) generation through the change feed in app/changes.py, which
+orphans every cached shape for that user and kind at once; orphans age out
+via LRU/TTL. The data version (`repo.data_version`, the route's ETag input)
+does the same for writes made on another worker. Both are read before the
+query runs, so a page fetched while a write lands is stored under the old
+key and never served.
+
+The backend is pluggable: anything with async get/set/incr (e.g. a Redis
+wrapper) can replace the in-process one when several workers share data.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol, Tuple
+
+from .cache import TTLCache
+from .changes import Change, changes
+
+LIST_CACHE_TTL = float(os.environ.get("LIST_CACHE_TTL", "30"))
+LIST_CACHE_SIZE = int(os.environ.get("LIST_CACHE_SIZE", "2048"))
+# generations must outlive every entry stored under them
+LIST_CACHE_GEN_TTL = float(os.environ.get("LIST_CACHE_GEN_TTL", str(LIST_CACHE_TTL * 10)))
+LIST_CACHE_GEN_SIZE = int(os.environ.get("LIST_CACHE_GEN_SIZE", str(LIST_CACHE_SIZE * 4)))
+
+# (body bytes, next cursor or None)
+Entry = Tuple[bytes, Optional[str]]
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[Any]: ...
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+    async def incr(self, key: str) -> int: ...
+    def stats(self) -> Dict[str, Any]: ...
+
+
+class MemoryBackend:
+    """Process-local backend: values and generations in bounded TTLCaches.
+
+    Generations come from one process-wide sequence, and a generation that
+    was evicted or expired is replaced by a fresh one on its next read, so a
+    lost generation never repeats a value entries may still be stored under.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = LIST_CACHE_SIZE,
+        gen_maxsize: int = LIST_CACHE_GEN_SIZE,
+        gen_ttl: float = LIST_CACHE_GEN_TTL,
+    ):
+        self._values = TTLCache(maxsize=maxsize)
+        self._counters = TTLCache(maxsize=gen_maxsize, ttl=gen_ttl)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key.startswith("gen:"):
+            with self._lock:
+                n = self._counters.get(key)
+                if n is None:
+                    n = next(self._seq)
+                    self._counters.set(key, n)
+            return n
+        return self._values.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._values.set(key, value, ttl=ttl)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            n = next(self._seq)
+            self._counters.set(key, n)
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._values.stats(), "generations": len(self._counters)}
+
+
+class ListCache:
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = LIST_CACHE_TTL):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _gen_key(kind: str, user_id) -> str:
+        return f"gen:{kind}:{user_id}"
+
+    async def get_or_load(
+        self,
+        kind: str,
+        user_id,
+        shape: str,
+        load: Callable[[], Awaitable[Entry]],
+        data_version: int = 0,
+    ) -> Entry:
+        gen = await self.backend.get(self._gen_key(kind, user_id)) or 0
+        digest = hashlib.sha256(shape.encode()).hexdigest()[:16]
+        key = f"{kind}:{user_id}:{gen}.{data_version}:{digest}"
+        entry = await self.backend.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = await load()
+        await self.backend.set(key, entry, self.ttl)
+        return entry
+
+    async def invalidate(self, kind: str, user_id) -> None:
+        self.invalidations += 1
+        await self.backend.incr(self._gen_key(kind, user_id))
+
+    async def on_change(self, change: Change) -> None:
+        for kind in change.kinds:
+            await self.invalidate(kind, change.user_id)
+
+    def use_backend(self, backend: CacheBackend) -> None:
+        self.backend = backend
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "backend": self.backend.stats(),
+        }
+
+
+list_cache = ListCache()
+changes.subscribe(list_cache.on_change)
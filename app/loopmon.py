@@ -0,0 +1,57 @@
+# app/loopmon.py
+"""
+Event-loop lag monitor.
+
+A background task sleeps for a fixed interval and records how late it wakes
+up. Anything that blocks the loop (sync I/O in an `async def`, heavy CPU)
+shows up directly as lag.
+"""
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, window: int = 600):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self._samples.append(lag)
+            self._max = max(self._max, lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        s = sorted(self._samples)
+        if not s:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0}
+        pct = lambda p: s[min(len(s) - 1, int(len(s) * p))] * 1000
+        return {
+            "samples": len(s),
+            "p50_ms": round(pct(0.50), 3),
+            "p99_ms": round(pct(0.99), 3),
+            "last_ms": round(self._samples[-1] * 1000, 3),
+            "max_ms": round(self._max * 1000, 3),
+        }
+
+
+monitor = LoopLagMonitor()
@@ -1,14 +1,96 @@
 # app/main.py
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+from . import db, http
+from .batch import router as batch_router
 from .clients import router as clients_router
+from .compression import CompressionMiddleware, stats as response_compression
+from .deps import close_sb, get_sb, user_cache_stats
+from .events import broadcaster, router as events_router
 from .jobs import router as jobs_router
-from .payments import router as payments_router
-from .stripe_webhook import router as stripe_router
+from .listcache import list_cache
+from .loopmon import monitor
+from .search import search_index
+from .stats import router as stats_router
+from .sync import router as sync_router
+from .payments import get_stripe, router as payments_router
+from .stripe_webhook import router as stripe_router, start_worker, stop_worker
+from .timing import TimingMiddleware, metrics_response
+from .wire import WireFormatMiddleware
 
-app = FastAPI(title="Prello API", version="1.0.0")
+log = logging.getLogger("uvicorn.error")
+
+# build the Supabase client, import stripe and create the engine right after
+# startup instead of on the first request that needs them
+WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "1") != "0"
+_warmup: dict = {}
+
+
+def _warm():
+    for name, fn in (("supabase", get_sb), ("stripe", get_stripe), ("db", db._ensure_engine)):
+        started = time.perf_counter()
+        try:
+            fn()
+            _warmup[name] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            # not fatal: the first request that needs it retries and reports the error
+            _warmup[name] = f"failed: {e}"
+            log.warning(f"warm-up of {name} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    monitor.start()
+    await start_worker()
+    # in the background, so /health answers while SDKs load
+    warm = asyncio.create_task(run_in_threadpool(_warm)) if WARM_ON_STARTUP else None
+    yield
+    if warm is not None:
+        await warm  # a thread can't be cancelled; let it finish before disposing
+    await stop_worker()
+    await http.aclose()
+    await broadcaster.transport.close()
+    await monitor.stop()
+    await db.dispose()
+    close_sb()
+
+app = FastAPI(title="Prello API", version="1.0.0", lifespan=lifespan)
+app.add_middleware(WireFormatMiddleware)  # msgpack / CBOR by Accept and Content-Type
+app.add_middleware(CompressionMiddleware)  # inside timing, so its time shows as a phase
+app.add_middleware(TimingMiddleware)
+app.add_route("/metrics", metrics_response, include_in_schema=False)
 
 @app.get("/health")
-def health(): return {"ok": True}
+async def health(): return {"ok": True}
+
+@app.get("/health/startup")
+def startup_stats(): return {"warm_on_startup": WARM_ON_STARTUP, "warmed_ms": _warmup}
+
+@app.get("/health/loop")
+def loop_lag(): return monitor.stats()
+
+@app.get("/health/db/pool")
+def db_pool_stats(): return db.pool_stats() or {"engine": "not created"}
+
+@app.get("/health/cache")
+def list_cache_stats(): return list_cache.stats()
+
+@app.get("/health/auth")
+def auth_cache_stats(): return user_cache_stats()
+
+@app.get("/health/events")
+def event_stream_stats(): return broadcaster.stats()
+
+@app.get("/health/search")
+def search_index_stats(): return search_index.stats()
+
+@app.get("/health/compression")
+def compression_stats(): return response_compression.as_dict()
 
 @app.get("/")
 def root(): return {"name": "prello-api"}
@@ -18,3 +100,7 @@ app.include_router(clients_router)
 app.include_router(jobs_router)
 app.include_router(payments_router)
 app.include_router(stripe_router)
+app.include_router(stats_router)
+app.include_router(events_router)
+app.include_router(batch_router)
+app.include_router(sync_router)
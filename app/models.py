@@ -17,3 +17,13 @@ class JobIn(BaseModel):
 
 class CheckoutOut(BaseModel):
     checkout_url: str
+
+class JobImport(BaseModel):
+    # one row of POST /jobs/bulk: an existing client_id, or a client by name
+    client_id: Optional[str] = None
+    client_name: Optional[str] = None
+    client_email: Optional[str] = None
+    title: str
+    description: Optional[str] = None
+    price_cents: int = Field(ge=0)
+    status: str = "active_unscheduled"
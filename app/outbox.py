@@ -0,0 +1,233 @@
+# app/outbox.py
+"""
+Durable inbox for verified Stripe webhook events.
+
+The webhook handler only verifies the signature and appends the event to a
+local SQLite file, then acks. Stripe event ids are the primary key, so
+retried deliveries are dropped on insert. `OutboxWorker` drains the file in
+batches in the background; when a batch fails its events are applied one at
+a time, and the ones that still fail are retried with exponential backoff.
+
+Claiming an event leases it (pushes `next_attempt_at` forward) instead of
+deleting it, so an event whose worker died mid-batch is picked up again
+once the lease runs out. Handlers must therefore be idempotent.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+log = logging.getLogger("uvicorn.error")
+
+_SCHEMA = """
+create table if not exists stripe_events (
+    event_id        text primary key,
+    type            text not null,
+    payload         text not null,
+    status          text not null default 'pending',   -- pending | done | dead
+    attempts        integer not null default 0,
+    next_attempt_at real not null,
+    last_error      text,
+    received_at     real not null
+);
+create index if not exists stripe_events_due on stripe_events (status, next_attempt_at);
+"""
+
+
+class Outbox:
+    def __init__(self, path: str, lease_seconds: float = 60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=full")  # an ack means the event is on disk
+        self._conn.execute("pragma busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    def put(self, event_id: str, etype: str, payload: Dict[str, Any]) -> bool:
+        """Store an event; False if this event id was already received."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "insert or ignore into stripe_events (event_id, type, payload, next_attempt_at, received_at) "
+                "values (?, ?, ?, ?, ?)",
+                (event_id, etype, json.dumps(payload), now, now),
+            )
+        return cur.rowcount == 1
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """Lease up to `limit` due events, oldest first."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                update stripe_events
+                set attempts = attempts + 1, next_attempt_at = ?
+                where event_id in (
+                    select event_id from stripe_events
+                    where status = 'pending' and next_attempt_at <= ?
+                    order by received_at limit ?
+                )
+                returning event_id, type, payload, attempts
+                """,
+                (now + self.lease_seconds, now, limit),
+            ).fetchall()
+        return [
+            {"id": r[0], "type": r[1], "payload": json.loads(r[2]), "attempts": r[3]}
+            for r in rows
+        ]
+
+    def done(self, event_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "update stripe_events set status = 'done', last_error = null where event_id = ?",
+                [(i,) for i in event_ids],
+            )
+
+    def retry(self, event_ids: List[str], error: str, delay: float, dead: bool = False) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "update stripe_events set status = ?, next_attempt_at = ?, last_error = ? where event_id = ?",
+                [("dead" if dead else "pending", time.time() + delay, error[:500], i) for i in event_ids],
+            )
+
+    def prune(self, older_than: float) -> int:
+        """Forget finished events once Stripe can no longer redeliver them."""
+        with self._lock:
+            cur = self._conn.execute(
+                "delete from stripe_events where status = 'done' and received_at < ?",
+                (time.time() - older_than,),
+            )
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("select status, count(*) from stripe_events group by status").fetchall()
+        return {status: n for status, n in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+Handler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class OutboxWorker:
+    """Background task applying leased events in batches via `handler(events)`."""
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        handler: Handler,
+        batch_size: int = 100,
+        idle_interval: float = 1.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        max_attempts: int = 10,
+        retention: float = 4 * 86400,  # Stripe retries deliveries for up to 3 days
+    ):
+        self.outbox = outbox
+        self.handler = handler
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+        self.applied = 0
+        self.failed_batches = 0
+        self.failed_events = 0
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()  # before draining, so a put during the drain isn't missed
+            try:
+                n = await self.drain_once()
+            except Exception as e:  # never let the loop die
+                log.exception(f"stripe outbox worker error: {e}")
+                n = 0
+            if n < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.idle_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> int:
+        """Apply one batch; returns how many events were claimed.
+
+        If the batch fails, its events are applied one at a time, so a single
+        bad event is retried (and eventually dead-lettered) on its own instead
+        of holding back the rest.
+        """
+        batch = await run_in_threadpool(self.outbox.claim, self.batch_size)
+        if not batch:
+            await self._maybe_prune()
+            return 0
+        try:
+            await self.handler(batch)
+        except Exception as e:
+            self.failed_batches += 1
+            if len(batch) == 1:
+                await self._failed(batch[0], e)
+                return 1
+            log.warning(f"stripe outbox batch of {len(batch)} failed, applying one by one: {e}")
+            for event in batch:
+                try:
+                    await self.handler([event])
+                except Exception as err:
+                    await self._failed(event, err)
+                else:
+                    await run_in_threadpool(self.outbox.done, [event["id"]])
+                    self.applied += 1
+            return len(batch)
+        await run_in_threadpool(self.outbox.done, [e["id"] for e in batch])
+        self.applied += len(batch)
+        return len(batch)
+
+    async def _failed(self, event: Dict[str, Any], error: Exception) -> None:
+        attempts = event["attempts"]
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+        dead = attempts >= self.max_attempts
+        self.failed_events += 1
+        log.warning(f"stripe outbox event {event['id']} failed (attempt {attempts}): {error}")
+        await run_in_threadpool(self.outbox.retry, [event["id"]], str(error), delay, dead)
+
+    async def _maybe_prune(self) -> None:
+        now = time.time()
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            await run_in_threadpool(self.outbox.prune, self.retention)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "applied": self.applied, "failed_batches": self.failed_batches,
+            "failed_events": self.failed_events, **self.outbox.stats(),
+        }
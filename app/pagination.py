@@ -0,0 +1,141 @@
+# app/pagination.py
+"""
+Keyset pagination over (created_at, id), newest first.
+
+The cursor is an opaque url-safe token wrapping the (created_at, id) of the
+last row on a page. The next page is everything strictly "before" it, which
+the database answers from the (created_at, id) ordering without an OFFSET
+scan. Helpers exist for both PostgREST builders and SQL (app/repo.py).
+
+created_at has a default but no NOT NULL, so a row may lack it. Postgres
+sorts NULLs first in descending order; a cursor on such a row carries a
+null timestamp, and the next page is the remaining NULL rows (by id) and
+then every dated row.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .fastjson import dumps
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+IN_FILTER_CHUNK = 150  # ids per `in.(...)` filter; ~5.5 KB of query string
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = dumps([row["created_at"], row["id"]])  # created_at may be null
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Optional[str], str]:
+    """(created_at or None, id) from a cursor; 400 if it isn't one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        if row_id is None:
+            raise ValueError(raw)
+        return (None if created_at is None else str(created_at)), str(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(cursor: str) -> str:
+    """PostgREST `or=` expression for rows after `cursor` in (created_at, id) desc order."""
+    created_at, row_id = decode_cursor(cursor)
+    if created_at is None:
+        return f'and(created_at.is.null,id.lt."{row_id}"),created_at.not.is.null'
+    # quote values: timestamps contain ':' and '+', which are reserved in or=()
+    return (
+        f'created_at.lt."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.lt."{row_id}")'
+    )
+
+
+def keyset_sql(cursor: str) -> Tuple[str, Dict[str, Any]]:
+    """SQL predicate + params for rows after `cursor` (row-value comparison)."""
+    created_at, row_id = decode_cursor(cursor)
+    if created_at is None:
+        return "((created_at is null and id < :cursor_id) or created_at is not null)", {"cursor_id": row_id}
+    try:
+        ts = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return "(created_at, id) < (:cursor_created_at, :cursor_id)", {
+        "cursor_created_at": ts,
+        "cursor_id": row_id,
+    }
+
+
+def page_query(q, cursor: Optional[str], limit: int):
+    """Apply cursor, ordering and limit to a PostgREST select builder.
+
+    Fetches one extra row so `split_page` can tell whether another page exists.
+    """
+    if cursor:
+        q = q.or_(keyset_filter(cursor))
+    return q.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+
+def fetch_in(build: Callable[[], Any], column: str, values: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Rows whose `column` is in `values`: one request unless there are more than IN_FILTER_CHUNK."""
+    values = list(values)
+    out: List[Dict[str, Any]] = []
+    for start in range(0, len(values), IN_FILTER_CHUNK):
+        resp = build().in_(column, values[start:start + IN_FILTER_CHUNK]).execute()
+        out += getattr(resp, "data", []) or []
+    return out
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def iter_rows(
+    build: Callable[[], Any],
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Yield rows page by page; `build()` returns a fresh filtered select builder."""
+    while True:
+        resp = page_query(build(), cursor, page_size).execute()
+        rows, cursor = split_page(getattr(resp, "data", []) or [], page_size)
+        yield from rows
+        if not cursor:
+            return
+
+
+async def aiter_rows(
+    fetch: Callable[[Optional[str], int], Awaitable[List[Dict[str, Any]]]],
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async twin of `iter_rows`; `fetch(cursor, n)` returns up to n rows after cursor."""
+    while True:
+        rows, cursor = split_page(await fetch(cursor, page_size + 1), page_size)
+        for row in rows:
+            yield row
+        if not cursor:
+            return
+
+
+async def andjson_lines(rows: AsyncIterator[Any], dump: Callable[[Any], Any] = dumps) -> AsyncIterator[bytes]:
+    async for row in rows:
+        line = dump(row)
+        yield (line if isinstance(line, bytes) else line.encode()) + b"\n"
+
+
+def ndjson_lines(rows: Iterator[Any], dump: Callable[[Any], Any]) -> Iterator[bytes]:
+    for row in rows:
+        line = dump(row)
+        yield (line if isinstance(line, bytes) else line.encode()) + b"\n"
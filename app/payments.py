@@ -1,37 +1,75 @@
 # app/payments.py
-import os, stripe
+import os
 from fastapi import APIRouter, Depends, HTTPException
-from .deps import sb, get_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import repo
+from .changes import publish
+from .checkout import CheckoutSessions
+from .db import get_session
+from .deps import get_user
 from .models import CheckoutOut
 
 router = APIRouter(prefix="/jobs", tags=["payments"])
-stripe.api_key = os.environ["STRIPE_SECRET_KEY"]
 
 CURRENCY = os.environ.get("STRIPE_CURRENCY", "usd")
 SUCCESS_URL = os.environ.get("SUCCESS_URL", "https://prello.app/success")
 CANCEL_URL  = os.environ.get("CANCEL_URL",  "https://prello.app/cancel")
 
+sessions = CheckoutSessions()
+_stripe = None
+
+
+def get_stripe():
+    """The stripe SDK, imported and keyed on first use (it's the slowest import we have)."""
+    global _stripe
+    if _stripe is None:
+        key = os.environ.get("STRIPE_SECRET_KEY")
+        if not key:
+            raise HTTPException(status_code=500, detail="STRIPE_SECRET_KEY not set")
+        import stripe
+
+        stripe.api_key = key
+        _stripe = stripe
+    return _stripe
+
 @router.post("/{job_id}/checkout", response_model=CheckoutOut)
-async def create_checkout(job_id: str, user = Depends(get_user)):
-    job = sb.table("jobs").select("*").eq("id", job_id).single().execute().data
-    if not job or job["user_id"] != user["id"]:
+async def create_checkout(job_id: str, user = Depends(get_user), db: AsyncSession = Depends(get_session)):
+    job = await repo.get_job(db, job_id)
+    if not job or str(job["user_id"]) != str(user["id"]):
         raise HTTPException(status_code=404, detail="Job not found")
 
-    sess = stripe.checkout.Session.create(
-        mode="payment",
-        currency=CURRENCY,
-        line_items=[{
-            "price_data": {
-                "currency": CURRENCY,
-                "product_data": {"name": job["title"]},
-                "unit_amount": job["price_cents"],
-            },
-            "quantity": 1,
-        }],
-        success_url=SUCCESS_URL,
-        cancel_url=CANCEL_URL,
-        automatic_payment_methods={"enabled": True}  # BNPL shows when enabled in Stripe dashboard
+    amount = job["price_cents"]
+    stripe = get_stripe()
+
+    def create(idempotency_key):
+        return stripe.checkout.Session.create(
+            mode="payment",
+            currency=CURRENCY,
+            line_items=[{
+                "price_data": {
+                    "currency": CURRENCY,
+                    "product_data": {"name": job["title"]},
+                    "unit_amount": amount,
+                },
+                "quantity": 1,
+            }],
+            success_url=SUCCESS_URL,
+            cancel_url=CANCEL_URL,
+            automatic_payment_methods={"enabled": True},  # BNPL shows when enabled in Stripe dashboard
+            idempotency_key=idempotency_key,
+        )
+
+    # repeated taps reuse the job's open session instead of creating another
+    sess = await sessions.get_or_create(
+        (job_id, amount, CURRENCY),
+        create,
+        retrieve=stripe.checkout.Session.retrieve,
+        known_session_id=job.get("checkout_session_id"),
     )
 
-    sb.table("jobs").update({"checkout_session_id": sess.id}).eq("id", job_id).execute()
-    return {"checkout_url": sess.url}
+    if sess["id"] != job.get("checkout_session_id"):
+        await repo.set_checkout_session(db, job_id, sess["id"])
+        await repo.log_changes(db, user["id"], "job", [job_id])
+        await db.commit()
+        await publish(user["id"], ("jobs",), "checkout", [{"id": job_id, "checkout_session_id": sess["id"]}])
+    return {"checkout_url": sess["url"]}
@@ -0,0 +1,182 @@
+# app/replicas.py
+"""
+Read replicas for app/db.py.
+
+SUPABASE_DB_REPLICA_URLS (comma-separated) adds read-only engines next to the
+primary. `read_scope()` in app/db.py hands out a session on the least busy
+healthy replica, except:
+
+- for a short window (DB_READ_YOUR_WRITES_S) after a user writes, their
+  reads stay on the primary so they see their own write despite replica lag.
+  The window is never shorter than DB_REPLICA_MAX_LAG_S, the most lag a
+  replica is still read at, so a read that fills the list cache or an ETag
+  can't come from a replica that hasn't replayed the write (0 disables it).
+  Writes are noticed through the change feed, which every write path already
+  publishes to, so stickiness is per process like the feed itself;
+- when no replica is healthy, reads fall back to the primary.
+
+A replica is ejected for DB_REPLICA_EJECT_S after a connection-level error
+(or, on Postgres, replay lag over DB_REPLICA_MAX_LAG_S). Probes run lazily
+from `pick()` every DB_REPLICA_PROBE_S and bring it back once it answers.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import exc, text
+
+from .cache import TTLCache
+
+log = logging.getLogger("uvicorn.error")
+
+EJECT_S = float(os.getenv("DB_REPLICA_EJECT_S", "30"))
+PROBE_S = float(os.getenv("DB_REPLICA_PROBE_S", "10"))
+MAX_LAG_S = float(os.getenv("DB_REPLICA_MAX_LAG_S", "10"))
+READ_YOUR_WRITES_S = float(os.getenv("DB_READ_YOUR_WRITES_S", str(MAX_LAG_S)))
+
+
+def replica_urls() -> List[str]:
+    return [u.strip() for u in os.getenv("SUPABASE_DB_REPLICA_URLS", "").split(",") if u.strip()]
+
+
+def is_connection_error(e: BaseException) -> bool:
+    """Errors that say the replica is unreachable, not that the query was bad."""
+    if isinstance(e, exc.DBAPIError) and e.connection_invalidated:
+        return True
+    return isinstance(e, (exc.OperationalError, exc.InterfaceError, ConnectionError, OSError))
+
+
+class Replica:
+    __slots__ = ("name", "engine", "sessions", "down_until", "ejections", "reads", "last_error")
+
+    def __init__(self, name: str, engine, sessions):
+        self.name = name
+        self.engine = engine
+        self.sessions = sessions  # async_sessionmaker bound to engine
+        self.down_until = 0.0
+        self.ejections = 0
+        self.reads = 0
+        self.last_error: Optional[str] = None
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+
+class ReplicaSet:
+    def __init__(self, replicas: List[Replica], window: float = READ_YOUR_WRITES_S):
+        self.replicas = replicas
+        self.window = max(window, MAX_LAG_S) if window > 0 else 0.0
+        self._sticky = TTLCache(maxsize=100_000, ttl=self.window)  # user key -> True
+        self._next_probe = 0.0
+        self._probe: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    # ---- routing -------------------------------------------------------------
+    def mark_write(self, key) -> None:
+        if key is not None and self.window > 0:
+            self._sticky.set(str(key), True)
+
+    def pick(self, key=None) -> Optional[Replica]:
+        """Replica to read from, or None for the primary."""
+        now = time.monotonic()
+        self._maybe_probe(now)
+        if key is not None and self._sticky.get(str(key)):
+            self.sticky_reads += 1
+            return None
+        healthy = [r for r in self.replicas if r.healthy(now)]
+        if not healthy:
+            self.primary_reads += 1
+            return None
+        r = min(healthy, key=lambda r: r.engine.pool.checkedout())
+        r.reads += 1
+        return r
+
+    def eject(self, replica: Replica, error: BaseException | str) -> None:
+        now = time.monotonic()
+        replica.last_error = str(error).splitlines()[0][:200]
+        if replica.healthy(now):  # requests already in flight on it fail too; count it once
+            replica.ejections += 1
+            log.warning(f"read replica {replica.name} ejected for {EJECT_S:.0f}s: {replica.last_error}")
+        replica.down_until = now + EJECT_S
+
+    # ---- health --------------------------------------------------------------
+    def _maybe_probe(self, now: float) -> None:
+        if now < self._next_probe or (self._probe is not None and not self._probe.done()):
+            return
+        self._next_probe = now + PROBE_S
+        try:
+            self._probe = asyncio.get_running_loop().create_task(self.probe())
+        except RuntimeError:  # no loop (sync caller); the next async pick probes
+            self._next_probe = 0.0
+
+    async def probe(self) -> None:
+        for r in self.replicas:
+            try:
+                async with r.engine.connect() as conn:
+                    await conn.execute(text("select 1"))
+                    lag = await _replay_lag(conn)
+                if lag is not None and lag > MAX_LAG_S:
+                    self.eject(r, f"replay lag {lag:.1f}s")
+                elif not r.healthy(time.monotonic()):
+                    log.info(f"read replica {r.name} is back")
+                    r.down_until = 0.0
+            except Exception as e:
+                self.eject(r, e)
+
+    async def close(self) -> None:
+        if self._probe is not None:
+            self._probe.cancel()
+            try:
+                await self._probe
+            except (asyncio.CancelledError, Exception):
+                pass
+        for r in self.replicas:
+            await r.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "read_your_writes_s": self.window,
+            "sticky_users": len(self._sticky),
+            "sticky_reads": self.sticky_reads,
+            "fallback_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "name": r.name,
+                    "healthy": r.healthy(now),
+                    "down_for_s": round(max(0.0, r.down_until - now), 1),
+                    "reads": r.reads,
+                    "ejections": r.ejections,
+                    "last_error": r.last_error,
+                    "pool": r.engine.pool.stats() if hasattr(r.engine.pool, "stats") else None,
+                }
+                for r in self.replicas
+            ],
+        }
+
+
+async def _replay_lag(conn) -> Optional[float]:
+    """Seconds behind the primary (Postgres standbys only)."""
+    if conn.dialect.name != "postgresql":
+        return None
+    # fully replayed counts as 0: the last replay timestamp ages on an idle primary
+    result = await conn.execute(text(
+        "select case when not pg_is_in_recovery() then null "
+        "when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0 "
+        "else extract(epoch from now() - pg_last_xact_replay_timestamp()) end"
+    ))
+    lag = result.scalar()
+    return float(lag) if lag is not None else None
+
+
+def build(urls: List[str], make_engine: Callable[[str], Any], make_sessions: Callable[[Any], Any]) -> ReplicaSet:
+    replicas = []
+    for i, url in enumerate(urls):
+        engine = make_engine(url)
+        replicas.append(Replica(f"replica{i}", engine, make_sessions(engine)))
+    return ReplicaSet(replicas)
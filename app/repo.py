@@ -0,0 +1,351 @@
+# app/repo.py
+"""
+Async data access for the app/ routers, on the SQLAlchemy engine in app/db.py.
+
+Every call awaits the database instead of blocking the event loop the way the
+synchronous Supabase client did. Functions take the request's AsyncSession;
+writers don't commit, so a handler can group several writes in one transaction.
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .pagination import keyset_sql
+
+Row = Dict[str, Any]
+
+
+async def _one(db: AsyncSession, sql: str, params: Dict[str, Any]) -> Optional[Row]:
+    result = await db.execute(text(sql), params)
+    row = result.mappings().first()
+    return dict(row) if row is not None else None
+
+
+async def _all(db: AsyncSession, sql: str, params: Dict[str, Any]) -> List[Row]:
+    result = await db.execute(text(sql), params)
+    return [dict(r) for r in result.mappings().all()]
+
+
+# ---- users ------------------------------------------------------------------
+async def get_user_by_auth_id(db: AsyncSession, auth_user_id: str) -> Optional[Row]:
+    return await _one(db, """
+        select * from public.users where auth_user_id = :aid limit 1
+    """, {"aid": auth_user_id})
+
+
+async def insert_user(db: AsyncSession, auth_user_id: str, email: str) -> Row:
+    """Insert, or return the row another worker inserted first (no unique violation)."""
+    row = await _one(db, """
+        insert into public.users (auth_user_id, email)
+        values (:aid, :email)
+        on conflict (auth_user_id) do nothing
+        returning *
+    """, {"aid": auth_user_id, "email": email})
+    return row if row is not None else await get_user_by_auth_id(db, auth_user_id)
+
+
+async def update_user_email(db: AsyncSession, auth_user_id: str, email: str) -> None:
+    await db.execute(text("""
+        update public.users set email = :email where auth_user_id = :aid
+    """), {"aid": auth_user_id, "email": email})
+
+
+# ---- clients ----------------------------------------------------------------
+async def list_clients(db: AsyncSession, user_id: str) -> List[Row]:
+    return await _all(db, """
+        select * from public.clients
+        where user_id = :uid
+        order by created_at desc
+    """, {"uid": user_id})
+
+
+async def insert_client(db: AsyncSession, user_id: str, fields: Dict[str, Any]) -> Row:
+    return await _one(db, """
+        insert into public.clients (user_id, name, email, phone, address)
+        values (:uid, :name, :email, :phone, :address)
+        returning *
+    """, {"uid": user_id, **fields})
+
+
+async def get_client(db: AsyncSession, client_id: str) -> Optional[Row]:
+    return await _one(db, """
+        select id, user_id from public.clients where id = :id
+    """, {"id": client_id})
+
+
+async def find_clients_by_names(db: AsyncSession, user_id: str, names: List[str]) -> List[Row]:
+    if not names:
+        return []
+    stmt = text("""
+        select id, name from public.clients
+        where user_id = :uid and name in :names
+        order by created_at
+    """).bindparams(bindparam("names", expanding=True))
+    result = await db.execute(stmt, {"uid": user_id, "names": list(names)})
+    return [dict(r) for r in result.mappings().all()]
+
+
+async def owned_client_ids(db: AsyncSession, user_id: str, client_ids: List[str]) -> set:
+    if not client_ids:
+        return set()
+    stmt = text("""
+        select id from public.clients where user_id = :uid and id in :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    result = await db.execute(stmt, {"uid": user_id, "ids": list(client_ids)})
+    return {str(r[0]) for r in result.all()}
+
+
+async def insert_clients(db: AsyncSession, user_id: str, rows: List[Dict[str, Any]]) -> List[Row]:
+    """Multi-row insert; returns (id, name) per new client, in input order."""
+    out: List[Row] = []
+    for start in range(0, len(rows), 1000):  # keep well under bind-parameter limits
+        chunk = rows[start:start + 1000]
+        values, params = [], {"uid": user_id}
+        for i, r in enumerate(chunk):
+            values.append(f"(:uid, :name_{i}, :email_{i}, :phone_{i}, :address_{i})")
+            params.update({
+                f"name_{i}": r["name"], f"email_{i}": r.get("email"),
+                f"phone_{i}": r.get("phone"), f"address_{i}": r.get("address"),
+            })
+        out += await _all(db, f"""
+            insert into public.clients (user_id, name, email, phone, address)
+            values {", ".join(values)}
+            returning id, name
+        """, params)
+    return out
+
+
+# ---- jobs -------------------------------------------------------------------
+async def list_jobs(
+    db: AsyncSession,
+    user_id: str,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Row]:
+    """Newest first; `cursor`/`limit` page on (created_at, id) (see app/pagination.py)."""
+    where = ["user_id = :uid"]
+    params: Dict[str, Any] = {"uid": user_id}
+    if status:
+        where.append("status = :status")
+        params["status"] = status
+    if cursor:
+        clause, cparams = keyset_sql(cursor)
+        where.append(clause)
+        params.update(cparams)
+    sql = f"select * from public.jobs where {' and '.join(where)} order by created_at desc, id desc"
+    if limit is not None:
+        sql += " limit :limit"
+        params["limit"] = limit
+    return await _all(db, sql, params)
+
+
+async def insert_job(db: AsyncSession, user_id: str, fields: Dict[str, Any]) -> Row:
+    return await _one(db, """
+        insert into public.jobs (user_id, client_id, title, description, price_cents, status)
+        values (:uid, :client_id, :title, :description, :price_cents, :status)
+        returning *
+    """, {"uid": user_id, **fields})
+
+
+async def insert_jobs(db: AsyncSession, user_id: str, rows: List[Dict[str, Any]]) -> List[Row]:
+    """Multi-row insert; returns (id, status, price_cents, created_at) per new job, in input order."""
+    out: List[Row] = []
+    for start in range(0, len(rows), 1000):  # keep well under bind-parameter limits
+        chunk = rows[start:start + 1000]
+        values, params = [], {"uid": user_id}
+        for i, r in enumerate(chunk):
+            values.append(f"(:uid, :client_id_{i}, :title_{i}, :description_{i}, :price_cents_{i}, :status_{i})")
+            params.update({
+                f"client_id_{i}": r["client_id"], f"title_{i}": r["title"], f"description_{i}": r.get("description"),
+                f"price_cents_{i}": r["price_cents"], f"status_{i}": r["status"],
+            })
+        out += await _all(db, f"""
+            insert into public.jobs (user_id, client_id, title, description, price_cents, status)
+            values {", ".join(values)}
+            returning id, status, price_cents, created_at
+        """, params)
+    return out
+
+
+async def search_source(db: AsyncSession, user_id: str):
+    """Everything app/search.py indexes for a user: jobs oldest first (with the
+    client's name) and the user's clients."""
+    jobs = await _all(db, """
+        select j.id, j.client_id, c.name as client_name, j.title, j.description,
+               j.price_cents, j.status, j.created_at
+        from public.jobs j left join public.clients c on c.id = j.client_id
+        where j.user_id = :uid
+        order by j.created_at, j.id
+    """, {"uid": user_id})
+    clients = await _all(db, """
+        select id, name from public.clients where user_id = :uid
+    """, {"uid": user_id})
+    return jobs, clients
+
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[Row]:
+    return await _one(db, "select * from public.jobs where id = :id", {"id": job_id})
+
+
+async def set_checkout_session(db: AsyncSession, job_id: str, session_id: str) -> None:
+    await db.execute(text("""
+        update public.jobs set checkout_session_id = :sid where id = :id
+    """), {"sid": session_id, "id": job_id})
+
+
+async def mark_paid_by_sessions(db: AsyncSession, session_ids: List[str]) -> List[Row]:
+    """Flip the jobs behind these Checkout Sessions to completed_paid.
+
+    Returns (id, user_id, price_cents, created_at, old_status) for each job
+    this call changed; already-paid jobs are skipped, so replays are no-ops.
+    On Postgres it's one statement: the rows are locked as they're read, so
+    `old_status` is the status the update replaced, and a concurrent replay
+    (which waits, then finds them paid) can't count them twice.
+    """
+    if not session_ids:
+        return []
+    if db.bind.dialect.name == "postgresql":
+        stmt = text("""
+            update public.jobs j set status = 'completed_paid'
+            from (
+                select id, status from public.jobs
+                where checkout_session_id in :sids and status <> 'completed_paid'
+                for update
+            ) prev
+            where j.id = prev.id
+            returning j.id, j.user_id, j.price_cents, j.created_at, prev.status as old_status
+        """).bindparams(bindparam("sids", expanding=True))
+        result = await db.execute(stmt, {"sids": list(session_ids)})
+        return [dict(r) for r in result.mappings().all()]
+
+    # SQLite (bench) can't return the FROM side; a writer there holds the whole
+    # database, and only the rows read first are updated, so each has its old_status
+    before = text("""
+        select id, user_id, price_cents, created_at, status as old_status from public.jobs
+        where checkout_session_id in :sids and status <> 'completed_paid'
+    """).bindparams(bindparam("sids", expanding=True))
+    prior = {str(r["id"]): dict(r) for r in (await db.execute(before, {"sids": list(session_ids)})).mappings()}
+    if not prior:
+        return []
+    stmt = text("""
+        update public.jobs set status = 'completed_paid'
+        where id in :ids and status <> 'completed_paid'
+        returning id
+    """).bindparams(bindparam("ids", expanding=True))
+    result = await db.execute(stmt, {"ids": [r["id"] for r in prior.values()]})
+    return [prior[str(r["id"])] for r in result.mappings().all()]
+
+
+# ---- rollups (sql/job_rollups.sql) ------------------------------------------
+async def bump_rollups(db: AsyncSession, user_id: str, deltas: Dict[tuple, List[int]]) -> None:
+    """Add (jobs, price_cents) deltas to this user's (month, status) cells."""
+    params = [
+        {"uid": user_id, "month": month, "status": status, "jobs": n, "cents": cents}
+        for (month, status), (n, cents) in deltas.items() if n or cents
+    ]
+    if not params:
+        return
+    await lock_user(db, user_id)
+    await db.execute(text("""
+        insert into public.job_rollups (user_id, month, status, jobs, price_cents)
+        values (:uid, :month, :status, :jobs, :cents)
+        on conflict (user_id, month, status) do update
+        set jobs = job_rollups.jobs + excluded.jobs,
+            price_cents = job_rollups.price_cents + excluded.price_cents
+    """), params)
+
+
+async def get_rollups(db: AsyncSession, user_id: str) -> List[Row]:
+    return await _all(db, """
+        select month, status, jobs, price_cents from public.job_rollups
+        where user_id = :uid and jobs <> 0
+        order by month, status
+    """, {"uid": user_id})
+
+
+async def scan_job_totals(db: AsyncSession, user_id: str) -> List[Row]:
+    """Every job's (status, price_cents, created_at): the full scan rollups replace."""
+    return await _all(db, """
+        select status, price_cents, created_at from public.jobs where user_id = :uid
+    """, {"uid": user_id})
+
+
+async def replace_rollups(db: AsyncSession, user_id: str, cells: Dict[tuple, List[int]]) -> None:
+    await db.execute(text("delete from public.job_rollups where user_id = :uid"), {"uid": user_id})
+    await bump_rollups(db, user_id, cells)
+
+
+async def user_ids_with_jobs(db: AsyncSession) -> List[str]:
+    result = await db.execute(text("select distinct user_id from public.jobs where user_id is not null"))
+    return [str(r[0]) for r in result.all()]
+
+
+# ---- change log (sql/change_log.sql) ----------------------------------------
+async def lock_user(db: AsyncSession, user_id: str) -> None:
+    """Per-user transaction lock (Postgres only; a session may take it again).
+
+    Serializes a user's change-log appends, so seq order is commit order (see
+    the .sql), and their rollup bumps against `stats.rebuild`, so a rebuild's
+    scan can't miss a write whose bump then lands on the replaced cells.
+    """
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(text("select pg_advisory_xact_lock(hashtext('change_log:' || :uid))"), {"uid": str(user_id)})
+
+
+async def data_version(db: AsyncSession, user_id: str) -> int:
+    """The user's last change_log seq: bumped by every logged write, on any worker."""
+    row = await _one(db, """
+        select coalesce(max(seq), 0) as v from public.change_log where user_id = :uid
+    """, {"uid": user_id})
+    return int(row["v"])
+
+
+async def log_changes(db: AsyncSession, user_id: str, entity: str, ids: List[Any], op: str = "upsert") -> None:
+    """Append to the user's change log; call inside the write's transaction."""
+    if not ids:
+        return
+    await lock_user(db, user_id)
+    await db.execute(text("""
+        insert into public.change_log (user_id, entity, entity_id, op)
+        values (:uid, :entity, :id, :op)
+    """), [{"uid": user_id, "entity": entity, "id": i, "op": op} for i in ids])
+
+
+async def changes_since(db: AsyncSession, user_id: str, since: int, limit: int) -> List[Row]:
+    return await _all(db, """
+        select seq, entity, entity_id, op from public.change_log
+        where user_id = :uid and seq > :since
+        order by seq
+        limit :limit
+    """, {"uid": user_id, "since": since, "limit": limit})
+
+
+async def rows_by_ids(db: AsyncSession, table: str, user_id: str, ids: List[Any]) -> List[Row]:
+    if not ids:
+        return []
+    assert table in ("jobs", "clients")
+    stmt = text(f"""
+        select * from public.{table} where user_id = :uid and id in :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    result = await db.execute(stmt, {"uid": user_id, "ids": list(ids)})
+    return [dict(r) for r in result.mappings().all()]
+
+
+async def compact_change_log(db: AsyncSession) -> int:
+    """Drop entries superseded by a later one for the same row; returns how many."""
+    # one pass over change_log_row_seq instead of a max() lookup per entry
+    result = await db.execute(text("""
+        delete from public.change_log
+        where seq in (
+            select seq from (
+                select seq, row_number() over (
+                    partition by user_id, entity, entity_id order by seq desc
+                ) as newer
+                from public.change_log
+            ) ranked
+            where newer > 1
+        )
+    """))
+    return result.rowcount or 0
@@ -4,11 +4,20 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
-from app.db import get_session
+from app.db import get_session, read_scope
 from app.auth import verify_and_get_user_id
+from app import repo
+from app.changes import publish
+from app.fastjson import RawJSONResponse, dumps
+from app.listcache import list_cache
 
 router = APIRouter()
 
+async def get_read_session(user_id: str = Depends(verify_and_get_user_id)):
+    # replica reads, pinned to the primary briefly after this user's own writes
+    async with read_scope(user_id) as db:
+        yield db
+
 class ClientCreate(BaseModel):
     name: str
     email: Optional[str] = None
@@ -17,16 +26,21 @@ class ClientCreate(BaseModel):
 
 @router.get("/")
 async def list_clients(
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_read_session),
     user_id: str = Depends(verify_and_get_user_id),
 ):
-    result = await db.execute(text("""
-        select id, name, email, phone, address, created_at
-        from public.clients
-        where user_id = :uid
-        order by created_at desc
-    """), {"uid": user_id})
-    return [dict(row) for row in result.mappings().all()]
+    async def load():
+        result = await db.execute(text("""
+            select id, name, email, phone, address, created_at
+            from public.clients
+            where user_id = :uid
+            order by created_at desc
+        """), {"uid": user_id})
+        return dumps([dict(row) for row in result.mappings().all()]), None
+
+    # keyed by the auth user id this router scopes by; its own create invalidates it
+    body, _ = await list_cache.get_or_load("clients", user_id, "routers.clients", load)
+    return RawJSONResponse(body)
 
 @router.post("/")
 async def create_client(
@@ -41,7 +55,9 @@ async def create_client(
     """)
     params = payload.model_dump()
     params["uid"] = user_id
-    result = await db.execute(q, params)
+    row = dict((await db.execute(q, params)).mappings().first())
+    await repo.log_changes(db, user_id, "client", [row["id"]])
     await db.commit()
-    return dict(result.mappings().first())
+    await publish(user_id, ("clients",), "create")
+    return row
 
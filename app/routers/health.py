@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.db import get_session
+from app.db import get_session, pool_stats, probe_replicas
 
 router = APIRouter()
 
@@ -14,3 +14,12 @@ async def health_db(db: AsyncSession = Depends(get_session)):
         # surface the error so we know exactly what's wrong
         return {"error": str(e)}
 
+@router.get("/db/pool")
+def health_db_pool():
+    # checkout waits, timeouts and the current overflow limit (app/dbpool.py)
+    return pool_stats() or {"engine": "not created"}
+
+@router.get("/db/replicas")
+async def health_db_replicas():
+    # probes each read replica; ejected ones come back here once they answer
+    return await probe_replicas() or {"replicas": []}
@@ -0,0 +1,262 @@
+# app/search.py
+"""
+Per-user job search: an in-memory inverted index over job title,
+description and client name.
+
+A user's index is built on their first search (one query) and then kept
+current by the write paths: creates add documents, the Stripe webhook
+updates status, and anything that can't be applied in place (bulk imports,
+a job whose client the index hasn't seen) drops the index so the next
+search rebuilds it. Writes that land while a build is running discard that
+build's result instead of caching a stale snapshot.
+
+Jobs are numbered in creation order and posting lists are append-only
+sorted lists, so a query walks the shortest list newest-first and stops at
+`limit`. The last query term matches as a prefix (search-as-you-type).
+
+Indexes are kept in LRU order and evicted when their total size (postings
+plus documents) passes SEARCH_INDEX_BUDGET. Like the change feed, they're
+per process, so with several workers a user's requests should stick to
+one worker (writes made elsewhere aren't seen).
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .cache import SingleFlight
+
+SEARCH_INDEX_BUDGET = int(os.getenv("SEARCH_INDEX_BUDGET", "5000000"))  # postings + docs, all users
+MAX_PREFIX_TERMS = 200  # vocabulary entries a prefix may expand to
+
+Row = Dict[str, Any]
+# jobs (oldest first, with client_name) and the user's clients (id, name)
+Source = Tuple[List[Row], List[Row]]
+
+_WORD = re.compile(r"\w+")
+RESULT_FIELDS = ("id", "client_id", "client_name", "title", "description", "price_cents", "status", "created_at")
+
+
+def terms(text: Optional[str]) -> List[str]:
+    """Lowercased words with accents stripped ("Café" -> "cafe")."""
+    if not text:
+        return []
+    if text.isascii():
+        return _WORD.findall(text.lower())
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    return _WORD.findall("".join(ch for ch in folded if not unicodedata.combining(ch)))
+
+
+class UserIndex:
+    __slots__ = ("docs", "postings", "vocab", "clients", "size")
+
+    def __init__(self):
+        self.docs: List[Row] = []                 # doc number -> result row
+        self.postings: Dict[str, List[int]] = {}  # term -> ascending doc numbers
+        self.vocab: List[str] = []                # sorted terms, for prefix lookups
+        self.clients: Dict[str, str] = {}         # client id -> name
+        self.size = 0
+
+    @classmethod
+    def build(cls, source: Source) -> "UserIndex":
+        jobs, clients = source
+        idx = cls()
+        idx.clients = {str(c["id"]): c["name"] for c in clients}
+        for row in jobs:
+            idx._add(row, sort_vocab=False)
+        idx.vocab = sorted(idx.postings)
+        return idx
+
+    def _add(self, row: Row, sort_vocab: bool = True) -> None:
+        n = len(self.docs)
+        doc = {k: row.get(k) for k in RESULT_FIELDS}
+        doc["id"] = str(doc["id"])
+        doc["client_id"] = str(doc["client_id"]) if doc["client_id"] is not None else None
+        if doc["client_name"] is None:
+            doc["client_name"] = self.clients.get(doc["client_id"])
+        self.docs.append(doc)
+        for t in set(terms(doc["title"]) + terms(doc["description"]) + terms(doc["client_name"])):
+            plist = self.postings.get(t)
+            if plist is None:
+                self.postings[t] = [n]
+                if sort_vocab:
+                    bisect.insort(self.vocab, t)
+            else:
+                plist.append(n)
+            self.size += 1
+        self.size += len(RESULT_FIELDS)
+
+    def add_jobs(self, rows: Iterable[Row]) -> bool:
+        """False if a row references a client this index doesn't know."""
+        rows = list(rows)
+        if any(str(r["client_id"]) not in self.clients for r in rows if r.get("client_name") is None):
+            return False
+        for row in rows:
+            self._add(row)
+        return True
+
+    def add_clients(self, rows: Iterable[Row]) -> bool:
+        self.clients.update({str(r["id"]): r["name"] for r in rows})
+        return True
+
+    def set_status(self, job_ids: Iterable[str], status: str) -> bool:
+        wanted = {str(j) for j in job_ids}
+        for doc in self.docs:  # rare (webhook) and cheap next to a rebuild
+            if doc["id"] in wanted:
+                doc["status"] = status
+        return True
+
+    def _matches(self, term: str, prefix: bool) -> List[List[int]]:
+        if not prefix:
+            plist = self.postings.get(term)
+            return [plist] if plist else []
+        start = bisect.bisect_left(self.vocab, term)
+        out = []
+        for t in self.vocab[start:start + MAX_PREFIX_TERMS]:
+            if not t.startswith(term):
+                break
+            out.append(self.postings[t])
+        return out
+
+    def search(self, query: str, status: Optional[str] = None, limit: int = 20) -> List[Row]:
+        words = terms(query)
+        if not words:
+            return []
+        # every word must match; the last one as a prefix, the others exactly
+        groups = [self._matches(w, prefix=False) for w in dict.fromkeys(words[:-1])]
+        groups.append(self._matches(words[-1], prefix=True))
+        if any(not g for g in groups):
+            return []
+        # walk the group with the fewest postings; probe the others by bisect
+        groups.sort(key=lambda g: sum(len(p) for p in g))
+        lead, rest = groups[0], groups[1:]
+        out: List[Row] = []
+        for n in _newest_first(lead):
+            if all(_contains_any(g, n) for g in rest):
+                doc = self.docs[n]
+                if status is None or doc["status"] == status:
+                    out.append(doc)
+                    if len(out) >= limit:
+                        break
+        return out
+
+
+def _newest_first(lists: List[List[int]]) -> Iterator[int]:
+    if len(lists) == 1:
+        return reversed(lists[0])
+
+    def dedup():
+        last = None
+        for n in heapq.merge(*(reversed(p) for p in lists), reverse=True):
+            if n != last:
+                yield n
+                last = n
+    return dedup()
+
+
+def _contains_any(lists: List[List[int]], n: int) -> bool:
+    for p in lists:
+        i = bisect.bisect_left(p, n)
+        if i < len(p) and p[i] == n:
+            return True
+    return False
+
+
+class SearchIndex:
+    def __init__(self, budget: int = SEARCH_INDEX_BUDGET):
+        self.budget = budget
+        self._users: "OrderedDict[str, UserIndex]" = OrderedDict()
+        self._building: Dict[str, int] = {}  # user -> writes seen while their build runs
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.builds = 0
+        self.evictions = 0
+        self.drops = 0
+
+    async def get(self, user_id, load: Callable[[], Awaitable[Source]]) -> UserIndex:
+        uid = str(user_id)
+        with self._lock:
+            idx = self._users.get(uid)
+            if idx is not None:
+                self._users.move_to_end(uid)
+                return idx
+
+        async def build() -> UserIndex:
+            self._building[uid] = 0
+            try:
+                source = await load()
+                # tokenizing tens of thousands of jobs takes a while; keep it off the loop
+                idx = await run_in_threadpool(UserIndex.build, source)
+            finally:
+                raced = self._building.pop(uid, 0)
+            self.builds += 1
+            if not raced:
+                self._store(uid, idx)
+            return idx
+
+        return await self._flight.do(("search", uid), build)
+
+    def _store(self, uid: str, idx: UserIndex) -> None:
+        with self._lock:
+            self._users[uid] = idx
+            self.size += idx.size
+            while self.size > self.budget and len(self._users) > 1:
+                _, old = self._users.popitem(last=False)
+                self.size -= old.size
+                self.evictions += 1
+
+    def _update(self, user_id, fn: Callable[[UserIndex], bool]) -> None:
+        uid = str(user_id)
+        if uid in self._building:
+            self._building[uid] += 1
+        with self._lock:
+            idx = self._users.get(uid)
+            if idx is None:
+                return
+            before = idx.size
+            if fn(idx):
+                self.size += idx.size - before
+                return
+        self.drop(uid)
+
+    # ---- called by the write paths, after commit --------------------------------
+    def add_jobs(self, user_id, rows: Iterable[Row]) -> None:
+        self._update(user_id, lambda idx: idx.add_jobs(rows))
+
+    def add_clients(self, user_id, rows: Iterable[Row]) -> None:
+        self._update(user_id, lambda idx: idx.add_clients(rows))
+
+    def set_status(self, user_id, job_ids: Iterable[str], status: str) -> None:
+        self._update(user_id, lambda idx: idx.set_status(job_ids, status))
+
+    def drop(self, user_id) -> None:
+        uid = str(user_id)
+        if uid in self._building:
+            self._building[uid] += 1
+        with self._lock:
+            idx = self._users.pop(uid, None)
+            if idx is not None:
+                self.size -= idx.size
+                self.drops += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._users),
+            "size": self.size,
+            "budget": self.budget,
+            "builds": self.builds,
+            "evictions": self.evictions,
+            "drops": self.drops,
+        }
+
+
+search_index = SearchIndex()
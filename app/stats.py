@@ -0,0 +1,175 @@
+# app/stats.py
+"""
+Dashboard totals without scanning jobs.
+
+public.job_rollups (sql/job_rollups.sql) holds, per user, a job count and
+price_cents sum for each (month created, status) cell. Write paths adjust the
+cells in the same transaction as the write, via the `*_deltas` helpers:
+
+- job creates add +1 to (month, status);
+- the Stripe webhook moves a job from (month, old status) to
+  (month, completed_paid).
+
+GET /stats folds the cells into totals by status and by month (paid cents
+per month is the revenue line). `rebuild()` recomputes a user's cells from
+a full scan, for backfills; `check()` compares the stored cells with a scan
+and reports any difference.
+
+    python -m app.stats --rebuild            # every user with jobs
+    python -m app.stats --check --user <users.id>
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import repo
+from .changes import list_etag, not_modified, publish, set_etag
+from .db import get_session
+from .deps import get_read_session, get_user
+from .fastjson import RawJSONResponse, dumps
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+PAID = "completed_paid"
+
+Cells = Dict[tuple, List[int]]  # (month, status) -> [jobs, price_cents]
+
+
+def month_of(created_at: Any) -> str:
+    """'YYYY-MM' in UTC for a datetime, or for an ISO string (the SQLite stand-in)."""
+    if isinstance(created_at, datetime):
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        return created_at.strftime("%Y-%m")
+    if created_at is None:  # rows inserted without RETURNING get the DB's now()
+        return datetime.now(timezone.utc).strftime("%Y-%m")
+    return str(created_at)[:7]
+
+
+def _add(cells: Cells, month: str, status: str, n: int, cents: int) -> None:
+    cell = cells.setdefault((month, status), [0, 0])
+    cell[0] += n
+    cell[1] += cents
+
+
+def insert_deltas(rows: Iterable[Dict[str, Any]]) -> Cells:
+    cells: Cells = {}
+    for r in rows:
+        _add(cells, month_of(r.get("created_at")), r["status"], 1, r["price_cents"] or 0)
+    return cells
+
+
+def status_deltas(rows: Iterable[Dict[str, Any]], new_status: str) -> Cells:
+    """Rows carry old_status, price_cents and created_at (see repo.mark_paid_by_sessions)."""
+    cells: Cells = {}
+    for r in rows:
+        month, cents = month_of(r["created_at"]), r["price_cents"] or 0
+        _add(cells, month, r["old_status"], -1, -cents)
+        _add(cells, month, new_status, 1, cents)
+    return cells
+
+
+def summarize(cells: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    by_status: Dict[str, Dict[str, int]] = {}
+    by_month: Dict[str, Dict[str, int]] = {}
+    total = {"jobs": 0, "price_cents": 0}
+    for c in cells:
+        n, cents = int(c["jobs"]), int(c["price_cents"])
+        s = by_status.setdefault(c["status"], {"jobs": 0, "price_cents": 0})
+        s["jobs"] += n
+        s["price_cents"] += cents
+        m = by_month.setdefault(c["month"], {"jobs": 0, "price_cents": 0, "paid_cents": 0})
+        m["jobs"] += n
+        m["price_cents"] += cents
+        if c["status"] == PAID:
+            m["paid_cents"] += cents
+        total["jobs"] += n
+        total["price_cents"] += cents
+    return {"total": total, "by_status": by_status, "by_month": dict(sorted(by_month.items()))}
+
+
+async def _scan(db: AsyncSession, user_id: str) -> Cells:
+    return insert_deltas(await repo.scan_job_totals(db, user_id))
+
+
+async def rebuild(db: AsyncSession, user_id: str) -> Cells:
+    """Replace the user's cells with a full scan (commits)."""
+    await repo.lock_user(db, user_id)  # writers bump after we commit, onto the new cells
+    cells = await _scan(db, user_id)
+    await repo.replace_rollups(db, user_id, cells)
+    await db.commit()
+    return cells
+
+
+async def check(db: AsyncSession, user_id: str) -> Dict[str, Any]:
+    """Stored cells vs a full scan; `diff` lists every cell that disagrees."""
+    scanned = await _scan(db, user_id)
+    stored = {(r["month"], r["status"]): [int(r["jobs"]), int(r["price_cents"])] for r in await repo.get_rollups(db, user_id)}
+    diff = [
+        {"month": m, "status": s, "stored": stored.get((m, s), [0, 0]), "scanned": scanned.get((m, s), [0, 0])}
+        for m, s in sorted(set(stored) | {k for k, v in scanned.items() if v[0]})
+        if stored.get((m, s), [0, 0]) != scanned.get((m, s), [0, 0])
+    ]
+    return {"consistent": not diff, "cells": len(stored), "diff": diff}
+
+
+# ---- routes --------------------------------------------------------------------
+@router.get("")
+async def get_stats(request: Request, user = Depends(get_user), db: AsyncSession = Depends(get_read_session)):
+    tag = list_etag(request, user["id"], await repo.data_version(db, user["id"]))
+    if (hit := not_modified(request, tag)) is not None:
+        return hit
+    response = RawJSONResponse(dumps(summarize(await repo.get_rollups(db, user["id"]))))
+    set_etag(response, tag)
+    return response
+
+
+@router.get("/check")
+async def check_stats(user = Depends(get_user), db: AsyncSession = Depends(get_session)):
+    return await check(db, user["id"])
+
+
+@router.post("/rebuild")
+async def rebuild_stats(user = Depends(get_user), db: AsyncSession = Depends(get_session)):
+    await rebuild(db, user["id"])
+    await publish(user["id"], ("stats",), "rebuild")
+    return summarize(await repo.get_rollups(db, user["id"]))
+
+
+# ---- backfill CLI ----------------------------------------------------------------
+async def _cli(do_rebuild: bool, user: Optional[str]) -> int:
+    from .db import dispose, session_scope
+
+    bad = 0
+    try:
+        async with session_scope() as db:
+            users = [user] if user else await repo.user_ids_with_jobs(db)
+            for uid in users:
+                if do_rebuild:
+                    cells = await rebuild(db, uid)
+                    print(f"{uid}: rebuilt {len(cells)} cells")
+                else:
+                    result = await check(db, uid)
+                    bad += not result["consistent"]
+                    print(f"{uid}: {'ok' if result['consistent'] else result['diff']}")
+    finally:
+        await dispose()
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import sys
+
+    ap = argparse.ArgumentParser(prog="python -m app.stats")
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--rebuild", action="store_true")
+    mode.add_argument("--check", action="store_true")
+    ap.add_argument("--user", default=None, help="one users.id (default: everyone with jobs)")
+    args = ap.parse_args()
+    sys.exit(asyncio.run(_cli(args.rebuild, args.user)))
@@ -1,26 +1,85 @@
 # app/stripe_webhook.py
-import os, stripe
+import json
+import os
 from fastapi import APIRouter, Request, HTTPException
-from .deps import sb
+from starlette.concurrency import run_in_threadpool
+from . import repo
+from .changes import publish
+from .db import session_scope
+from .payments import get_stripe, sessions
+from .search import search_index
+from .stats import PAID, status_deltas
+from .outbox import Outbox, OutboxWorker
 
 router = APIRouter(prefix="/stripe", tags=["stripe"])
 
-stripe.api_key = os.environ["STRIPE_SECRET_KEY"]
-WEBHOOK_SECRET = os.environ["STRIPE_WEBHOOK_SECRET"]
+OUTBOX_PATH = os.environ.get("STRIPE_OUTBOX_PATH", "stripe_outbox.sqlite3")
+
+# event types we persist; anything else is acked and dropped
+HANDLED = {"checkout.session.completed"}
+
+_worker: OutboxWorker | None = None
+
+
+async def apply_events(events):
+    """Apply a batch of queued events in one transaction (idempotent)."""
+    sids = [e["payload"]["id"] for e in events if e["type"] == "checkout.session.completed"]
+    async with session_scope() as db:
+        paid = await repo.mark_paid_by_sessions(db, sids)
+        by_user: dict = {}
+        for r in paid:
+            by_user.setdefault(str(r["user_id"]), []).append(r)
+        for user_id, rows in sorted(by_user.items()):  # a fixed order for the change-log locks
+            await repo.bump_rollups(db, user_id, status_deltas(rows, PAID))
+            await repo.log_changes(db, user_id, "job", [r["id"] for r in rows])
+        await db.commit()
+    for sid in sids:
+        sessions.forget_session(sid)
+    for user_id, rows in by_user.items():
+        search_index.set_status(user_id, [r["id"] for r in rows], PAID)
+        await publish(user_id, ("jobs",), "paid", [{"id": r["id"], "status": PAID} for r in rows])
+
+
+def get_worker() -> OutboxWorker:
+    global _worker
+    if _worker is None:
+        _worker = OutboxWorker(Outbox(OUTBOX_PATH), apply_events)
+    return _worker
+
+
+async def start_worker():
+    get_worker().start()
+
+
+async def stop_worker():
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker.outbox.close()
+        _worker = None
+
 
 @router.post("/webhook")
 async def webhook(req: Request):
     payload = await req.body()
     sig = req.headers.get("stripe-signature")
+    secret = os.environ.get("STRIPE_WEBHOOK_SECRET")
+    if not secret:
+        raise HTTPException(status_code=500, detail="STRIPE_WEBHOOK_SECRET not set")
     try:
-        event = stripe.Webhook.construct_event(payload, sig, WEBHOOK_SECRET)
+        event = get_stripe().Webhook.construct_event(payload, sig, secret)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Webhook error: {e}")
 
-    if event["type"] == "checkout.session.completed":
-        sid = event["data"]["object"]["id"]
-        job = sb.table("jobs").select("id").eq("checkout_session_id", sid).single().execute().data
-        if job:
-            sb.table("jobs").update({"status": "completed_paid"}).eq("id", job["id"]).execute()
+    if event["type"] not in HANDLED:
+        return {"ok": True}
 
-    return {"ok": True}
+    # ack as soon as the event is durably queued; the worker applies it.
+    # The object is stored as Stripe sent it (StripeObject.to_dict is deprecated).
+    worker = get_worker()
+    fresh = await run_in_threadpool(
+        worker.outbox.put, event["id"], event["type"], json.loads(payload)["data"]["object"]
+    )
+    if fresh:
+        worker.wake()
+    return {"ok": True, "duplicate": not fresh}
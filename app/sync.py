@@ -0,0 +1,115 @@
+# app/sync.py
+"""
+Delta sync: GET /sync?since=<cursor> returns only what changed.
+
+Every app/ write path appends to public.change_log (sql/change_log.sql) in
+the write's own transaction: job and client creates and bulk imports,
+checkout and the Stripe webhook's paid flip. A sync reads the user's log
+after `since`, keeps the last entry per row, and returns the current state
+of everything still present. Tombstones (op 'delete') are listed under
+`deleted`; no route writes one yet:
+
+    {"cursor": "…", "has_more": false,
+     "jobs": [...], "clients": [...],
+     "deleted": {"jobs": ["…"], "clients": ["…"]}}
+
+Start without `since` (everything), store `cursor`, and pass it next time.
+A large delta comes back in pages of `limit` log entries; keep calling
+while `has_more` is true. Rows are sent in their current state, so seeing
+one again on a later page is harmless: apply them as upserts.
+
+    python -m app.sync --compact   # drop log entries superseded by a later one
+"""
+from __future__ import annotations
+
+import base64
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import repo
+from .deps import get_read_session, get_user
+from .fastjson import RawJSONResponse, dumps
+
+router = APIRouter(tags=["sync"])
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+
+TABLES = {"job": "jobs", "client": "clients"}
+
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(b"s%d" % seq).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> int:
+    if not token:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        if raw[:1] != b"s":
+            raise ValueError(raw)
+        return int(raw[1:])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def delta(db: AsyncSession, user_id: str, since: int, limit: int) -> Dict[str, Any]:
+    entries = await repo.changes_since(db, user_id, since, limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    last: Dict[tuple, str] = {}  # (entity, id) -> last op on this page
+    for e in entries:
+        key = (e["entity"], str(e["entity_id"]))
+        last.pop(key, None)  # re-insert so dict order follows the latest entry
+        last[key] = e["op"]
+
+    out: Dict[str, Any] = {
+        "cursor": encode_cursor(entries[-1]["seq"] if entries else since),
+        "has_more": has_more,
+        "deleted": {"jobs": [], "clients": []},
+    }
+    for entity, table in TABLES.items():
+        ids = [i for (ent, i), op in last.items() if ent == entity and op == "upsert"]
+        # a row missing here was deleted after this page; its tombstone comes later
+        rows = {str(r["id"]): r for r in await repo.rows_by_ids(db, table, user_id, ids)}
+        out[table] = [rows[i] for i in ids if i in rows]
+        out["deleted"][table] = [i for (ent, i), op in last.items() if ent == entity and op == "delete"]
+    return out
+
+
+@router.get("/sync")
+async def sync(
+    since: str | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT),
+    user = Depends(get_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    return RawJSONResponse(dumps(await delta(db, user["id"], decode_cursor(since), limit)))
+
+
+# ---- maintenance CLI ---------------------------------------------------------------
+async def _compact() -> int:
+    from .db import dispose, session_scope
+
+    try:
+        async with session_scope() as db:
+            dropped = await repo.compact_change_log(db)
+            await db.commit()
+        print(f"dropped {dropped} superseded change_log entries")
+    finally:
+        await dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import sys
+
+    ap = argparse.ArgumentParser(prog="python -m app.sync")
+    ap.add_argument("--compact", action="store_true", required=True)
+    ap.parse_args()
+    sys.exit(asyncio.run(_compact()))
@@ -0,0 +1,249 @@
+# app/timing.py
+"""
+Per-request latency breakdown: Server-Timing headers and Prometheus metrics.
+
+`TimingMiddleware` opens a per-request record in a contextvar. Code that
+spends time elsewhere wraps it in `phase("stripe")` (or is hooked
+automatically: SQLAlchemy statements via `instrument_engine`, Supabase HTTP
+calls via `instrument_httpx`). When the response starts, the totals go out
+as a `Server-Timing` header, e.g.
+
+    Server-Timing: auth;dur=3.1, db;dur=4.0;desc="2 calls", stripe;dur=212.5, total;dur=221.9
+
+and when it finishes they feed per-route, per-phase histograms plus
+outbound-call counters, served in Prometheus text format by `metrics_response`.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# phases that are calls to another service; counted per request
+OUTBOUND = {"db", "supabase", "supabase_auth", "stripe"}
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+    __slots__ = ("started", "phases")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}  # name -> [seconds, calls]
+
+    def add(self, name: str, seconds: float) -> None:
+        p = self.phases.get(name)
+        if p is None:
+            self.phases[name] = [seconds, 1]
+        else:
+            p[0] += seconds
+            p[1] += 1
+
+    def header(self) -> str:
+        parts = []
+        for name, (seconds, calls) in self.phases.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                part += f';desc="{calls} calls"'
+            parts.append(part)
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as `name` for the current request (no-op outside one)."""
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(name, time.perf_counter() - started)
+
+
+# ---- hooks for the clients we don't call directly ----------------------------
+def instrument_engine(engine, name: str = "db") -> None:
+    """Time every statement run through a SQLAlchemy engine (sync or async)."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_timing_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("_timing_started")
+        if started:
+            t = _current.get()
+            if t is not None:
+                t.add(name, time.perf_counter() - started.pop())
+            else:
+                started.pop()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(ctx):
+        started = ctx.connection.info.get("_timing_started") if ctx.connection is not None else None
+        if started:
+            started.pop()
+
+
+def instrument_httpx(client, name: str) -> None:
+    """Time each request a (sync or async) httpx client sends as `name`."""
+    import httpx
+
+    def on_request(request):
+        request.extensions["timing_started"] = time.perf_counter()
+
+    def on_response(response):
+        started = response.request.extensions.get("timing_started")
+        t = _current.get()
+        if started is not None and t is not None:
+            t.add(name, time.perf_counter() - started)
+
+    if isinstance(client, httpx.AsyncClient):
+        async def a_request(request):
+            on_request(request)
+
+        async def a_response(response):
+            on_response(response)
+
+        hooks = {"request": [a_request], "response": [a_response]}
+    else:
+        hooks = {"request": [on_request], "response": [on_response]}
+    client.event_hooks = {
+        "request": list(client.event_hooks.get("request", [])) + hooks["request"],
+        "response": list(client.event_hooks.get("response", [])) + hooks["response"],
+    }
+
+
+# ---- metrics -----------------------------------------------------------------
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], Histogram] = {}  # (method, route, status)
+        self.phases: Dict[Tuple[str, str], Histogram] = {}          # (route, phase)
+        self.outbound: Dict[Tuple[str, str], int] = {}              # (route, service)
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def add_collector(self, fn: Callable[[], List[str]]) -> None:
+        """Extra exposition lines (e.g. pool gauges) appended to every render."""
+        self._collectors.append(fn)
+
+    def record(self, method: str, route: str, status: int, timings: RequestTimings) -> None:
+        total = time.perf_counter() - timings.started
+        with self._lock:
+            self.requests.setdefault((method, route, str(status)), Histogram()).observe(total)
+            for name, (seconds, calls) in timings.phases.items():
+                self.phases.setdefault((route, name), Histogram()).observe(seconds)
+                if name in OUTBOUND:
+                    self.outbound[(route, name)] = self.outbound.get((route, name), 0) + calls
+
+    def render(self) -> str:
+        out: List[str] = []
+        with self._lock:
+            out += _histogram(
+                "http_request_duration_seconds", "Request latency by route.",
+                {f'method="{m}",route="{r}",status="{s}"': h for (m, r, s), h in sorted(self.requests.items())},
+            )
+            out += _histogram(
+                "http_request_phase_seconds", "Time per request spent in each phase (auth, db, supabase, stripe, serialize).",
+                {f'route="{r}",phase="{p}"': h for (r, p), h in sorted(self.phases.items())},
+            )
+            out.append("# HELP http_outbound_calls_total Calls to other services made while serving a route.")
+            out.append("# TYPE http_outbound_calls_total counter")
+            for (r, s), n in sorted(self.outbound.items()):
+                out.append(f'http_outbound_calls_total{{route="{r}",service="{s}"}} {n}')
+        for fn in self._collectors:
+            out += fn()
+        return "\n".join(out) + "\n"
+
+
+def _histogram(name: str, help_: str, series: Dict[str, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} histogram"]
+    for labels, h in series.items():
+        sep = "," if labels else ""
+        tail = f"{{{labels}}}" if labels else ""
+        cumulative = 0
+        for bound, n in zip(h.buckets, h.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{tail} {h.sum:.6f}")
+        lines.append(f"{name}_count{tail} {h.count}")
+    return lines
+
+
+metrics = Metrics()
+
+
+def metrics_response(request: Request) -> Response:
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# ---- middleware --------------------------------------------------------------
+class TimingMiddleware:
+    """Pure ASGI, so streaming responses pass through untouched."""
+
+    def __init__(self, app, skip_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            # unmatched paths share one label so scans can't blow up cardinality
+            label = getattr(route, "path", None) or "unmatched"
+            metrics.record(scope["method"], label, status, timings)
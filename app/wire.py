@@ -0,0 +1,271 @@
+# app/wire.py
+"""
+Binary wire formats (MessagePack, CBOR) by content negotiation.
+
+JSON stays the default. A client that sends `Accept: application/msgpack`
+(or `application/x-msgpack`, or `application/cbor`) gets that format from
+every route, and may send request bodies in it with the matching
+Content-Type. A format is offered only when its package (`msgpack`,
+`cbor2`) is installed; otherwise the client gets JSON, as it would from a
+server that doesn't know the type.
+
+`WireFormatMiddleware` does the negotiation for both apps:
+
+- request bodies in a binary format are decoded and handed to the route as
+  JSON, so the pydantic body models (JobCreate, ClientIn, CheckoutPayload,
+  ...) validate them unchanged;
+- it sets `fastjson.wire_format`, and list routes that serialize through a
+  response model (`dump_rows`, `dump_normalized`) encode straight to the
+  binary format, with UUIDs and datetimes as native values;
+- any other JSON response is transcoded on the way out. Streams (NDJSON,
+  SSE) are left as they are;
+- list ETags carry the format as a suffix (`changes.list_etag`), and
+  negotiable responses, 304s included, get `Vary: Accept`.
+
+On the wire, UUIDs are 16-byte binaries (msgpack bin, CBOR tag 37) and
+datetimes are timestamps (msgpack ext -1, CBOR tag 1) where the fast path
+knows a field's type; transcoded responses carry the strings JSON would.
+Decoders should accept both for id and time fields.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from . import fastjson
+from .compression import qvalues
+from .fastjson import wire_format
+from .timing import phase
+
+try:
+    import msgpack
+except ImportError:  # optional; MessagePack is just not offered
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional; CBOR is just not offered
+    cbor2 = None
+
+JSON = "application/json"
+
+
+class Format:
+    __slots__ = ("media_type", "pack", "unpack", "uuid")
+
+    def __init__(self, media_type: str, pack: Callable[[Any], bytes], unpack: Callable[[bytes], Any],
+                 uuid: Callable[[Any], Any]):
+        self.media_type = media_type
+        self.pack = pack
+        self.unpack = unpack
+        self.uuid = uuid  # see fastjson.typed_projector
+
+
+def _uuid_bytes(v: Any) -> bytes:
+    # straight from the string: several times cheaper than building a UUID
+    return v.bytes if isinstance(v, UUID) else bytes.fromhex(str(v).replace("-", ""))
+
+
+def _utc(v: datetime) -> datetime:
+    return v if v.tzinfo is not None else v.replace(tzinfo=timezone.utc)
+
+
+def _msgpack_default(v: Any) -> Any:
+    if isinstance(v, UUID):
+        return v.bytes
+    if isinstance(v, datetime):
+        return msgpack.Timestamp.from_datetime(_utc(v))
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    raise TypeError(f"{type(v).__name__} is not MessagePack serializable")
+
+
+def _cbor_default(encoder, v: Any) -> None:
+    if isinstance(v, date):
+        encoder.encode(v.isoformat())
+        return
+    raise TypeError(f"{type(v).__name__} is not CBOR serializable")
+
+
+FORMATS: Dict[str, Format] = {}  # media type -> format, in preference order
+if msgpack is not None:
+    _mp = Format(
+        "application/msgpack",
+        # aware datetimes are packed natively (fast path); naive ones reach the default
+        lambda obj: msgpack.packb(obj, default=_msgpack_default, use_bin_type=True, datetime=True),
+        lambda raw: msgpack.unpackb(raw, timestamp=3),  # ext -1 -> datetime
+        _uuid_bytes,
+    )
+    FORMATS["application/msgpack"] = _mp
+    FORMATS["application/x-msgpack"] = _mp
+if cbor2 is not None:
+    FORMATS["application/cbor"] = Format(
+        "application/cbor",
+        lambda obj: cbor2.dumps(obj, datetime_as_timestamp=True, timezone=timezone.utc, default=_cbor_default),
+        cbor2.loads,
+        lambda v: cbor2.CBORTag(37, _uuid_bytes(v)),
+    )
+
+
+def negotiate(accept: str) -> Optional[Format]:
+    """The binary format to answer in, or None for JSON.
+
+    Binary only when the client names it and doesn't prefer JSON; `*/*`
+    alone means JSON.
+    """
+    if not FORMATS or not accept:
+        return None
+    qs = qvalues(accept)
+    json_q = qs.get(JSON, qs.get("application/*", qs.get("*/*", 0.0)))
+    best, best_q = None, 0.0
+    for media_type, fmt in FORMATS.items():
+        q = qs.get(media_type, 0.0)
+        if q > best_q and q >= json_q:
+            best, best_q = fmt, q
+    return best
+
+
+def _json_default(v: Any) -> Any:
+    if isinstance(v, bytes) and len(v) == 16:  # a UUID sent as msgpack bin
+        return str(UUID(bytes=v))
+    return fastjson._default(v)
+
+
+def to_json(obj: Any) -> bytes:
+    if fastjson.orjson is not None:
+        return fastjson.orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, separators=(",", ":"), default=_json_default).encode()
+
+
+def from_json(raw: bytes) -> Any:
+    return fastjson.orjson.loads(raw) if fastjson.orjson is not None else json.loads(raw)
+
+
+# ---- middleware ----------------------------------------------------------------
+Headers = List[Tuple[bytes, bytes]]
+
+
+def _header(headers: Headers, name: bytes) -> Optional[str]:
+    for k, v in headers:
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return None
+
+
+def _replace(headers: Headers, **values: str) -> Headers:
+    names = {k.replace("_", "-").encode() for k in values}
+    out = [(k, v) for k, v in headers if k.lower() not in names]
+    out += [(k.replace("_", "-").encode(), v.encode("latin-1")) for k, v in values.items()]
+    return out
+
+
+def _with_vary(headers: Headers) -> Headers:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept")]
+    if "accept" in [v.strip().lower() for v in vary.split(",")]:
+        return headers
+    return _replace(headers, vary=f"{vary}, Accept")
+
+
+def _media(content_type: Optional[str]) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+class WireFormatMiddleware:
+    """Pure ASGI: decodes binary request bodies, encodes or transcodes JSON responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = scope.get("headers", [])
+        fmt = negotiate(_header(headers, b"accept") or "")
+
+        body_fmt = FORMATS.get(_media(_header(headers, b"content-type")))
+        if body_fmt is not None:
+            chunks = []
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    break
+            raw = b"".join(chunks)
+            try:
+                data = to_json(body_fmt.unpack(raw)) if raw else b""
+            except Exception:
+                return await _error(send, fmt, 400, f"Malformed {body_fmt.media_type} body")
+            scope = {**scope, "headers": _replace(headers, content_type=JSON, content_length=str(len(data)))}
+            replayed = False
+
+            async def receive_json():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": data, "more_body": False}
+                return await receive()  # later calls wait for the disconnect as usual
+
+            receive = receive_json
+
+        token = wire_format.set(fmt)
+        try:
+            await self.app(scope, receive, _Responder(send, fmt).send)
+        finally:
+            wire_format.reset(token)
+
+
+async def _error(send, fmt: Optional[Format], status: int, detail: str) -> None:
+    body = fmt.pack({"detail": detail}) if fmt else to_json({"detail": detail})
+    media_type = fmt.media_type if fmt else JSON
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", media_type.encode()), (b"content-length", str(len(body)).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class _Responder:
+    """Adds Vary: Accept to negotiable responses (and 304s); transcodes JSON when a binary format was asked for."""
+
+    __slots__ = ("_send", "fmt", "_start", "_chunks", "_passthrough")
+
+    def __init__(self, send, fmt: Optional[Format]):
+        self._send = send
+        self.fmt = fmt
+        self._start: Optional[Dict[str, Any]] = None
+        self._chunks: List[bytes] = []
+        self._passthrough = True
+
+    async def send(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = list(message.get("headers", []))
+            media = _media(_header(headers, b"content-type"))
+            if media == JSON or media in FORMATS or message["status"] == 304:
+                message = {**message, "headers": _with_vary(headers)}
+                if self.fmt is not None and media == JSON:
+                    self._start, self._passthrough = message, False  # held until the body is complete
+                    return
+            return await self._send(message)
+        if kind != "http.response.body" or self._passthrough:
+            return await self._send(message)
+
+        self._chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+        raw = b"".join(self._chunks)
+        headers = self._start["headers"]
+        if raw:
+            with phase("serialize"):
+                raw = self.fmt.pack(from_json(raw))
+            headers = _replace(headers, content_type=self.fmt.media_type, content_length=str(len(raw)))
+        await self._send({**self._start, "headers": headers})
+        await self._send({"type": "http.response.body", "body": raw})
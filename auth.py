@@ -1,7 +1,59 @@
 # auth.py
 import os
-import httpx
+import time
+from typing import Any, Dict, Optional
+
 from fastapi import Header, HTTPException
+from jose import jwt, JWTError
+
+from app.cache import TokenCache
+from app.http import http_client  # shared with app/auth.py; main.lifespan closes it
+from app.timing import phase
+
+# HS256 secret; when set, tokens are verified locally instead of via /auth/v1/user
+JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+# how long a remotely verified token is trusted before we ask Supabase again
+REMOTE_VERIFY_TTL = float(os.getenv("AUTH_REMOTE_VERIFY_TTL", "300"))
+
+_tokens = TokenCache(maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")), name="auth")
+
+
+def _verify_locally(token: str, supabase_url: str) -> Optional[Dict[str, Any]]:
+    """Verify an HS256 token with the project secret; None if we can't check it here."""
+    if not JWT_SECRET:
+        return None
+    try:
+        if jwt.get_unverified_header(token).get("alg", "").upper() != "HS256":
+            return None
+        claims = jwt.decode(
+            token,
+            JWT_SECRET,
+            algorithms=["HS256"],
+            options={"verify_aud": False},
+            issuer=f"{supabase_url}/auth/v1",
+        )
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if not claims.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    # same keys callers read from the /auth/v1/user payload
+    return {
+        "id": claims["sub"],
+        "email": claims.get("email"),
+        "phone": claims.get("phone"),
+        "role": claims.get("role"),
+        "app_metadata": claims.get("app_metadata") or {},
+        "user_metadata": claims.get("user_metadata") or {},
+    }
+
+
+def _unverified_exp(token: str) -> Optional[float]:
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
 
 async def get_current_user(authorization: str = Header(...)):
     """Verify the Supabase user JWT sent from the iOS app."""
@@ -14,16 +66,30 @@ async def get_current_user(authorization: str = Header(...)):
 
     token = authorization.split(" ", 1)[1]
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{supabase_url}/auth/v1/user",
-            headers={
-                "Authorization": f"Bearer {token}",
-                "apikey": token,  # Supabase accepts the user JWT here
-            },
-        )
+    with phase("auth"):
+        user = _tokens.get(token)
+        if user is not None:
+            return user
+
+        started = time.perf_counter()
+        user = _verify_locally(token, supabase_url)
+        local = user is not None
+        if not local:
+            resp = await http_client().get(
+                f"{supabase_url}/auth/v1/user",
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "apikey": token,  # Supabase accepts the user JWT here
+                },
+            )
+            if resp.status_code != 200:
+                raise HTTPException(status_code=401, detail="Invalid or expired token")
+            user = resp.json()  # contains at least { "id": "<user-id>", ... }
+
+        _tokens.record_miss(time.perf_counter() - started)
+        _tokens.put(token, user, _unverified_exp(token), max_ttl=None if local else REMOTE_VERIFY_TTL)
+        return user
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    return resp.json()  # contains at least { "id": "<user-id>", ... }
+def token_cache_stats() -> Dict[str, Any]:
+    return _tokens.stats()
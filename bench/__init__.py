@@ -0,0 +1,2 @@
+# bench/__init__.py
+# offline benchmarks; run from the repo root, e.g. `python -m bench.bench_supabase_pool`
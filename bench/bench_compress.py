@@ -0,0 +1,88 @@
+# bench/bench_compress.py
+"""
+Response compression (app/compression.py): bytes saved vs CPU spent, per
+encoding and level, for job-list payloads of several sizes. Also shows what
+per-chunk flushing costs a streamed (NDJSON) body compared with one shot.
+
+Encodings whose package isn't installed (brotli, zstandard) are skipped.
+
+    python -m bench.bench_compress --sizes 1k,10k,100k,1m
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import zlib
+
+from app import compression
+from app.fastjson import dump_rows
+from bench.bench_normalize import make_rows
+import main
+
+LEVELS = {"gzip": (1, 5, 9), "br": (1, 4, 7), "zstd": (1, 3, 10)}
+STREAM_CHUNK = 8192
+
+
+def _encoder(enc: str, level: int):
+    return {"gzip": compression._Gzip, "br": compression._Brotli, "zstd": compression._Zstd}[enc](level)
+
+
+def _size(s: str) -> int:
+    s = s.strip().lower()
+    mult = {"k": 1024, "m": 1024 * 1024}.get(s[-1], 1)
+    return int(float(s.rstrip("km")) * mult)
+
+
+def payload(n_bytes: int) -> bytes:
+    """A job list (embedded clients) of about n_bytes."""
+    per_row = len(dump_rows(make_rows(10, 5)[0], main.ApiJob)) // 10
+    jobs, _ = make_rows(max(1, n_bytes // per_row), 50)
+    return dump_rows(jobs, main.ApiJob)
+
+
+def _time(fn, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def one_shot(enc: str, level: int, body: bytes) -> bytes:
+    return _encoder(enc, level).finish(body)
+
+
+def streamed(enc: str, level: int, body: bytes) -> bytes:
+    e = _encoder(enc, level)
+    parts = [e.chunk(body[i:i + STREAM_CHUNK]) for i in range(0, len(body), STREAM_CHUNK)]
+    return b"".join(parts) + e.finish()
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1k,10k,100k,1m")
+    ap.add_argument("--repeat", type=int, default=9)
+    args = ap.parse_args()
+
+    encs = [e for e in ("gzip", "br", "zstd") if e in compression.ENCODERS]
+    print(f"encodings available: {', '.join(encs)}; median of {args.repeat}; streamed = {STREAM_CHUNK} B chunks, flushed")
+    print(f"  {'size':>8} {'enc':<5} {'lvl':>3} {'bytes':>9} {'ratio':>6} {'ms':>8} {'MB/s':>7} {'streamed':>9} {'s-ms':>7}")
+    for size in (_size(s) for s in args.sizes.split(",")):
+        body = payload(size)
+        for enc in encs:
+            for level in LEVELS[enc]:
+                out = one_shot(enc, level, body)
+                if enc == "gzip":
+                    assert zlib.decompress(out, 31) == body
+                t = _time(lambda: one_shot(enc, level, body), args.repeat)
+                s_out = streamed(enc, level, body)
+                ts = _time(lambda: streamed(enc, level, body), args.repeat)
+                print(f"  {len(body):>8} {enc:<5} {level:>3} {len(out):>9} {len(out) / len(body):>6.1%} "
+                      f"{t * 1000:>8.3f} {len(body) / t / 1e6:>7.0f} {len(s_out):>9} {ts * 1000:>7.3f}")
+    print(f"\nbelow COMPRESS_MIN_BYTES={compression.COMPRESS_MIN_BYTES} responses are sent as-is")
+
+
+if __name__ == "__main__":
+    main_()
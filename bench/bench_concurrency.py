@@ -0,0 +1,96 @@
+# bench/bench_concurrency.py
+"""
+Throughput of the app/ routers as concurrent clients grow.
+
+Runs app.main:app in process against the SQLite stand-in (bench/sqlite_db.py)
+with an injected per-statement latency, and reports req/s, p50/p95 and the
+event-loop lag seen by app/loopmon.py at each concurrency level. Blocking
+I/O inside handlers shows up as flat throughput and high loop lag.
+
+    python -m bench.bench_concurrency --levels 1,4,16,64 --latency-ms 5
+
+Needs aiosqlite in addition to requirements.txt.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from bench import sqlite_db
+
+
+def _env(db_path: str) -> None:
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench.service.key")
+    os.environ.setdefault("STRIPE_SECRET_KEY", "sk_test_bench")
+    os.environ.setdefault("STRIPE_WEBHOOK_SECRET", "whsec_bench")
+    os.environ["SUPABASE_DB_URL"] = sqlite_db.url(db_path)
+
+
+async def _level(client, paths, concurrency: int, total: int):
+    timings = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            r.raise_for_status()
+            timings.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    timings.sort()
+    return total / wall, timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+
+async def run(levels, total: int, latency_ms: float) -> None:
+    import httpx
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "public.db")
+        sqlite_db.create_schema(path)
+        uid = sqlite_db.seed(path, "bench-auth-user", clients=20, jobs=500)
+        _env(path)
+
+        from app import db
+        from app.deps import get_user
+        from app.loopmon import LoopLagMonitor
+        from app.main import app
+
+        db._ensure_engine()
+        sqlite_db.attach_public(db._engine, path, latency_ms=latency_ms)
+        app.dependency_overrides[get_user] = lambda: {"id": uid}
+
+        paths = ["/clients", "/jobs?limit=50", "/jobs?status=active_unscheduled&limit=20"]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get("/clients")  # warm the pool
+            print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'loop lag p99 ms':>16}")
+            for level in levels:
+                lag = LoopLagMonitor(interval=0.01)
+                lag.start()
+                rps, p50, p95 = await _level(client, paths, level, total)
+                await lag.stop()
+                print(f"{level:>8} {rps:>9.0f} {p50 * 1e3:>8.2f} {p95 * 1e3:>8.2f} {lag.stats()['p99_ms']:>16.2f}")
+        await db.dispose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--levels", default="1,4,16,64")
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--latency-ms", type=float, default=5.0)
+    args = ap.parse_args()
+    asyncio.run(run([int(x) for x in args.levels.split(",")], args.requests, args.latency_ms))
+
+
+if __name__ == "__main__":
+    main()
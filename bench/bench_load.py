@@ -0,0 +1,366 @@
+# bench/bench_load.py
+"""
+Offline load test for main:app, app.main:app and the routers/ modules.
+
+Everything runs in one process: the apps are driven through httpx's ASGI
+transport, Supabase (PostgREST, GoTrue, JWKS) and Stripe are answered by
+bench/fakes.py with an injected latency, and app/'s Postgres is the SQLite
+stand-in from bench/sqlite_db.py. Each target runs list, create, checkout
+and webhook scenarios in turn and reports throughput and p50/p95/p99 per
+endpoint, plus how many upstream calls each scenario made.
+
+    python -m bench.bench_load --targets main,app,routers --requests 400 \\
+        --concurrency 16 --latency-ms 2 --out bench-results.json
+    python -m bench.bench_load --compare old.json new.json
+
+Results files carry the commit they were taken at, so runs from two
+commits can be compared with --compare. Needs aiosqlite for the app and
+routers targets.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench import sqlite_db
+from bench.fakes import FAKE_SERVICE_KEY, FakeServices, stripe_webhook
+
+TARGETS = ("main", "app", "routers")
+WEBHOOK_SECRET = "whsec_bench"
+AUTH_USER = "00000000-0000-4000-8000-00000000be0c"
+
+# request(i) -> (method, path, json body or raw bytes, headers)
+Request = Tuple[str, str, Any, Dict[str, str]]
+
+
+class Scenario:
+    def __init__(self, name: str, route: str, request: Callable[[int], Request]):
+        self.name = name
+        self.route = route  # for reports, e.g. "GET /jobs"
+        self.request = request
+
+
+def _env(fake: FakeServices, tmp: str, db_path: str, latency_ms: float) -> None:
+    os.environ.update({
+        "SUPABASE_URL": fake.url,
+        "SUPABASE_SERVICE_ROLE": FAKE_SERVICE_KEY,
+        "SUPABASE_SERVICE_ROLE_KEY": FAKE_SERVICE_KEY,
+        "SUPABASE_PROJECT_REF": "bench",
+        "SUPABASE_ANON_KEY": FAKE_SERVICE_KEY,
+        "SUPABASE_DB_URL": sqlite_db.url(db_path),
+        "STRIPE_SECRET_KEY": "sk_test_bench",
+        "STRIPE_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "STRIPE_OUTBOX_PATH": os.path.join(tmp, "stripe_outbox.sqlite3"),
+        "PAYMENTS_OUTBOX_PATH": os.path.join(tmp, "payments_outbox.sqlite3"),
+    })
+    # tokens go to the (fake) GoTrue instead of being verified locally
+    os.environ.pop("SUPABASE_JWT_SECRET", None)
+
+
+def _point_auth_at(fake: FakeServices) -> None:
+    # app/auth.py only knows the project's own host; aim it at the fake GoTrue/JWKS
+    from app import auth
+
+    base = fake.url + "/auth/v1"
+    auth.ISSUER, auth.JWKS_URL, auth.USER_URL = base, f"{base}/.well-known/jwks.json", f"{base}/user"
+
+
+def _seed_fake(fake: FakeServices, clients: int, jobs: int) -> None:
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    stamp = lambda i: datetime.fromtimestamp(base + i, timezone.utc).isoformat()
+    fake.rows["clients"] = [
+        {"id": f"00000000-0000-4000-8000-{i:012d}", "name": f"Client {i}", "email": f"client{i}@example.com",
+         "phone": None, "address": None, "created_at": stamp(i)}
+        for i in range(clients)
+    ]
+    fake.rows["jobs"] = [
+        {"id": f"00000000-0000-4000-9000-{i:012d}", "client_id": f"00000000-0000-4000-8000-{i % clients:012d}",
+         "title": f"Job {i}", "description": None, "price_cents": 1000 + i, "status": "active_unscheduled",
+         "created_at": stamp(i)}
+        for i in range(jobs)
+    ]
+
+
+def _webhook(session_id: Callable[[int], str], path: str, metadata: Callable[[int], Dict[str, str]]):
+    def request(i: int) -> Request:
+        body, headers = stripe_webhook(
+            "checkout.session.completed",
+            {"id": session_id(i), "object": "checkout.session", "metadata": metadata(i)},
+            WEBHOOK_SECRET,
+        )
+        return "POST", path, body, headers
+    return request
+
+
+# ---- targets -----------------------------------------------------------------
+def _main_target(fake: FakeServices, n_clients: int):
+    import main
+
+    return main.app, [
+        Scenario("list_jobs", "GET /jobs/", lambda i: ("GET", "/jobs/?limit=50", None, {})),
+        Scenario("list_jobs_normalized", "GET /jobs/?shape=normalized",
+                 lambda i: ("GET", "/jobs/?limit=50&shape=normalized", None, {})),
+        Scenario("create_job", "POST /jobs/", lambda i: ("POST", "/jobs/", {
+            "client_name": f"Client {i % n_clients}", "title": f"Bench job {i}", "price_cents": 1500,
+        }, {})),
+    ]
+
+
+def _app_target(fake: FakeServices, db_path: str, latency_ms: float):
+    from app import db
+    from app.main import app
+
+    db._ensure_engine()
+    sqlite_db.attach_public(db._engine, db_path, latency_ms=latency_ms)
+    with sqlite3.connect(db_path) as conn:
+        client_ids = [r[0] for r in conn.execute("select id from clients")]
+        job_ids = [r[0] for r in conn.execute("select id from jobs order by created_at desc limit 50")]
+    auth = {"Authorization": f"Bearer {fake.token(AUTH_USER)}"}
+    return app, [
+        Scenario("list_jobs", "GET /jobs", lambda i: ("GET", "/jobs?limit=50", None, auth)),
+        Scenario("list_clients", "GET /clients", lambda i: ("GET", "/clients", None, auth)),
+        Scenario("create_job", "POST /jobs", lambda i: ("POST", "/jobs", {
+            "client_id": client_ids[i % len(client_ids)], "title": f"Bench job {i}", "price_cents": 1500,
+        }, auth)),
+        Scenario("checkout", "POST /jobs/{id}/checkout",
+                 lambda i: ("POST", f"/jobs/{job_ids[i % len(job_ids)]}/checkout", None, auth)),
+        Scenario("webhook", "POST /stripe/webhook",
+                 _webhook(lambda i: f"cs_test_bench_{i}", "/stripe/webhook", lambda i: {})),
+    ]
+
+
+def _routers_target(fake: FakeServices, db_path: str, latency_ms: float):
+    from fastapi import FastAPI
+
+    import main
+    import payments
+    from app import db
+    from app.routers import clients
+    from routers import jobs
+
+    db._ensure_engine()
+    sqlite_db.attach_public(db._engine, db_path, latency_ms=latency_ms)
+    app = FastAPI(lifespan=main.lifespan)
+    app.include_router(jobs.router)
+    app.include_router(payments.router)
+    app.include_router(clients.router, prefix="/clients")
+
+    job_ids = [j["id"] for j in fake.rows["jobs"][-50:]]
+    gotrue = {"Authorization": f"Bearer {fake.token(AUTH_USER)}"}
+    jwks = {"Authorization": f"Bearer {fake.token(AUTH_USER, alg='RS256', issuer=fake.url + '/auth/v1')}"}
+    return app, [
+        Scenario("list_jobs", "GET /jobs/", lambda i: ("GET", "/jobs/?limit=50", None, {})),
+        Scenario("list_jobs_normalized", "GET /jobs/?shape=normalized",
+                 lambda i: ("GET", "/jobs/?limit=50&shape=normalized", None, {})),
+        Scenario("create_job", "POST /jobs/", lambda i: ("POST", "/jobs/", {
+            "client_name": f"Client {i % 20}", "title": f"Bench job {i}", "price_cents": 1500,
+        }, {})),
+        Scenario("list_clients", "GET /clients/", lambda i: ("GET", "/clients/", None, jwks)),
+        Scenario("checkout", "POST /payments/checkout", lambda i: ("POST", "/payments/checkout", {
+            "job_id": job_ids[i % len(job_ids)], "amount_cents": 1500, "currency": "cad",
+            "customer_email": "payer@example.com",
+            "success_url": "prello://payment-success", "cancel_url": "prello://payment-cancel",
+        }, gotrue)),
+        Scenario("webhook", "POST /payments/webhook", _webhook(
+            lambda i: f"cs_test_bench_{i}", "/payments/webhook",
+            lambda i: {"job_id": job_ids[i % len(job_ids)]},
+        )),
+    ]
+
+
+# ---- running -----------------------------------------------------------------
+def _pct(sorted_s: List[float], p: float) -> float:
+    if not sorted_s:
+        return 0.0
+    return sorted_s[min(len(sorted_s) - 1, max(0, math.ceil(p * len(sorted_s)) - 1))]
+
+
+async def _scenario(client, fake: FakeServices, target: str, sc: Scenario, total: int, concurrency: int, warmup: int):
+    for i in range(warmup):
+        await _send(client, sc.request(-1 - i))
+    upstream_before = fake.requests_by_route
+    timings: List[float] = []
+    statuses: Dict[str, int] = {}
+    next_i = 0
+
+    async def worker():
+        nonlocal next_i
+        while next_i < total:
+            i, next_i = next_i, next_i + 1
+            req = sc.request(i)
+            t0 = time.perf_counter()
+            try:
+                status = str((await _send(client, req)).status_code)
+            except Exception as e:
+                status = type(e).__name__
+            timings.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    upstream = {
+        route: n - upstream_before.get(route, 0)
+        for route, n in fake.requests_by_route.items()
+        if n - upstream_before.get(route, 0)
+    }
+    timings.sort()
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "target": target,
+        "scenario": sc.name,
+        "route": sc.route,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(n for s, n in statuses.items() if not s.startswith(("2", "3"))),
+        "statuses": statuses,
+        "seconds": round(wall, 4),
+        "rps": round(total / wall, 1),
+        "p50_ms": ms(_pct(timings, 0.50)),
+        "p95_ms": ms(_pct(timings, 0.95)),
+        "p99_ms": ms(_pct(timings, 0.99)),
+        "max_ms": ms(timings[-1]) if timings else 0.0,
+        "upstream_per_request": {r: round(n / total, 3) for r, n in sorted(upstream.items())},
+    }
+
+
+async def _send(client, req: Request):
+    method, path, body, headers = req
+    if isinstance(body, bytes):
+        return await client.request(method, path, content=body, headers=headers)
+    return await client.request(method, path, json=body, headers=headers)
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import stripe
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, FakeServices(latency_ms=args.latency_ms, jwks=True) as fake:
+        db_path = os.path.join(tmp, "public.db")
+        sqlite_db.create_schema(db_path)
+        sqlite_db.seed(db_path, AUTH_USER, clients=args.clients, jobs=args.jobs)
+        _seed_fake(fake, args.clients, args.jobs)
+        _env(fake, tmp, db_path, args.latency_ms)
+
+        for target in args.targets:
+            if target == "main":
+                app, scenarios = _main_target(fake, args.clients)
+            elif target == "app":
+                app, scenarios = _app_target(fake, db_path, args.db_latency_ms)
+            else:
+                app, scenarios = _routers_target(fake, db_path, args.db_latency_ms)
+            stripe.api_base = fake.url  # after the app modules have configured stripe
+            _point_auth_at(fake)
+
+            transport = httpx.ASGITransport(app=app)
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                    for sc in scenarios:
+                        if args.scenarios and sc.name not in args.scenarios:
+                            continue
+                        r = await _scenario(client, fake, target, sc, args.requests, args.concurrency, args.warmup)
+                        results.append(r)
+                        _print_row(r)
+
+        if "app" in args.targets or "routers" in args.targets:
+            from app import db
+
+            await db.dispose()
+
+    return {"meta": _meta(args), "results": results}
+
+
+def _meta(args) -> Dict[str, Any]:
+    def git(*cmd: str) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *cmd], capture_output=True, text=True, check=True).stdout.strip()
+        except Exception:
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+    }
+
+
+def _print_row(r: Dict[str, Any]) -> None:
+    print(
+        f"{r['target']:<8} {r['route']:<26} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+        f"{r['p99_ms']:>8.2f} {r['errors']:>6}",
+        flush=True,
+    )
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    before = {(r["target"], r["scenario"]): r for r in old["results"]}
+    print(f"{(old['meta'].get('commit') or '?')[:10]} -> {(new['meta'].get('commit') or '?')[:10]}")
+    print(f"{'target':<8} {'route':<26} {'req/s':>18} {'p95 ms':>20} {'p99 ms':>20}")
+
+    def cell(a: float, b: float) -> str:
+        delta = (b - a) / a * 100 if a else 0.0
+        return f"{a:.1f}->{b:.1f} ({delta:+.0f}%)"
+
+    for r in new["results"]:
+        o = before.get((r["target"], r["scenario"]))
+        if o is None:
+            continue
+        print(
+            f"{r['target']:<8} {r['route']:<26} {cell(o['rps'], r['rps']):>18} "
+            f"{cell(o['p95_ms'], r['p95_ms']):>20} {cell(o['p99_ms'], r['p99_ms']):>20}"
+        )
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--targets", default=",".join(TARGETS))
+    ap.add_argument("--scenarios", default="", help="comma-separated subset, e.g. list_jobs,checkout")
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--warmup", type=int, default=10)
+    ap.add_argument("--latency-ms", type=float, default=2.0, help="per call to the Supabase/Stripe fakes")
+    ap.add_argument("--db-latency-ms", type=float, default=1.0, help="per SQL statement on the SQLite stand-in")
+    ap.add_argument("--clients", type=int, default=20)
+    ap.add_argument("--jobs", type=int, default=500)
+    ap.add_argument("--out", default="bench-results.json")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    args.targets = [t for t in args.targets.split(",") if t]
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        sys.exit(f"unknown target(s): {', '.join(sorted(unknown))}")
+
+    print(f"{'target':<8} {'route':<26} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    report = asyncio.run(run(args))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,93 @@
+# bench/bench_normalize.py
+"""
+Job list payloads, embedded vs normalized (`?shape=normalized`): bytes on
+the wire and serialization time for one page of a contractor's jobs.
+
+Embedded repeats the client object in every job row; normalized sends jobs
+with client_id and each client once. The gap grows with jobs per client;
+at one job per client normalized is slightly larger (ids appear twice).
+
+    python -m bench.bench_normalize --jobs 2000 --clients 50
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+import main
+from app import fastjson
+
+
+def make_rows(n_jobs: int, n_clients: int) -> Tuple[List[dict], List[dict]]:
+    """(jobs as PostgREST returns main.JOB_SELECT, the clients they reference).
+
+    The normalized route selects main.JOB_COLUMNS, so its rows lack "client";
+    normalized() strips it to match.
+    """
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    clients = [{
+        "id": str(uuid.uuid4()), "name": f"Client {i}", "email": f"client{i}@example.com",
+        "phone": "+1 555 0100", "address": f"{i} Main St, Springfield", "created_at": (start + timedelta(days=i)).isoformat(),
+    } for i in range(n_clients)]
+    jobs = []
+    for i in range(n_jobs):
+        c = clients[i % n_clients]
+        jobs.append({
+            "id": str(uuid.uuid4()), "client_id": c["id"], "title": f"Job {i}",
+            "description": "Replace kitchen faucet and check under-sink plumbing",
+            "price_cents": 12500 + i, "status": "active_unscheduled",
+            "created_at": (start + timedelta(minutes=i)).isoformat(), "client": c,
+        })
+    return jobs, clients
+
+
+def embedded(jobs: List[dict], clients: List[dict]) -> bytes:
+    return fastjson.dump_rows(jobs, main.ApiJob)
+
+
+def normalized(jobs: List[dict], clients: List[dict]) -> bytes:
+    # what the route does: dedupe the page's client ids, then encode both parts
+    ids = set(dict.fromkeys(j["client_id"] for j in jobs))
+    related = [c for c in clients if c["id"] in ids]
+    return fastjson.dump_normalized(jobs, main.ApiJob, "client", related, main.NORMALIZED_KEYS)
+
+
+def _time(fn, jobs, clients, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(jobs, clients)
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=2000)
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    jobs, clients = make_rows(args.jobs, args.clients)
+    bare = [{k: v for k, v in j.items() if k != "client"} for j in jobs]
+    encoder = "orjson" if fastjson.orjson is not None else "json"
+    print(f"{args.jobs} jobs across {args.clients} clients, median of {args.repeat}, encoder: {encoder}")
+    print(f"  {'shape':<11} {'serialize':>10} {'bytes':>10} {'gzip':>9}")
+    results = {}
+    for name, fn, rows in (("embedded", embedded, jobs), ("normalized", normalized, bare)):
+        fn(rows[:50], clients)  # warm up
+        t = _time(fn, rows, clients, args.repeat)
+        body = fn(rows, clients)
+        results[name] = (t, len(body))
+        print(f"  {name:<11} {t * 1000:8.2f}ms {len(body):>10} {len(gzip.compress(body, 6)):>9}")
+    (te, be), (tn, bn) = results["embedded"], results["normalized"]
+    print(f"  normalized: {bn / be:.0%} of the bytes, {tn / te:.0%} of the serialize time")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,91 @@
+# bench/bench_pool.py
+"""
+Checkout wait under load: fixed vs adaptive pool for app/db.py, against the
+SQLite stand-in with a per-statement delay.
+
+Each mode runs the same bursts of concurrent sessions (more than pool_size),
+each doing one query, and reports checkout wait percentiles from the pool's
+own histogram, timeouts, throughput and where the overflow limit ended up.
+
+    python -m bench.bench_pool --concurrency 40 --seconds 6 --latency-ms 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from bench import sqlite_db
+
+
+async def _run(mode: str, path: str, args) -> dict:
+    os.environ["DB_POOL_ADAPTIVE"] = "1" if mode == "adaptive" else "0"
+    from app import db
+
+    await db.dispose()
+    db._ensure_engine()
+    sqlite_db.attach_public(db._engine, path, latency_ms=args.latency_ms)
+
+    done = 0
+    errors = 0
+    deadline = time.perf_counter() + args.seconds
+
+    async def worker():
+        nonlocal done, errors
+        while time.perf_counter() < deadline:
+            try:
+                async with db.session_scope() as s:
+                    await s.execute(text("select id from public.jobs order by created_at desc limit 20"))
+                done += 1
+            except Exception:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - t0
+    stats = db.pool_stats()
+    await db.dispose()
+    return {"mode": mode, "rps": done / wall, "errors": errors, **stats}
+
+
+async def _main(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        sqlite_db.create_schema(path)
+        sqlite_db.seed(path, "bench-user", jobs=500)
+        os.environ.update({
+            "SUPABASE_DB_URL": sqlite_db.url(path),
+            "DB_POOL_SIZE": str(args.pool_size),
+            "DB_POOL_MAX_OVERFLOW": str(args.max_overflow),
+            "DB_POOL_TIMEOUT": str(args.timeout),
+            "DB_POOL_ADAPT_INTERVAL": str(args.adapt_interval),
+        })
+        for mode in ("fixed", "adaptive"):
+            r = await _run(mode, path, args)
+            w = r.get("wait_ms", {})
+            print(
+                f"{mode:9s} {r['rps']:7.0f} q/s  wait p50={w.get('p50', 0):7.2f}ms "
+                f"p95={w.get('p95', 0):7.2f}ms p99={w.get('p99', 0):7.2f}ms  "
+                f"timeouts={r['timeouts']} errors={r['errors']}  "
+                f"overflow_limit={r['overflow_limit']} (bounds {r['overflow_bounds']}, {r['resizes']} resizes)"
+            )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=40)
+    ap.add_argument("--seconds", type=float, default=6.0)
+    ap.add_argument("--latency-ms", type=float, default=5.0)
+    ap.add_argument("--pool-size", type=int, default=5)
+    ap.add_argument("--max-overflow", type=int, default=10)
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--adapt-interval", type=float, default=1.0)
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# bench/bench_replicas.py
+"""
+Read routing against two SQLite files standing in for a primary and a replica
+(plus an unreachable third URL to show ejection).
+
+Nothing replicates between the files, which makes routing visible: a job
+created through the API exists only on the primary, so it shows up in
+GET /jobs during the read-your-writes window and disappears once reads go
+back to the (stale) replica.
+
+    python -m bench.bench_replicas --requests 200 --concurrency 16 --latency-ms 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from bench import sqlite_db
+
+WINDOW_S = 0.5
+
+
+def _setup_env(primary: str, replica: str, tmp: str) -> None:
+    os.environ.update({
+        "SUPABASE_URL": "http://127.0.0.1:9",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench.service.key",
+        "STRIPE_SECRET_KEY": "sk_test_bench",
+        "STRIPE_WEBHOOK_SECRET": "whsec_bench",
+        "STRIPE_OUTBOX_PATH": os.path.join(tmp, "stripe_outbox.sqlite3"),
+        "SUPABASE_DB_URL": sqlite_db.url(primary),
+        # the second URL's directory doesn't exist, so connecting fails
+        "SUPABASE_DB_REPLICA_URLS": f"{sqlite_db.url(replica)},sqlite+aiosqlite:///{tmp}/missing/dir.db",
+        "DB_READ_YOUR_WRITES_S": str(WINDOW_S),
+        "DB_REPLICA_MAX_LAG_S": str(WINDOW_S),  # the window can't be shorter
+        "LIST_CACHE_TTL": "0",  # every list read reaches the database
+        "WARM_ON_STARTUP": "0",
+    })
+
+
+async def _main(args) -> None:
+    import httpx
+
+    with tempfile.TemporaryDirectory() as tmp:
+        primary = os.path.join(tmp, "primary.sqlite3")
+        replica = os.path.join(tmp, "replica.sqlite3")
+        sqlite_db.create_schema(primary)
+        uid = sqlite_db.seed(primary, "bench-user", jobs=200)
+        shutil.copy(primary, replica)  # replica starts in sync, then falls behind
+        _setup_env(primary, replica, tmp)
+
+        from sqlalchemy import event
+
+        from app import db
+        from app.deps import get_user
+        from app.main import app
+
+        db._ensure_engine()
+        sqlite_db.attach_public(db._engine, primary, latency_ms=args.latency_ms)
+        sqlite_db.attach_public(db._replicas.replicas[0].engine, replica, latency_ms=args.latency_ms)
+        statements = Counter()
+        names = {id(db._engine.sync_engine): "primary"}
+        names.update({id(r.engine.sync_engine): r.name for r in db._replicas.replicas})
+        for engine in db.engines():
+            event.listen(engine.sync_engine, "before_cursor_execute",
+                         lambda conn, *a: statements.update([names[id(conn.engine)]]))
+        app.dependency_overrides[get_user] = lambda: {"id": uid}
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://x") as c:
+            # 1. read load spreads over healthy replicas; the dead one is ejected
+            timings, statuses = [], Counter()
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def one():
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await c.get("/jobs?limit=50")
+                    timings.append(time.perf_counter() - t0)
+                    statuses[r.status_code] += 1
+
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+            print(f"reads: {args.requests} x GET /jobs  p50={statistics.median(timings) * 1e3:.2f}ms  "
+                  f"statuses={dict(statuses)}  statements={dict(statements)}")
+            for r in db.pool_stats()["read_routing"]["replicas"]:
+                print(f"  {r['name']}: healthy={r['healthy']} reads={r['reads']} ejections={r['ejections']}"
+                      + (f" last_error={r['last_error'][:60]!r}" if r["last_error"] else ""))
+
+            # 2. read-your-writes: the new job is only on the primary
+            client_id = (await c.get("/clients")).json()[0]["id"]
+            created = (await c.post("/jobs", json={"client_id": client_id, "title": "Fresh job", "price_cents": 1})).json()
+
+            async def visible() -> bool:
+                return any(j["id"] == created["id"] for j in (await c.get("/jobs?limit=5")).json())
+
+            print(f"right after the write: new job visible={await visible()} (reads pinned to primary)")
+            await asyncio.sleep(WINDOW_S + 0.1)
+            print(f"after {WINDOW_S}s window:   new job visible={await visible()} (back on the lagging replica)")
+            routing = db.pool_stats()["read_routing"]
+            print(f"sticky reads={routing['sticky_reads']} fallback reads={routing['fallback_reads']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--latency-ms", type=float, default=2.0)
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
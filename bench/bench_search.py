@@ -0,0 +1,93 @@
+# bench/bench_search.py
+"""
+Per-user search index (app/search.py): build time, size and query latency
+for one user with many jobs, next to a linear scan of the same rows (what
+filtering the downloaded list amounts to).
+
+    python -m bench.bench_search --jobs 30000 --clients 300
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.search import UserIndex, terms
+
+WORDS = (
+    "replace install repair faucet toilet sink drain pipe leak water heater furnace filter "
+    "outlet breaker panel light fixture fan ceiling drywall patch paint trim door lock window "
+    "screen deck fence gate roof gutter shingle tile grout caulk shower tub vanity cabinet "
+    "hinge shelf closet garage opener sprinkler valve hose bib sump pump vent duct thermostat"
+).split()
+SURNAMES = "Smith Nguyen Garcia Müller Tremblay Roy Gagnon Côté Patel Wong Brown Wilson Martin Lee".split()
+
+
+def _rows(n_jobs: int, n_clients: int, seed: int = 7):
+    rng = random.Random(seed)
+    clients = [{"id": f"c{i}", "name": f"{rng.choice(SURNAMES)} {rng.choice(SURNAMES)} #{i}"} for i in range(n_clients)]
+    t0 = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    jobs = []
+    for i in range(n_jobs):
+        c = clients[rng.randrange(n_clients)]
+        jobs.append({
+            "id": f"j{i}", "client_id": c["id"], "client_name": c["name"],
+            "title": " ".join(rng.choices(WORDS, k=3)).capitalize(),
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "price_cents": rng.randrange(1000, 90000), "status": rng.choice(("active_unscheduled", "completed_paid")),
+            "created_at": t0 + timedelta(minutes=37 * i),
+        })
+    return jobs, clients
+
+
+def _scan(jobs, query, limit):
+    words = terms(query)
+    out = []
+    for j in reversed(jobs):
+        text = set(terms(j["title"]) + terms(j["description"]) + terms(j["client_name"]))
+        if all(w in text for w in words[:-1]) and any(t.startswith(words[-1]) for t in text):
+            out.append(j)
+            if len(out) >= limit:
+                break
+    return out
+
+
+def _time(fn, reps):
+    samples = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return statistics.median(samples) * 1e6, samples[int(len(samples) * 0.99) - 1] * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=30000)
+    ap.add_argument("--clients", type=int, default=300)
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--reps", type=int, default=500)
+    args = ap.parse_args()
+
+    jobs, clients = _rows(args.jobs, args.clients)
+    t0 = time.perf_counter()
+    idx = UserIndex.build((jobs, clients))
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"{args.jobs} jobs, {args.clients} clients: build {build_ms:.0f} ms, "
+          f"{len(idx.postings)} terms, size {idx.size}")
+
+    queries = ["leak", "faucet leak", "water heat", "cote", "smith drain", "gutter shingle roof", "zzz", "re"]
+    print(f"{'query':24s} {'hits':>5s} {'index p50':>10s} {'p99':>8s} {'scan p50':>10s}")
+    for q in queries:
+        hits = idx.search(q, limit=args.limit)
+        assert [h["id"] for h in hits] == [j["id"] for j in _scan(jobs, q, args.limit)], q
+        p50, p99 = _time(lambda: idx.search(q, limit=args.limit), args.reps)
+        scan50, _ = _time(lambda: _scan(jobs, q, args.limit), max(3, args.reps // 100))
+        print(f"{q!r:24s} {len(hits):5d} {p50:8.1f}µs {p99:6.1f}µs {scan50 / 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench/bench_serialize.py
+"""
+Per-row cost of serializing a job list: the old path (ApiJob per row, then
+FastAPI's response_model validation + JSONResponse) vs app/fastjson.py
+(project rows, encode once), plus the binary fast paths from app/wire.py
+for whichever of msgpack / cbor2 is installed.
+
+    python -m bench.bench_serialize --rows 10000 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+import main
+from app import fastjson, wire
+
+
+def make_rows(n: int) -> List[dict]:
+    # shaped like PostgREST output for main.JOB_SELECT
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        cid = str(uuid.uuid4())
+        ts = (start + timedelta(seconds=i)).isoformat()
+        rows.append({
+            "id": str(uuid.uuid4()), "client_id": cid, "title": f"Job {i}",
+            "description": "Replace kitchen faucet and check under-sink plumbing",
+            "price_cents": 12500 + i, "status": "active_unscheduled", "created_at": ts,
+            "client": {
+                "id": cid, "name": f"Client {i}", "email": f"client{i}@example.com",
+                "phone": "+1 555 0100", "address": "1 Main St", "created_at": ts,
+            },
+        })
+    return rows
+
+
+_field = create_model_field("Response_list_jobs", List[main.ApiJob])
+
+
+def before(rows: List[dict]) -> bytes:
+    content = [main._row_to_job(r) for r in rows]
+    data = asyncio.run(serialize_response(field=_field, response_content=content, is_coroutine=False))
+    return JSONResponse(data).body
+
+
+def after(rows: List[dict]) -> bytes:
+    return fastjson.RawJSONResponse(fastjson.dump_rows(rows, main.ApiJob)).body
+
+
+def _time(fn, rows, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(rows)
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rows = make_rows(args.rows)
+    encoder = "orjson" if fastjson.orjson is not None else "json"
+    print(f"{args.rows} rows, median of {args.repeat}, fast path encoder: {encoder}")
+    results = {}
+    for name, fn in (("before", before), ("after", after)):
+        fn(rows[:100])  # warm up
+        t = _time(fn, rows, args.repeat)
+        results[name] = t
+        print(f"  {name:<7} {t * 1000:8.1f} ms total  {t / args.rows * 1e6:6.2f} us/row  {len(fn(rows)):>9} bytes")
+    print(f"  speedup {results['before'] / results['after']:.1f}x")
+    for media_type, fmt in wire.FORMATS.items():
+        if media_type == "application/x-msgpack":
+            continue  # alias of application/msgpack
+        def binary(rows, fmt=fmt):
+            token = fastjson.wire_format.set(fmt)
+            try:
+                return fastjson.dump_rows(rows, main.ApiJob)
+            finally:
+                fastjson.wire_format.reset(token)
+        binary(rows[:100])
+        t = _time(binary, rows, args.repeat)
+        print(f"  {media_type.split('/')[1]:<7} {t * 1000:8.1f} ms total  {t / args.rows * 1e6:6.2f} us/row  {len(binary(rows)):>9} bytes")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,79 @@
+# bench/bench_supabase_pool.py
+"""
+Per-request create_client() vs the shared pool, against a local PostgREST
+stand-in.
+
+    python -m bench.bench_supabase_pool --requests 500 --concurrency 8 --latency-ms 1
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from supabase import create_client
+
+from bench.fakes import FakePostgrest, FAKE_SERVICE_KEY
+
+
+def _per_request(url: str) -> None:
+    client = create_client(url, FAKE_SERVICE_KEY)
+    client.table("jobs").select("id").limit(1).execute()
+    client.postgrest.aclose()
+
+
+def _pooled(url: str) -> None:
+    import supabase_pool
+
+    supabase_pool.get_supabase().table("jobs").select("id").limit(1).execute()
+
+
+def _run(name, fn, url, n, concurrency, fake):
+    conns_before = fake.connections
+    timings = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        fn(url)
+        timings.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    timings.sort()
+    print(
+        f"{name:12s} {n / wall:8.0f} req/s  "
+        f"p50={statistics.median(timings) * 1e3:6.2f}ms  "
+        f"p95={timings[int(len(timings) * 0.95) - 1] * 1e3:6.2f}ms  "
+        f"tcp_connections={fake.connections - conns_before}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=1.0)
+    ap.add_argument("--pool-size", type=int, default=1)
+    args = ap.parse_args()
+
+    with FakePostgrest(latency_ms=args.latency_ms) as fake:
+        fake.rows["jobs"] = [{"id": "00000000-0000-0000-0000-000000000001"}]
+        os.environ["SUPABASE_URL"] = fake.url
+        os.environ["SUPABASE_SERVICE_ROLE"] = FAKE_SERVICE_KEY
+
+        import supabase_pool
+
+        supabase_pool.open_pool(args.pool_size)
+        try:
+            _run("per-request", _per_request, fake.url, args.requests, args.concurrency, fake)
+            _run("pooled", _pooled, fake.url, args.requests, args.concurrency, fake)
+        finally:
+            supabase_pool.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# bench/fakes.py
+"""
+Local stand-ins for the hosted services, for offline benchmarks.
+
+One HTTP server answers, by path prefix:
+
+- `/rest/v1/<table>` and `/rest/v1/rpc/create_job_with_client` like PostgREST
+  would for the selects/inserts/updates this service makes (eq/in filters,
+  the keyset `or=` from app/pagination.py, order, limit, the `client:clients`
+  embed), keeping rows in memory;
+- `/auth/v1/user` like GoTrue, trusting the token's claims without checking
+  the signature, and `/auth/v1/.well-known/jwks.json` with the public half of
+  `FakeServices.rsa_key`;
+- `/v1/checkout/sessions` like Stripe (create honours Idempotency-Key and
+  replays the original response, retrieve by id).
+
+It speaks HTTP/1.1 with keep-alive so connection reuse behaves like the real
+thing, and every response can be delayed by a fixed latency. Webhook traffic
+goes the other way; `stripe_webhook()` builds a signed delivery to post to
+the app.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from jose import jwk, jwt
+
+# create_client() only checks the key *looks* like a JWT
+FAKE_SERVICE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.fake"
+FAKE_KID = "bench-rs256"
+
+_KEYSET = re.compile(r'created_at\.lt\."([^"]+)",and\(created_at\.eq\."([^"]+)",id\.lt\."([^"]+)"\)')
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _claims(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except Exception:
+        return None
+
+
+def _form(raw: bytes) -> Dict[str, Any]:
+    """Stripe form encoding (a[b][0][c]=v) -> nested dicts."""
+    out: Dict[str, Any] = {}
+    for key, value in parse_qsl(raw.decode(), keep_blank_values=True):
+        parts = re.findall(r"[^\[\]]+", key)
+        node = out
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            node = node.setdefault(part, value if last else {})
+    return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, *args):  # quiet
+        pass
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        raw = json.dumps(body).encode()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _raw_body(self) -> bytes:
+        # always drain the body so the kept-alive connection stays in sync
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _body(self) -> Any:
+        raw = self._raw_body()
+        return json.loads(raw) if raw else None
+
+    def _route(self, method: str) -> None:
+        route = f"{method} {self._kind()}"
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.by_route[route] = self.server.by_route.get(route, 0) + 1
+        path = urlsplit(self.path).path
+        if path.startswith("/rest/v1/rpc/"):
+            return self._rpc(path.rsplit("/", 1)[-1])
+        if path.startswith("/rest/v1/"):
+            return getattr(self, f"_rest_{method.lower()}")(path.rsplit("/", 1)[-1])
+        if path == "/auth/v1/user":
+            self._raw_body()
+            return self._auth_user()
+        if path == "/auth/v1/.well-known/jwks.json":
+            self._raw_body()
+            return self._send(200, {"keys": [self.server.public_jwk]})
+        if path.startswith("/v1/checkout/sessions"):
+            return self._stripe_sessions(method, path)
+        self._raw_body()
+        self._send(404, {"message": f"no fake for {method} {path}"})
+
+    def _kind(self) -> str:
+        path = urlsplit(self.path).path
+        if path.startswith("/rest/v1/"):
+            return path
+        if path.startswith("/v1/checkout/sessions/"):
+            return "/v1/checkout/sessions/{id}"
+        return path
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    # ---- PostgREST ----------------------------------------------------------
+    def _query(self) -> List[Tuple[str, str]]:
+        return parse_qsl(urlsplit(self.path).query, keep_blank_values=True)
+
+    def _match(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for key, value in self._query():
+            if key in ("select", "order", "limit", "offset"):
+                continue
+            if key == "or":
+                m = _KEYSET.search(value)
+                if m:
+                    ts, _, rid = m.groups()
+                    rows = [r for r in rows if (r["created_at"], r["id"]) < (ts, rid)]
+                continue
+            op, _, arg = value.partition(".")
+            if op == "eq":
+                rows = [r for r in rows if str(r.get(key)) == unquote(arg)]
+            elif op == "in":
+                wanted = {v.strip('"') for v in arg.strip("()").split(",")}
+                rows = [r for r in rows if str(r.get(key)) in wanted]
+        return rows
+
+    def _embed(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        select = dict(self._query()).get("select", "")
+        if "client:clients(" not in select:
+            return rows
+        clients = {c["id"]: c for c in self.server.rows.get("clients", [])}
+        return [{**r, "client": clients.get(r.get("client_id"))} for r in rows]
+
+    def _rest_get(self, table: str) -> None:
+        self._raw_body()
+        query = dict(self._query())
+        with self.server.lock:
+            rows = self._match(list(self.server.rows.get(table, [])))
+        if "order" in query:
+            rows.sort(key=lambda r: (r.get("created_at") or "", r.get("id") or ""), reverse=True)
+        if "limit" in query:
+            rows = rows[: int(query["limit"])]
+        self._send(200, self._embed(rows))
+
+    def _rest_post(self, table: str) -> None:
+        payload = self._body() or {}
+        items = payload if isinstance(payload, list) else [payload]
+        out = []
+        with self.server.lock:
+            for item in items:
+                row = {"id": str(uuid.uuid4()), "created_at": _now(), **item}
+                self.server.rows.setdefault(table, []).append(row)
+                out.append(row)
+        self._send(201, out)
+
+    def _rest_patch(self, table: str) -> None:
+        changes = self._body() or {}
+        with self.server.lock:
+            rows = self._match(self.server.rows.get(table, []))
+            for r in rows:
+                r.update(changes)
+        self._send(200, rows)
+
+    def _rpc(self, name: str) -> None:
+        args = self._body() or {}
+        if name != "create_job_with_client":
+            return self._send(404, {"message": f"no fake rpc {name}"})
+        with self.server.lock:
+            clients = self.server.rows.setdefault("clients", [])
+            client = next((c for c in clients if c["name"] == args.get("p_client_name")), None)
+            if client is None:
+                client = {
+                    "id": str(uuid.uuid4()), "name": args.get("p_client_name"),
+                    "email": args.get("p_client_email"), "phone": None, "address": None,
+                    "created_at": _now(),
+                }
+                clients.append(client)
+            job = {
+                "id": str(uuid.uuid4()), "client_id": client["id"], "title": args.get("p_title"),
+                "description": args.get("p_description"), "price_cents": args.get("p_price_cents"),
+                "status": "active_unscheduled", "created_at": _now(),
+            }
+            self.server.rows.setdefault("jobs", []).append(job)
+        self._send(200, {**job, "client": client})
+
+    # ---- GoTrue -------------------------------------------------------------
+    def _auth_user(self) -> None:
+        token = (self.headers.get("Authorization") or "").removeprefix("Bearer ").strip()
+        claims = _claims(token)
+        if not claims or not claims.get("sub"):
+            return self._send(401, {"msg": "invalid JWT"})
+        self._send(200, {
+            "id": claims["sub"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": claims.get("email"),
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": _now(),
+        })
+
+    # ---- Stripe -------------------------------------------------------------
+    def _stripe_sessions(self, method: str, path: str) -> None:
+        sessions = self.server.stripe_sessions
+        if method == "GET":
+            self._raw_body()
+            sess = sessions.get(path.rsplit("/", 1)[-1])
+            if sess is None:
+                return self._send(404, {"error": {"type": "invalid_request_error", "message": "No such session"}})
+            return self._send(200, sess)
+        params = _form(self._raw_body())
+        key = self.headers.get("Idempotency-Key")
+        with self.server.lock:
+            original = self.server.idempotency.get(key) if key else None
+            if original is None:
+                sid = "cs_test_" + uuid.uuid4().hex
+                sessions[sid] = {
+                    "id": sid,
+                    "object": "checkout.session",
+                    "url": f"https://checkout.stripe.com/c/pay/{sid}",
+                    "status": "open",
+                    "payment_status": "unpaid",
+                    "expires_at": int(time.time()) + 86400,
+                    "metadata": params.get("metadata", {}),
+                }
+                if key:
+                    self.server.idempotency[key] = dict(sessions[sid])
+        if original is not None:
+            # like Stripe: the original creation response, whatever happened since
+            return self._send(200, original, {"Idempotency-Key": key, "Idempotent-Replayed": "true"})
+        self._send(200, sessions[sid], {"Idempotency-Key": key} if key else None)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency: float, public_jwk: Dict[str, Any]):
+        super().__init__(addr, _Handler)
+        self.latency = latency
+        self.public_jwk = public_jwk
+        self.lock = threading.Lock()
+        self.rows: Dict[str, List[Dict[str, Any]]] = {}
+        self.stripe_sessions: Dict[str, Dict[str, Any]] = {}
+        self.idempotency: Dict[str, Dict[str, Any]] = {}  # key -> original response
+        self.by_route: Dict[str, int] = {}
+        self.connections = 0
+        self.requests = 0
+
+    def get_request(self):
+        conn = super().get_request()
+        self.connections += 1
+        return conn
+
+
+_rsa_pem: Optional[bytes] = None
+
+
+def _rsa_private_pem() -> bytes:
+    # generated once per process; small, since pure-Python keygen is slow and
+    # nothing here needs real strength
+    global _rsa_pem
+    if _rsa_pem is None:
+        import rsa
+
+        _, private = rsa.newkeys(1024)
+        _rsa_pem = private.save_pkcs1()
+    return _rsa_pem
+
+
+class FakeServices:
+    """`with FakeServices(latency_ms=2) as fake: fake.url ...`"""
+
+    def __init__(self, latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0, jwks: bool = False):
+        self.rsa_key = _rsa_private_pem() if jwks else None
+        public = {}
+        if self.rsa_key is not None:
+            public = {**jwk.construct(self.rsa_key, "RS256").public_key().to_dict(), "kid": FAKE_KID, "use": "sig"}
+        self._server = _Server((host, port), latency_ms / 1000.0, public)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self._server.rows
+
+    @property
+    def stripe_sessions(self) -> Dict[str, Dict[str, Any]]:
+        return self._server.stripe_sessions
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def requests_by_route(self) -> Dict[str, int]:
+        return dict(self._server.by_route)
+
+    def token(self, sub: str, email: str = "bench@example.com", alg: str = "HS256", issuer: Optional[str] = None, ttl: int = 3600) -> str:
+        """A user access token. HS256 ones are signed with a throwaway secret (the
+        fake GoTrue doesn't check it); RS256 ones with `rsa_key`, so JWKS verifies them."""
+        claims = {"sub": sub, "email": email, "role": "authenticated", "exp": int(time.time()) + ttl}
+        if issuer:
+            claims["iss"] = issuer
+        if alg == "RS256":
+            return jwt.encode(claims, self.rsa_key, algorithm="RS256", headers={"kid": FAKE_KID})
+        return jwt.encode(claims, "bench-unchecked-secret", algorithm="HS256")
+
+    def __enter__(self) -> "FakeServices":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# earlier benches only needed the PostgREST part
+FakePostgrest = FakeServices
+
+
+def stripe_webhook(event_type: str, obj: Dict[str, Any], secret: str, event_id: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """(body, headers) for a signed Stripe webhook delivery."""
+    body = json.dumps({
+        "id": event_id or "evt_" + uuid.uuid4().hex,
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "data": {"object": obj},
+    }).encode()
+    ts = int(time.time())
+    sig = hmac.new(secret.encode(), f"{ts}.".encode() + body, hashlib.sha256).hexdigest()
+    return body, {"Stripe-Signature": f"t={ts},v1={sig}", "Content-Type": "application/json"}
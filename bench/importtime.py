@@ -0,0 +1,138 @@
+# bench/importtime.py
+"""
+Cold-start report: what importing the app costs, and how long until /health.
+
+Each run is a fresh interpreter. Import cost comes from `python -X importtime`
+(self time summed per top-level package, plus the slowest single modules);
+"first /health" is wall time from interpreter start to a 200 from /health
+with the lifespan started, which is what a scale-to-zero wake-up waits on.
+
+    python -m bench.importtime --module app.main --runs 5 --out importtime.json
+    python -m bench.importtime --module main --budget-ms 1500   # exit 1 if over
+
+Medians across runs are reported; keep the JSON to compare across commits.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# enough env for the modules to import; no network is touched
+_ENV = {
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_SERVICE_ROLE": "bench.service.key",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench.service.key",
+    "SUPABASE_DB_URL": "sqlite+aiosqlite:///:memory:",
+    "STRIPE_SECRET_KEY": "sk_test_bench",
+    "STRIPE_WEBHOOK_SECRET": "whsec_bench",
+    "WARM_ON_STARTUP": "0",
+}
+
+_HEALTH = """
+import time; t0 = time.perf_counter()
+import asyncio, importlib, httpx
+app = importlib.import_module({module!r}).app
+async def go():
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://x") as c:
+            r = await c.get("/health")
+            r.raise_for_status()
+asyncio.run(go())
+print((time.perf_counter() - t0) * 1000)
+"""
+
+
+def _env(tmp_outbox: str) -> Dict[str, str]:
+    env = {**_ENV, **os.environ, "STRIPE_OUTBOX_PATH": tmp_outbox, "PAYMENTS_OUTBOX_PATH": tmp_outbox}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    return env
+
+
+def _importtime(module: str, env: Dict[str, str]) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    by_module: Dict[str, int] = {}
+    by_package: Dict[str, int] = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m[1]), int(m[2]), m[3], m[4]
+        by_module[name] = self_us
+        pkg = name.split(".")[0]
+        by_package[pkg] = by_package.get(pkg, 0) + self_us
+        if len(indent) == 1:  # top-level imports sum to the whole
+            total += cumulative_us
+    return {"total_us": total, "packages": by_package, "modules": by_module}
+
+
+def _first_health(module: str, env: Dict[str, str]) -> float:
+    proc = subprocess.run([sys.executable, "-c", _HEALTH.format(module=module)], capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise SystemExit(f"/health on {module} failed:\n{proc.stderr[-2000:]}")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def report(module: str, runs: int, top: int) -> Dict[str, Any]:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(os.path.join(tmp, "outbox.sqlite3"))
+        samples = [_importtime(module, env) for _ in range(runs)]
+        health = [_first_health(module, env) for _ in range(runs)]
+
+    def median_of(key: str) -> Dict[str, float]:
+        names = set().union(*(s[key] for s in samples))
+        return {n: statistics.median(s[key].get(n, 0) for s in samples) / 1000 for n in names}
+
+    packages = median_of("packages")
+    modules = median_of("modules")
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": round(statistics.median(s["total_us"] for s in samples) / 1000, 1),
+        "first_health_ms": round(statistics.median(health), 1),
+        "packages_ms": {k: round(v, 1) for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:top]},
+        "slowest_modules_ms": {k: round(v, 1) for k, v in sorted(modules.items(), key=lambda kv: -kv[1])[:top]},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--module", default="app.main", help="app.main or main")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--budget-ms", type=float, default=None, help="fail if first /health is slower")
+    args = ap.parse_args()
+
+    r = report(args.module, args.runs, args.top)
+    print(f"{r['module']}: import {r['import_ms']} ms, first /health {r['first_health_ms']} ms (median of {r['runs']})")
+    print("self time by package:")
+    for name, ms in r["packages_ms"].items():
+        print(f"  {name:<28} {ms:>8.1f} ms")
+    print("slowest modules (self):")
+    for name, ms in r["slowest_modules_ms"].items():
+        print(f"  {name:<40} {ms:>8.1f} ms")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(r, f, indent=2)
+    if args.budget_ms is not None and r["first_health_ms"] > args.budget_ms:
+        sys.exit(f"first /health took {r['first_health_ms']} ms, budget {args.budget_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# bench/sqlite_db.py
+"""
+SQLite stand-in for the Supabase Postgres database.
+
+The app's SQL addresses tables as `public.<table>`; SQLite resolves that
+through an attached database named `public`, so every pooled connection
+attaches the same file under that name.
+"""
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+_UUID = (
+    "(lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-' || "
+    "lower(hex(randomblob(2))) || '-' || lower(hex(randomblob(2))) || '-' || "
+    "lower(hex(randomblob(6))))"
+)
+# timestamps are text in SQLite, so stored values and bound datetimes must
+# share one ISO layout (microsecond precision, 'T', explicit offset) to compare
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00')"
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(timespec="microseconds"))
+
+SCHEMA = f"""
+create table if not exists users (
+    id text primary key default {_UUID},
+    auth_user_id text unique not null,
+    email text,
+    created_at text not null default {_NOW}
+);
+create table if not exists clients (
+    id text primary key default {_UUID},
+    user_id text references users(id),
+    name text not null,
+    email text,
+    phone text,
+    address text,
+    created_at text not null default {_NOW}
+);
+create table if not exists jobs (
+    id text primary key default {_UUID},
+    user_id text references users(id),
+    client_id text not null references clients(id),
+    title text not null,
+    description text,
+    price_cents integer not null default 0,
+    status text not null default 'active_unscheduled',
+    checkout_session_id text,
+    created_at text not null default {_NOW}
+);
+create table if not exists job_rollups (
+    user_id text not null references users(id),
+    month text not null,
+    status text not null,
+    jobs integer not null default 0,
+    price_cents integer not null default 0,
+    primary key (user_id, month, status)
+);
+create table if not exists change_log (
+    seq integer primary key autoincrement,
+    user_id text not null,
+    entity text not null,
+    entity_id text not null,
+    op text not null,
+    changed_at text not null default {_NOW}
+);
+create index if not exists change_log_user_seq on change_log (user_id, seq);
+create index if not exists change_log_row_seq on change_log (user_id, entity, entity_id, seq);
+create index if not exists jobs_user_created on jobs (user_id, created_at desc, id desc);
+create index if not exists clients_user_created on clients (user_id, created_at desc);
+"""
+
+
+def create_schema(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+
+
+def url(path: str) -> str:
+    # the main database is a throwaway file (pooling needs a file, not
+    # :memory:); the real tables live in the attached `public`
+    return f"sqlite+aiosqlite:///{path}.main"
+
+
+def attach_public(engine, path: str, latency_ms: float = 0.0) -> None:
+    """Attach `path` as schema `public` on every new connection of an AsyncEngine.
+
+    `latency_ms` adds a per-statement delay inside the driver's own thread,
+    standing in for the network round trip to a hosted database without
+    blocking the event loop.
+    """
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _attach(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute(f"attach database '{path}' as public")
+        cur.execute("pragma public.journal_mode=wal")
+        cur.execute("pragma busy_timeout=5000")
+        cur.close()
+        if latency_ms:
+            delay = latency_ms / 1000.0
+            trace = lambda _stmt: time.sleep(delay)
+            dbapi_conn.run_async(lambda c: c._execute(c._conn.set_trace_callback, trace))
+
+
+def seed(path: str, auth_user_id: str, clients: int = 10, jobs: int = 200) -> str:
+    """Insert one user with `clients` clients and `jobs` jobs; returns the users.id."""
+    with sqlite3.connect(path) as conn:
+        conn.execute("insert or ignore into users (auth_user_id, email) values (?, ?)", (auth_user_id, "bench@example.com"))
+        (uid,) = conn.execute("select id from users where auth_user_id = ?", (auth_user_id,)).fetchone()
+        client_ids = []
+        for i in range(clients):
+            (cid,) = conn.execute(
+                "insert into clients (user_id, name, email) values (?, ?, ?) returning id",
+                (uid, f"Client {i}", f"client{i}@example.com"),
+            ).fetchone()
+            client_ids.append(cid)
+        conn.executemany(
+            "insert into jobs (user_id, client_id, title, description, price_cents) values (?, ?, ?, ?, ?)",
+            [
+                (uid, client_ids[i % len(client_ids)], f"Job {i}", "Replace faucet and check pipes", 1000 + i)
+                for i in range(jobs)
+            ],
+        )
+        return uid
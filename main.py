@@ -1,24 +1,63 @@
 # main.py
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
-from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, Literal, Union
 from uuid import UUID
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from supabase import create_client, Client
+from supabase import Client
+
+from supabase_pool import open_pool, close_pool, get_supabase
+import payments
+from app import http
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    decode_cursor, fetch_in, page_query, split_page, iter_rows, ndjson_lines,
+)
+from app.fastjson import RawJSONResponse, dump_normalized, dump_rows, dumps, projector
+from app.compression import CompressionMiddleware
+from app.timing import TimingMiddleware, metrics_response
+from app.wire import WireFormatMiddleware
 
 log = logging.getLogger("uvicorn.error")
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Lifespan: one shared Supabase pool per process, plus the webhook worker
+# ──────────────────────────────────────────────────────────────────────────────
+def _open_pool_quietly():
+    try:
+        open_pool()
+    except Exception as e:
+        # keep serving; /health/db and /diag report the problem
+        log.warning(f"Supabase pool not opened at startup: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # opened in the background so /health answers while clients are built;
+    # get_supabase() opens it itself if a request gets there first
+    opening = asyncio.create_task(run_in_threadpool(_open_pool_quietly))
+    await payments.start_worker()  # applies queued Stripe webhooks
+    yield
+    await payments.stop_worker()
+    await http.aclose()  # the Supabase Auth client auth.py verifies through
+    await opening  # a thread can't be cancelled; don't close under it
+    close_pool()
+
 app = FastAPI(
     title="Prello API",
     version="0.1.0",
     docs_url="/docs",
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -30,8 +69,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Server-Timing"],
 )
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Wire format + compression: msgpack / CBOR by Accept and Content-Type
+# (app/wire.py), then zstd / br / gzip by Accept-Encoding (app/compression.py)
+# ──────────────────────────────────────────────────────────────────────────────
+app.add_middleware(WireFormatMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Timing: Server-Timing header per response, Prometheus text at /metrics
+# ──────────────────────────────────────────────────────────────────────────────
+app.add_middleware(TimingMiddleware)
+app.add_route("/metrics", metrics_response, include_in_schema=False)
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Root + Health
 # ──────────────────────────────────────────────────────────────────────────────
@@ -39,6 +92,11 @@ app.add_middleware(
 def read_root():
     return {"ok": True, "service": "prello-api"}
 
+@app.get("/health", tags=["health"])
+async def health():
+    """Liveness only; touches nothing, so it answers as soon as the app is up."""
+    return {"ok": True}
+
 @app.get("/health/db", tags=["health"])
 def health_db():
     """Ping Supabase using service role (set SUPABASE_URL & SUPABASE_SERVICE_ROLE)."""
@@ -83,11 +141,8 @@ def diag():
 # Supabase helper
 # ──────────────────────────────────────────────────────────────────────────────
 def _get_supabase() -> Client:
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_SERVICE_ROLE")
-    if not url or not key:
-        raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE")
-    return create_client(url, key)
+    # shared, keep-alive client from the lifespan pool (see supabase_pool.py)
+    return get_supabase()
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Models (emails as plain strings)
@@ -100,7 +155,7 @@ class ApiClient(BaseModel):
     address: Optional[str] = None
     created_at: Optional[datetime] = None
 
-class ApiJob(BaseModel):
+class ApiJobRow(BaseModel):
     id: UUID
     client_id: UUID
     title: str
@@ -108,8 +163,15 @@ class ApiJob(BaseModel):
     price_cents: int
     status: str
     created_at: Optional[datetime] = None
+
+class ApiJob(ApiJobRow):
     client: Optional[ApiClient] = None
 
+class ApiJobsNormalized(BaseModel):
+    """GET /jobs/?shape=normalized: each client once, keyed by id."""
+    jobs: List[ApiJobRow]
+    clients: Dict[UUID, ApiClient]
+
 class JobCreate(BaseModel):
     client_name: str = Field(..., min_length=1)
     client_email: Optional[str] = None
@@ -143,21 +205,52 @@ def _row_to_job(row: Dict[str, Any]) -> ApiJob:
 # ──────────────────────────────────────────────────────────────────────────────
 # Jobs endpoints (Supabase v2 style: rely on exceptions, use .data)
 # ──────────────────────────────────────────────────────────────────────────────
-@app.get("/jobs/", tags=["jobs"], response_model=List[ApiJob])
-def list_jobs():
+JOB_COLUMNS = "id,client_id,title,description,price_cents,status,created_at"
+CLIENT_COLUMNS = "id,name,email,phone,address,created_at"
+JOB_SELECT = f"{JOB_COLUMNS},client:clients({CLIENT_COLUMNS})"
+# shape=normalized: jobs carry client_id only; each client is sent once
+NORMALIZED_KEYS = ("jobs", "clients")
+
+@app.get("/jobs/", tags=["jobs"], response_model=Union[List[ApiJob], ApiJobsNormalized])
+def list_jobs(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    stream: bool = Query(False, description="Stream all remaining jobs as NDJSON"),
+    shape: Literal["embedded", "normalized"] = Query(
+        "embedded", description='"normalized": {"jobs": [...], "clients": {id: client}} instead of a client per job'),
+):
+    """Newest first, one page at a time (keyset on created_at, id)."""
+    if cursor:
+        decode_cursor(cursor)  # 400 before touching the DB
+    if stream and shape == "normalized":
+        raise HTTPException(status_code=400, detail="shape=normalized can't be streamed")
     try:
         client = _get_supabase()
-        resp = (
-            client.table("jobs")
-            .select(
-                "id,client_id,title,description,price_cents,status,created_at,"
-                "client:clients(id,name,email,phone,address,created_at)"
+        if shape == "normalized":
+            # one query per table instead of a client copy in every job row
+            resp = page_query(client.table("jobs").select(JOB_COLUMNS), cursor, limit).execute()
+            rows, next_cursor = split_page(getattr(resp, "data", []) or [], limit)
+            ids = list(dict.fromkeys(r["client_id"] for r in rows if r.get("client_id")))
+            clients = fetch_in(lambda: client.table("clients").select(CLIENT_COLUMNS), "id", ids)
+            return RawJSONResponse(
+                dump_normalized(rows, ApiJob, "client", clients, NORMALIZED_KEYS),
+                headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
+            )
+        build = lambda: client.table("jobs").select(JOB_SELECT)
+        project = projector(ApiJob)
+        if stream:
+            # rows are written as each page arrives; memory stays at one page
+            return StreamingResponse(
+                ndjson_lines(iter_rows(build, cursor, limit), lambda r: dumps(project(r))),
+                media_type="application/x-ndjson",
             )
-            .order("created_at", desc=True)
-            .execute()
+        resp = page_query(build(), cursor, limit).execute()
+        rows, next_cursor = split_page(getattr(resp, "data", []) or [], limit)
+        # trusted DB rows go straight to JSON bytes (no per-row ApiJob, no re-validation)
+        return RawJSONResponse(
+            dump_rows(rows, ApiJob),
+            headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
         )
-        rows = getattr(resp, "data", []) or []
-        return [_row_to_job(r) for r in rows]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/jobs/ GET failed: {e}")
 
@@ -166,48 +259,19 @@ def create_job(payload: JobCreate):
     try:
         client = _get_supabase()
 
-        # Find client by name
-        existing_resp = (
-            client.table("clients")
-            .select("id,name,email,phone,address,created_at")
-            .eq("name", payload.client_name)
-            .limit(1)
-            .execute()
-        )
-        existing_rows = getattr(existing_resp, "data", []) or []
-        if existing_rows:
-            client_row = existing_rows[0]
-        else:
-            ins_client_resp = (
-                client.table("clients")
-                .insert({"name": payload.client_name, "email": payload.client_email})
-                .select("id,name,email,phone,address,created_at")
-                .single()
-                .execute()
-            )
-            client_row = getattr(ins_client_resp, "data", None)
-            if not isinstance(client_row, dict):
-                raise RuntimeError("clients insert returned no data")
-
-        # Insert job
-        ins_job_resp = (
-            client.table("jobs")
-            .insert({
-                "client_id": client_row["id"],
-                "title": payload.title,
-                "description": payload.description,
-                "price_cents": payload.price_cents,
-                "status": "active_unscheduled",
-            })
-            .select("id,client_id,title,description,price_cents,status,created_at")
-            .single()
-            .execute()
-        )
-        job_row = getattr(ins_job_resp, "data", None)
+        # Find-or-create the client and insert the job in one round trip
+        # (sql/create_job_with_client.sql); safe under concurrent creates.
+        resp = client.rpc("create_job_with_client", {
+            "p_client_name": payload.client_name,
+            "p_client_email": payload.client_email,
+            "p_title": payload.title,
+            "p_description": payload.description,
+            "p_price_cents": payload.price_cents,
+        }).execute()
+        job_row = getattr(resp, "data", None)
         if not isinstance(job_row, dict):
-            raise RuntimeError("jobs insert returned no data")
+            raise RuntimeError("create_job_with_client returned no data")
 
-        job_row["client"] = client_row
         return _row_to_job(job_row)
 
     except Exception as e:
@@ -1,20 +1,78 @@
 # payments.py
 import os
+import json
 import logging
 from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import stripe
 
-from auth import get_current_user  # verifies Supabase JWT via /auth/v1/user
+from auth import get_current_user, token_cache_stats  # verifies Supabase JWT (cached)
+from app.checkout import CheckoutSessions
+from app.outbox import Outbox, OutboxWorker
+from supabase_pool import get_supabase
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 # Stripe config from env
 stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
 WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+OUTBOX_PATH = os.environ.get("PAYMENTS_OUTBOX_PATH", "payments_outbox.sqlite3")
 
 logger = logging.getLogger("uvicorn")
 
+# ---- Durable webhook queue ---------------------------------------------------
+# Verified events are written to a local SQLite outbox (deduped by event id)
+# and acked; a background worker applies them in batches with retry/backoff.
+HANDLED_EVENTS = {"checkout.session.completed", "payment_intent.succeeded"}
+_worker: OutboxWorker | None = None
+_sessions = CheckoutSessions()  # open Checkout Sessions, reused across taps
+
+async def _apply_events(events):
+    job_ids = [
+        e["payload"].get("metadata", {}).get("job_id")
+        for e in events
+        if e["type"] == "checkout.session.completed"
+    ]
+    job_ids = [j for j in job_ids if j]
+    for e in events:
+        if e["type"] == "checkout.session.completed":
+            _sessions.forget_session(e["payload"].get("id"))
+    for e in events:
+        if e["type"] == "payment_intent.succeeded":
+            # the job id lives on the Checkout Session; nothing to apply here
+            logger.info(f"payment_intent.succeeded for intent {e['payload'].get('id')}")
+    if not job_ids:
+        return
+
+    def mark_paid():
+        (
+            get_supabase().table("jobs")
+            .update({"status": "completed_paid"})
+            .in_("id", job_ids)
+            .execute()
+        )
+
+    await run_in_threadpool(mark_paid)
+    logger.info(f"marked {len(job_ids)} job(s) completed_paid")
+
+def get_worker() -> OutboxWorker:
+    global _worker
+    if _worker is None:
+        _worker = OutboxWorker(Outbox(OUTBOX_PATH), _apply_events)
+    return _worker
+
+# started and stopped by the app lifespan (main.lifespan)
+async def start_worker():
+    get_worker().start()
+
+async def stop_worker():
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker.outbox.close()
+        _worker = None
+
 # ---- Health / sanity check ---------------------------------------------------
 @router.get("/ping")
 async def ping():
@@ -22,6 +80,9 @@ async def ping():
         "ok": True,
         "has_secret_key": bool(stripe.api_key),
         "has_webhook_secret": bool(WEBHOOK_SECRET),
+        "auth_cache": token_cache_stats(),
+        "webhook_queue": _worker.stats() if _worker else None,
+        "checkout_sessions": _sessions.stats(),
     }
 
 # ---- Webhook (no auth) -------------------------------------------------------
@@ -50,20 +111,22 @@ async def stripe_webhook(request: Request):
         )
         raise HTTPException(status_code=400, detail="signature verification failed")
 
-    # Minimal handlers to prove flow
     etype = event.get("type")
     logger.info(f"Stripe webhook received: {etype}")
-
-    if etype == "checkout.session.completed":
-        sess = event["data"]["object"]
-        logger.info(f"✅ checkout.session.completed for session {sess.get('id')}")
-        # TODO: write to Supabase (payments table), update job status, etc.
-    elif etype == "payment_intent.succeeded":
-        intent = event["data"]["object"]
-        logger.info(f"✅ payment_intent.succeeded for intent {intent.get('id')}")
-        # TODO: same as above if you prefer to key off PI events
-
-    return {"ok": True}
+    if etype not in HANDLED_EVENTS:
+        return {"ok": True}
+
+    # ack once the event is on disk; the worker does the Supabase writes.
+    # The object is stored as Stripe sent it (StripeObject.to_dict is deprecated).
+    worker = get_worker()
+    fresh = await run_in_threadpool(
+        worker.outbox.put, event["id"], etype, json.loads(payload)["data"]["object"]
+    )
+    if fresh:
+        worker.wake()
+    else:
+        logger.info(f"duplicate Stripe event {event['id']} ignored")
+    return {"ok": True, "duplicate": not fresh}
 
 # ---- Create Checkout Session (auth required) --------------------------------
 class CheckoutPayload(BaseModel):
@@ -84,8 +147,25 @@ async def create_checkout_session(
 
     contractor_id = user.get("id")  # Supabase user id
 
-    try:
-        session = stripe.checkout.Session.create(
+    def load_job():
+        resp = (
+            get_supabase().table("jobs")
+            .select("status,checkout_session_id")
+            .eq("id", body.job_id)
+            .limit(1)
+            .execute()
+        )
+        return (resp.data or [None])[0]
+
+    job = await run_in_threadpool(load_job)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.get("status") == "completed_paid":
+        raise HTTPException(status_code=409, detail="Job is already paid")
+    known = job.get("checkout_session_id")
+
+    def create(idempotency_key):
+        return stripe.checkout.Session.create(
             mode="payment",
             payment_method_types=["card"],
             customer_email=body.customer_email,
@@ -102,12 +182,40 @@ async def create_checkout_session(
             metadata={
                 "job_id": body.job_id,
                 "contractor_id": contractor_id
-            }
+            },
+            idempotency_key=idempotency_key,
         )
+
+    def retrieve(session_id):
+        sess = stripe.checkout.Session.retrieve(session_id)
+        # the job's last session may have been made for another amount
+        if sess.get("amount_total") not in (None, body.amount_cents) or sess.get("currency") not in (None, body.currency):
+            return None
+        return sess
+
+    # same job + amount (+ everything else Stripe would show) -> same open session
+    key = (
+        contractor_id, body.job_id, body.amount_cents, body.currency,
+        body.customer_email, body.success_url, body.cancel_url,
+    )
+    try:
+        # the job's stored session is checked with Stripe before reuse, so a
+        # restart or another worker can't hand out a session that was paid
+        session = await _sessions.get_or_create(key, create, retrieve=retrieve, known_session_id=known)
     except Exception as e:
         logger.error(f"Stripe Checkout create failed: {e}")
         raise HTTPException(status_code=400, detail="Failed to create checkout session")
 
-    logger.info(f"Created checkout session {session.get('id')} for job {body.job_id} by user {contractor_id}")
-    return {"checkout_url": session.get("url"), "session_id": session.get("id")}
+    if session["id"] != known:
+        def save():
+            (
+                get_supabase().table("jobs")
+                .update({"checkout_session_id": session["id"]})
+                .eq("id", body.job_id)
+                .execute()
+            )
+
+        await run_in_threadpool(save)
 
+    logger.info(f"Checkout session {session['id']} for job {body.job_id} by user {contractor_id}")
+    return {"checkout_url": session["url"], "session_id": session["id"]}
@@ -1,22 +1,23 @@
 # routers/jobs.py
 from __future__ import annotations
 
-import os
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Union
 from uuid import UUID
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, EmailStr
-from supabase import create_client, Client
+from supabase import Client
 
 # ---- Supabase service client (use service_role on the server) ----
-def get_supabase() -> Client:
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_SERVICE_ROLE")
-    if not url or not key:
-        raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE")
-    return create_client(url, key)
+# Pooled per process; opened/closed by the app lifespan in main.py.
+from supabase_pool import get_supabase
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    decode_cursor, fetch_in, page_query, split_page, iter_rows, ndjson_lines,
+)
+from app.fastjson import RawJSONResponse, dump_normalized, dump_rows, dumps, projector
 
 # IMPORTANT: prefix '/jobs' → paths will be '/jobs/' etc.
 router = APIRouter(prefix="/jobs", tags=["jobs"])
@@ -30,7 +31,7 @@ class ApiClient(BaseModel):
     address: Optional[str] = None
     created_at: Optional[datetime] = None
 
-class ApiJob(BaseModel):
+class ApiJobRow(BaseModel):
     id: UUID
     client_id: UUID
     title: str
@@ -38,8 +39,15 @@ class ApiJob(BaseModel):
     price_cents: int
     status: str
     created_at: Optional[datetime] = None
+
+class ApiJob(ApiJobRow):
     client: Optional[ApiClient] = None
 
+class ApiJobsNormalized(BaseModel):
+    """GET /jobs/?shape=normalized: each client once, keyed by id."""
+    jobs: List[ApiJobRow]
+    clients: Dict[UUID, ApiClient]
+
 class JobCreate(BaseModel):
     client_name: str = Field(..., min_length=1)
     client_email: Optional[EmailStr] = None
@@ -70,63 +78,68 @@ def _row_to_job(row: Dict[str, Any]) -> ApiJob:
         client=client,
     )
 
-# GET /jobs/
-@router.get("/", response_model=List[ApiJob])
-def list_jobs(supabase: Client = Depends(get_supabase)):
-    resp = (
-        supabase.table("jobs")
-        .select("id,client_id,title,description,price_cents,status,created_at,client:clients(id,name,email,phone,address,created_at)")
-        .order("created_at", desc=True)
-        .execute()
-    )
-    if resp.error:
-        raise HTTPException(status_code=500, detail=resp.error.message)
-    rows = resp.data or []
-    return [_row_to_job(r) for r in rows]
+JOB_COLUMNS = "id,client_id,title,description,price_cents,status,created_at"
+CLIENT_COLUMNS = "id,name,email,phone,address,created_at"
+JOB_SELECT = f"{JOB_COLUMNS},client:clients({CLIENT_COLUMNS})"
+# shape=normalized: jobs carry client_id only; each client is sent once
+NORMALIZED_KEYS = ("jobs", "clients")
 
-# POST /jobs/
-@router.post("/", response_model=ApiJob)
-def create_job(payload: JobCreate, supabase: Client = Depends(get_supabase)):
-    existing = (
-        supabase.table("clients")
-        .select("id,name,email,phone,address,created_at")
-        .eq("name", payload.client_name)
-        .limit(1)
-        .execute()
-    )
-    if existing.error:
-        raise HTTPException(status_code=500, detail=existing.error.message)
-
-    if existing.data:
-        client_row = existing.data[0]
-    else:
-        inserted = (
-            supabase.table("clients")
-            .insert({"name": payload.client_name, "email": payload.client_email})
-            .select("id,name,email,phone,address,created_at")
-            .single()
-            .execute()
+# GET /jobs/  (newest first, keyset-paginated; next page via X-Next-Cursor)
+@router.get("/", response_model=Union[List[ApiJob], ApiJobsNormalized])
+def list_jobs(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = Query(False, description="Stream all remaining jobs as NDJSON"),
+    shape: Literal["embedded", "normalized"] = Query(
+        "embedded", description='"normalized": {"jobs": [...], "clients": {id: client}} instead of a client per job'),
+    supabase: Client = Depends(get_supabase),
+):
+    if cursor:
+        decode_cursor(cursor)
+    if stream and shape == "normalized":
+        raise HTTPException(status_code=400, detail="shape=normalized can't be streamed")
+    if shape == "normalized":
+        # one query per table instead of a client copy in every job row
+        resp = page_query(supabase.table("jobs").select(JOB_COLUMNS), cursor, limit).execute()
+        if getattr(resp, "error", None):
+            raise HTTPException(status_code=500, detail=resp.error.message)
+        rows, next_cursor = split_page(resp.data or [], limit)
+        ids = list(dict.fromkeys(r["client_id"] for r in rows if r.get("client_id")))
+        clients = fetch_in(lambda: supabase.table("clients").select(CLIENT_COLUMNS), "id", ids)
+        return RawJSONResponse(
+            dump_normalized(rows, ApiJob, "client", clients, NORMALIZED_KEYS),
+            headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
         )
-        if inserted.error:
-            raise HTTPException(status_code=500, detail=inserted.error.message)
-        client_row = inserted.data
-
-    ins_job = (
-        supabase.table("jobs")
-        .insert({
-            "client_id": client_row["id"],
-            "title": payload.title,
-            "description": payload.description,
-            "price_cents": payload.price_cents,
-            "status": "active_unscheduled",
-        })
-        .select("id,client_id,title,description,price_cents,status,created_at")
-        .single()
-        .execute()
+    build = lambda: supabase.table("jobs").select(JOB_SELECT)
+    project = projector(ApiJob)
+    if stream:
+        return StreamingResponse(
+            ndjson_lines(iter_rows(build, cursor, limit), lambda r: dumps(project(r))),
+            media_type="application/x-ndjson",
+        )
+    resp = page_query(build(), cursor, limit).execute()
+    if getattr(resp, "error", None):
+        raise HTTPException(status_code=500, detail=resp.error.message)
+    rows, next_cursor = split_page(resp.data or [], limit)
+    # rows come from our own DB: skip ApiJob/EmailStr re-validation and encode directly
+    return RawJSONResponse(
+        dump_rows(rows, ApiJob),
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
     )
-    if ins_job.error:
-        raise HTTPException(status_code=500, detail=ins_job.error.message)
 
-    job_row = ins_job.data
-    job_row["client"] = client_row
-    return _row_to_job(job_row)
+# POST /jobs/  (client find-or-create + job insert in one RPC round trip;
+# see sql/create_job_with_client.sql)
+@router.post("/", response_model=ApiJob)
+def create_job(payload: JobCreate, supabase: Client = Depends(get_supabase)):
+    created = supabase.rpc("create_job_with_client", {
+        "p_client_name": payload.client_name,
+        "p_client_email": payload.client_email,
+        "p_title": payload.title,
+        "p_description": payload.description,
+        "p_price_cents": payload.price_cents,
+    }).execute()
+    if getattr(created, "error", None):
+        raise HTTPException(status_code=500, detail=created.error.message)
+    if not isinstance(created.data, dict):
+        raise HTTPException(status_code=500, detail="create_job_with_client returned no data")
+    return _row_to_job(created.data)
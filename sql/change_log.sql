@@ -0,0 +1,40 @@
+-- sql/change_log.sql
+--
+-- Per-user change log read by GET /sync (app/sync.py). The app/ write paths
+-- append one row per job or client they create or update, in the same
+-- transaction as the write (repo.log_changes). op = 'delete' is a tombstone,
+-- reported to clients as deleted; no route deletes rows yet.
+--
+-- `seq` is the sync cursor. Writers take a per-user advisory lock before
+-- appending, so a user's seqs are handed out in commit order and a reader
+-- that has seen seq N can never later find an uncommitted N-1 show up.
+--
+-- Existing rows are logged once below, so a first sync (no cursor) returns
+-- everything. `python -m app.sync --compact` drops entries superseded by a
+-- later one for the same row; change_log_row_seq serves both the compaction
+-- and the backfill's "already logged?" probe.
+--
+-- Apply with: psql "$SUPABASE_DB_URL" -f sql/change_log.sql
+
+create table if not exists public.change_log (
+    seq        bigserial   primary key,
+    user_id    uuid        not null,
+    entity     text        not null check (entity in ('job', 'client')),
+    entity_id  uuid        not null,
+    op         text        not null check (op in ('upsert', 'delete')),
+    changed_at timestamptz not null default now()
+);
+create index if not exists change_log_user_seq on public.change_log (user_id, seq);
+create index if not exists change_log_row_seq on public.change_log (user_id, entity, entity_id, seq);
+
+insert into public.change_log (user_id, entity, entity_id, op)
+select user_id, 'client', id, 'upsert' from public.clients
+where user_id is not null
+  and not exists (select 1 from public.change_log l where l.user_id = clients.user_id and l.entity = 'client' and l.entity_id = clients.id)
+order by created_at;
+
+insert into public.change_log (user_id, entity, entity_id, op)
+select user_id, 'job', id, 'upsert' from public.jobs
+where user_id is not null
+  and not exists (select 1 from public.change_log l where l.user_id = jobs.user_id and l.entity = 'job' and l.entity_id = jobs.id)
+order by created_at;
@@ -0,0 +1,63 @@
+-- sql/create_job_with_client.sql
+--
+-- Find-or-create a client by name and insert a job for it in one round trip.
+-- Called by POST /jobs/ (main.create_job, routers/jobs.create_job) through
+-- PostgREST RPC: supabase.rpc("create_job_with_client", {...}).
+--
+-- Concurrent creates for the same new client name are serialized with a
+-- transaction-scoped advisory lock, so only the first one inserts the client.
+--
+-- Apply with: psql "$SUPABASE_DB_URL" -f sql/create_job_with_client.sql
+
+create or replace function public.create_job_with_client(
+    p_client_name  text,
+    p_client_email text,
+    p_title        text,
+    p_description  text,
+    p_price_cents  integer
+) returns json
+language plpgsql
+as $$
+declare
+    c public.clients%rowtype;
+    j public.jobs%rowtype;
+begin
+    perform pg_advisory_xact_lock(hashtext('clients.name:' || p_client_name));
+
+    select * into c
+    from public.clients
+    where name = p_client_name
+    order by created_at
+    limit 1;
+
+    if not found then
+        insert into public.clients (name, email)
+        values (p_client_name, p_client_email)
+        returning * into c;
+    end if;
+
+    insert into public.jobs (client_id, title, description, price_cents, status)
+    values (c.id, p_title, p_description, p_price_cents, 'active_unscheduled')
+    returning * into j;
+
+    return json_build_object(
+        'id',          j.id,
+        'client_id',   j.client_id,
+        'title',       j.title,
+        'description', j.description,
+        'price_cents', j.price_cents,
+        'status',      j.status,
+        'created_at',  j.created_at,
+        'client', json_build_object(
+            'id',         c.id,
+            'name',       c.name,
+            'email',      c.email,
+            'phone',      c.phone,
+            'address',    c.address,
+            'created_at', c.created_at
+        )
+    );
+end;
+$$;
+
+grant execute on function public.create_job_with_client(text, text, text, text, integer) to service_role;
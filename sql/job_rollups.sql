@@ -0,0 +1,21 @@
+-- sql/job_rollups.sql
+--
+-- Per-user job counts and price_cents sums by (month created, status), read
+-- by GET /stats (app/stats.py). Rows are adjusted in the same transaction as
+-- the write that changes them: job creates (app/jobs.py) and the
+-- completed_paid transition (app/stripe_webhook.py). Totals by status or by
+-- month are sums over these few cells.
+--
+-- After applying, backfill existing jobs with:
+--     python -m app.stats --rebuild
+--
+-- Apply with: psql "$SUPABASE_DB_URL" -f sql/job_rollups.sql
+
+create table if not exists public.job_rollups (
+    user_id     uuid    not null references public.users(id) on delete cascade,
+    month       text    not null,  -- 'YYYY-MM' of jobs.created_at, UTC
+    status      text    not null,
+    jobs        bigint  not null default 0,
+    price_cents bigint  not null default 0,
+    primary key (user_id, month, status)
+);
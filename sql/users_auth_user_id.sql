@@ -0,0 +1,10 @@
+-- sql/users_auth_user_id.sql
+--
+-- repo.insert_user uses `on conflict (auth_user_id) do nothing`, so two
+-- workers seeing a new user at once don't race into a unique violation.
+-- The conflict target needs a unique index on the column; this is a no-op
+-- in spirit if the table already has a unique constraint on it.
+--
+-- Apply with: psql "$SUPABASE_DB_URL" -f sql/users_auth_user_id.sql
+
+create unique index if not exists users_auth_user_id_key on public.users (auth_user_id);
@@ -0,0 +1,84 @@
+# supabase_pool.py
+"""
+Process-wide Supabase clients.
+
+`create_client()` builds new PostgREST/GoTrue HTTP clients (fresh connections,
+TLS handshake, header setup) every time it is called, so we open a small pool
+once in the FastAPI lifespan and hand the same clients out round-robin. Each
+client keeps its httpx connections alive between requests.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+from typing import Iterator, List, Optional
+
+from supabase import create_client, Client
+
+from app.timing import instrument_httpx
+
+log = logging.getLogger("uvicorn.error")
+
+_lock = threading.Lock()
+_clients: List[Client] = []
+_cycle: Optional[Iterator[Client]] = None
+
+
+def _credentials() -> tuple[str, str]:
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE")
+    if not url or not key:
+        raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE")
+    return url, key
+
+
+def open_pool(size: Optional[int] = None) -> None:
+    """Create the shared clients (no-op if already open)."""
+    global _cycle
+    with _lock:
+        if _clients:
+            return
+        url, key = _credentials()
+        n = max(1, size or int(os.environ.get("SUPABASE_POOL_SIZE", "1")))
+        for _ in range(n):
+            client = create_client(url, key)
+            # build the PostgREST session up front, timed for Server-Timing/metrics
+            instrument_httpx(client.postgrest.session, "supabase")
+            _clients.append(client)
+        _cycle = itertools.cycle(list(_clients))
+        log.info("supabase pool opened (%d client%s)", n, "" if n == 1 else "s")
+
+
+def close_pool() -> None:
+    """Close every pooled client's HTTP connections."""
+    global _cycle
+    with _lock:
+        for client in _clients:
+            _close_client(client)
+        _clients.clear()
+        _cycle = None
+
+
+def get_supabase() -> Client:
+    """Return a pooled client; opens the pool lazily if the lifespan didn't."""
+    if not _clients:
+        open_pool()
+    with _lock:
+        if _cycle is None:
+            raise RuntimeError("Supabase pool is closed")
+        return next(_cycle)
+
+
+def _close_client(client: Client) -> None:
+    for closer in (
+        getattr(client._postgrest, "aclose", None),  # sync client: closes httpx session
+        getattr(client.auth, "close", None),
+    ):
+        if closer is None:
+            continue
+        try:
+            closer()
+        except Exception as e:
+            log.warning("supabase client close failed: %s", e)
@@ -0,0 +1,21 @@
+# tests/conftest.py
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import db
+from bench import sqlite_db
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """app.db pointed at a fresh SQLite stand-in for public.* (bench/sqlite_db.py)."""
+    path = str(tmp_path / "public.db")
+    sqlite_db.create_schema(path)
+    # NullPool: each test's asyncio.run() gets its own connections
+    engine = create_async_engine(sqlite_db.url(path), poolclass=NullPool)
+    sqlite_db.attach_public(engine, path)
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(db, "_SessionLocal", db._make_sessions(engine))
+    monkeypatch.setattr(db, "_replicas", None)
+    return path
@@ -0,0 +1,122 @@
+# tests/test_batch.py
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app import batch, deps
+from app.batch import router as batch_router
+from app.deps import get_user
+
+AUTH = {"Authorization": "Bearer t"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """/batch over a few stand-in routes; `events` records what ran, in order."""
+    auths = []
+
+    async def auth_user(token):
+        auths.append(token)
+        return {"id": "auth-1", "email": None}
+
+    async def users_row(auth_user_id, email):
+        return {"id": "u1", "auth_user_id": auth_user_id}
+
+    monkeypatch.setattr(deps, "_auth_user", auth_user)
+    monkeypatch.setattr(deps, "_users_row", users_row)
+
+    app = FastAPI()
+    app.include_router(batch_router)
+    events, jobs = [], []
+
+    @app.get("/jobs")
+    async def list_jobs(response: Response, user = Depends(get_user)):
+        response.headers["ETag"] = '"v1"'
+        response.headers["X-Next-Cursor"] = "c1"
+        response.headers["X-Internal"] = "dropped"
+        return {"user": user["id"], "jobs": list(jobs)}
+
+    @app.post("/jobs", status_code=201)
+    async def create_job(body: dict, user = Depends(get_user)):
+        events.append("write")
+        jobs.append(body["title"])
+        return {"title": body["title"]}
+
+    @app.get("/slow/{name}")
+    async def slow(name: str, user = Depends(get_user)):
+        events.append(f"start {name}")
+        await asyncio.sleep(0.05)
+        events.append(f"end {name}")
+        return {"name": name, "jobs": list(jobs)}
+
+    @app.get("/text")
+    async def text(user = Depends(get_user)):
+        return PlainTextResponse("hi")
+
+    @app.get("/boom")
+    async def boom(user = Depends(get_user)):
+        raise RuntimeError("boom")
+
+    @app.get("/hang")
+    async def hang(user = Depends(get_user)):
+        await asyncio.sleep(5)
+
+    test_client = TestClient(app, raise_server_exceptions=False)
+    test_client.auths, test_client.events = auths, events
+    return test_client
+
+
+def _batch(client, *requests, headers=AUTH):
+    return client.post("/batch", json={"requests": list(requests)}, headers=headers)
+
+
+def test_one_auth_for_the_whole_batch(client):
+    r = _batch(client, {"id": "a", "path": "/jobs?limit=5"}, {"id": "b", "path": "/text"})
+    assert r.status_code == 200
+    a, b = r.json()["responses"]
+    assert a == {
+        "id": "a", "status": 200,
+        "headers": {"content-type": "application/json", "etag": '"v1"', "x-next-cursor": "c1"},
+        "body": {"user": "u1", "jobs": []},
+    }
+    assert (b["id"], b["body"]) == ("b", "hi")  # non-JSON bodies come back as strings
+    assert client.auths == ["t"]
+
+
+def test_reads_run_together_and_writes_keep_their_place(client):
+    r = _batch(
+        client,
+        {"path": "/slow/a"}, {"path": "/slow/b"},
+        {"method": "POST", "path": "/jobs", "body": {"title": "new"}},
+        {"path": "/slow/c"},
+    )
+    first, second, written, after = r.json()["responses"]
+    assert set(client.events[:2]) == {"start a", "start b"}  # concurrent
+    assert client.events[4:] == ["write", "start c", "end c"]
+    assert (first["body"]["jobs"], second["body"]["jobs"]) == ([], [])
+    assert (written["status"], written["body"]) == (201, {"title": "new"})
+    assert after["body"]["jobs"] == ["new"]
+
+
+def test_a_failing_item_does_not_stop_the_others(client):
+    r = _batch(client, {"path": "/boom"}, {"path": "/nope"}, {"path": "/batch"}, {"path": "/events?x=1"},
+               {"path": "/jobs"})
+    assert r.status_code == 200
+    assert [s["status"] for s in r.json()["responses"]] == [500, 404, 400, 400, 200]
+    assert r.json()["responses"][2]["body"] == {"detail": "/batch can't be batched"}
+
+
+def test_slow_item_times_out(client, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_TIMEOUT_S", 0.05)
+    r = _batch(client, {"path": "/hang"}, {"path": "/jobs"})
+    assert [s["status"] for s in r.json()["responses"]] == [504, 200]
+
+
+def test_the_batch_itself_is_checked(client):
+    assert _batch(client, {"path": "/jobs"}, headers={"Authorization": "Basic x"}).status_code == 401
+    assert _batch(client, *[{"path": "/jobs"}] * (batch.BATCH_MAX_REQUESTS + 1)).status_code == 422
+    assert _batch(client, {"path": "jobs"}).status_code == 422
+    assert client.post("/batch", json={"requests": []}, headers=AUTH).status_code == 422
@@ -0,0 +1,100 @@
+# tests/test_bulk.py
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import bulk
+from app.bulk import records
+from app.deps import get_user
+from app.jobs import router as jobs_router
+from bench import sqlite_db
+
+
+def _request(chunks, ctype):
+    messages = [{"type": "http.request", "body": c, "more_body": True} for c in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request({"type": "http", "method": "POST", "headers": [(b"content-type", ctype.encode())]}, receive)
+
+
+def _records(chunks, ctype="application/x-ndjson"):
+    async def collect():
+        return [(line, str(r) if isinstance(r, Exception) else r) async for line, r in records(_request(chunks, ctype))]
+
+    return asyncio.run(collect())
+
+
+def test_ndjson_lines_across_chunks():
+    assert _records([b'\xef\xbb\xbf{"a": 1}\n{"a"', b': 2}\r\n\n{"a": 3}']) == [
+        (1, {"a": 1}), (2, {"a": 2}), (4, {"a": 3}),
+    ]
+
+
+def test_ndjson_bad_lines_are_row_errors():
+    out = _records([b'{"a": 1}\nnot json\n\xff\xfe\n{"a": 4}\n'])
+    assert out[0] == (1, {"a": 1})
+    assert out[1][0] == 2 and out[1][1].startswith("invalid JSON")
+    assert out[2] == (3, "invalid UTF-8 at byte 0")
+    assert out[3] == (4, {"a": 4})
+
+
+def test_overlong_line_is_dropped_not_buffered(monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_LINE_BYTES", 16)
+    chunks = [b'{"a": 1}\n{"big": "'] + [b"x" * 10] * 50 + [b'"}\n{"a": 3}\n']
+    assert _records(chunks) == [(1, {"a": 1}), (2, "line longer than 16 bytes"), (3, {"a": 3})]
+    assert _records([b"x" * 40]) == [(1, "line longer than 16 bytes")]  # no final newline
+
+
+def test_csv_quoted_fields_may_span_lines():
+    body = b'name,notes\nAda,"one\n""two""\nthree"\nBob,\n'
+    assert _records([body], "text/csv") == [
+        (2, {"name": "Ada", "notes": 'one\n"two"\nthree'}), (5, {"name": "Bob", "notes": None}),
+    ]
+
+
+def test_csv_errors(monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_LINE_BYTES", 32)
+    body = b'name,notes\nAda\n"unclosed,' + b"\nmore text" * 10 + b'\nBob,ok\n'
+    out = _records([body], "text/csv")
+    assert out[0] == (2, "expected 2 columns, got 1")
+    assert out[1] == (3, "quoted record longer than 32 bytes")
+    assert out[-1] == (14, {"name": "Bob", "notes": "ok"})
+    assert _records([b'name\n"open\n'], "text/csv") == [(2, "unterminated quoted field")]
+
+
+def test_unknown_content_type_is_415():
+    with pytest.raises(Exception) as exc:
+        records(_request([], "application/json"))
+    assert exc.value.status_code == 415
+
+
+def test_bulk_jobs_import(db_path):
+    uid = sqlite_db.seed(db_path, "auth-1", clients=1, jobs=0)
+    app = FastAPI()
+    app.include_router(jobs_router)
+    app.dependency_overrides[get_user] = lambda: {"id": uid}
+    body = b"\n".join([
+        b'{"client_name": "New Co", "title": "a", "price_cents": 100}',
+        b'{"client_name": "New Co", "title": "b", "price_cents": 200}',
+        b'{"client_name": "Client 0", "title": "c", "price_cents": 300}',
+        b'{"title": "no client", "price_cents": 1}',
+        b'{"client_id": "00000000-0000-0000-0000-000000000000", "title": "d", "price_cents": 1}',
+        b'{"title": "e", "price_cents": -5}',
+    ])
+    r = TestClient(app).post("/jobs/bulk?batch_size=2", content=body,
+                             headers={"Content-Type": "application/x-ndjson"})
+    report = r.json()
+    assert r.status_code == 200
+    assert (report["received"], report["inserted"], report["error_count"]) == (6, 3, 3)
+    assert sorted(e["line"] for e in report["errors"]) == [4, 5, 6]
+    assert [b["rows"] for b in report["batches"]] == [2, 2, 1]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("select count(*) from clients where name = 'New Co'").fetchone() == (1,)
+        assert conn.execute("select count(*) from jobs").fetchone() == (3,)
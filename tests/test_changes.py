@@ -0,0 +1,123 @@
+# tests/test_changes.py
+import asyncio
+import sqlite3
+import uuid
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import db, repo
+from app.changes import ChangeFeed, _matches, changes, list_etag, not_modified, publish, set_etag
+from app.fastjson import RawJSONResponse, dumps
+from app.listcache import list_cache
+from app.wire import WireFormatMiddleware
+
+
+def _client():
+    """A list route wired like app/jobs.py; `loads` counts real queries. Needs `db_path`."""
+    app = FastAPI()
+    app.add_middleware(WireFormatMiddleware)
+    loads = []
+
+    @app.get("/jobs")
+    async def jobs(request: Request, uid: str):
+        async with db.read_scope() as session:
+            version = await repo.data_version(session, uid)
+        tag = list_etag(request, uid, version)
+        if (hit := not_modified(request, tag)) is not None:
+            return hit
+
+        async def load():
+            loads.append(uid)
+            return dumps([{"load": len(loads)}]), None
+
+        body, _ = await list_cache.get_or_load("jobs", uid, request.url.query, load, version)
+        response = RawJSONResponse(body)
+        set_etag(response, tag)
+        return response
+
+    return TestClient(app), loads
+
+
+def test_if_none_match_uses_weak_comparison():
+    assert _matches('"a"', '"a"')
+    assert _matches('W/"a"', '"a"')
+    assert _matches('"b", W/"a"', '"a"')
+    assert _matches("*", '"a"')
+    assert not _matches('"b"', '"a"')
+    assert not _matches(None, '"a"')
+
+
+def test_etag_changes_with_version_and_shape():
+    uid = str(uuid.uuid4())
+    before = changes.etag(uid, "/jobs", "limit=10")
+    assert changes.etag(uid, "/jobs", "limit=20") != before
+    assert changes.etag(uid, "/jobs", "limit=10", data_version=7) != before
+    asyncio.run(publish(uid, ("jobs",), "create"))
+    assert changes.etag(uid, "/jobs", "limit=10") != before
+
+
+def test_revalidation_answers_304_until_a_write(db_path):
+    client, loads = _client()
+    uid = str(uuid.uuid4())
+    first = client.get("/jobs", params={"uid": uid})
+    tag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/jobs", params={"uid": uid}, headers={"If-None-Match": tag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == tag
+    assert again.content == b""
+    assert len(loads) == 1
+
+    asyncio.run(publish(uid, ("jobs",), "create"))
+    after = client.get("/jobs", params={"uid": uid}, headers={"If-None-Match": tag})
+    assert after.status_code == 200
+    assert after.headers["etag"] != tag
+    assert len(loads) == 2
+
+
+def test_a_write_on_another_worker_defeats_the_304(db_path):
+    client, loads = _client()
+    uid = str(uuid.uuid4())
+    tag = client.get("/jobs", params={"uid": uid}).headers["etag"]
+    assert client.get("/jobs", params={"uid": uid}, headers={"If-None-Match": tag}).status_code == 304
+
+    # logged in another process's write transaction: nothing is published here
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("insert into change_log (user_id, entity, entity_id, op) values (?, 'job', 'j1', 'upsert')", (uid,))
+    after = client.get("/jobs", params={"uid": uid}, headers={"If-None-Match": tag})
+    assert after.status_code == 200
+    assert after.json() == [{"load": 2}]  # not this process's cached page either
+    assert len(loads) == 2
+
+
+def test_binary_representation_has_its_own_tag(db_path):
+    msgpack = pytest.importorskip("msgpack")
+    client, _ = _client()
+    uid = str(uuid.uuid4())
+    as_json = client.get("/jobs", params={"uid": uid})
+    packed = client.get("/jobs", params={"uid": uid}, headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == as_json.json()
+    assert packed.headers["etag"] == as_json.headers["etag"][:-1] + '-msgpack"'
+
+    # a JSON tag doesn't revalidate the msgpack body, or the other way round
+    crossed = client.get("/jobs", params={"uid": uid},
+                         headers={"Accept": "application/msgpack", "If-None-Match": as_json.headers["etag"]})
+    assert crossed.status_code == 200
+    hit = client.get("/jobs", params={"uid": uid},
+                     headers={"Accept": "application/msgpack", "If-None-Match": packed.headers["etag"]})
+    assert hit.status_code == 304
+    assert "accept" in hit.headers["vary"].lower()
+
+
+def test_a_dropped_version_is_never_reissued():
+    feed = ChangeFeed(maxsize=1)
+    before = feed.etag("a", "/stats")
+    feed.version("b")  # evicts a
+    assert feed.etag("a", "/stats") != before
+    v = feed.version("a")
+    assert asyncio.run(feed.publish("a", ("jobs",), "create")).version > v
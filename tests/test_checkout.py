@@ -0,0 +1,125 @@
+# tests/test_checkout.py
+import asyncio
+import time
+
+import pytest
+import stripe
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import payments
+import supabase_pool
+from app.checkout import CheckoutSessions
+from auth import get_current_user
+from bench.fakes import FAKE_SERVICE_KEY, FakeServices
+
+JOB_ID = "00000000-0000-4000-9000-000000000001"
+
+
+class _Replayed(dict):
+    """A create response Stripe served from its idempotency cache."""
+
+    class last_response:
+        headers = {"Idempotent-Replayed": "true"}
+
+
+def _session(sid, status="open"):
+    return {"id": sid, "url": f"https://pay/{sid}", "status": status, "expires_at": time.time() + 3600}
+
+
+def test_open_session_is_reused_without_stripe():
+    sessions, created = CheckoutSessions(), []
+
+    def create(key):
+        created.append(key)
+        return _session(f"cs_{len(created)}")
+
+    first = asyncio.run(sessions.get_or_create(("job", 100), create))
+    assert asyncio.run(sessions.get_or_create(("job", 100), create)) == first
+    assert len(created) == 1
+    assert asyncio.run(sessions.get_or_create(("job", 200), create))["id"] == "cs_2"
+
+
+def test_known_paid_session_is_replaced():
+    sessions, keys = CheckoutSessions(), []
+
+    def create(key):
+        keys.append(key)
+        return _session("cs_new")
+
+    sess = asyncio.run(sessions.get_or_create(
+        ("job", 100), create, retrieve=lambda sid: _session(sid, "complete"), known_session_id="cs_paid",
+    ))
+    assert sess["id"] == "cs_new"
+    assert keys == [CheckoutSessions.idempotency_key(("job", 100), "cs_paid")]
+
+
+def test_replayed_create_is_checked_before_reuse():
+    # after a restart nothing is known, so the idempotency key is the original one
+    sessions, keys = CheckoutSessions(), []
+
+    def create(key):
+        keys.append(key)
+        return _Replayed(_session("cs_paid")) if len(keys) == 1 else _session("cs_new")
+
+    sess = asyncio.run(sessions.get_or_create(("job", 100), create, retrieve=lambda sid: _session(sid, "complete")))
+    assert sess["id"] == "cs_new"
+    assert keys[1] == CheckoutSessions.idempotency_key(("job", 100), "cs_paid")
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    with FakeServices() as fake:
+        fake.rows["jobs"] = [{"id": JOB_ID, "status": "active_unscheduled", "created_at": "2024-01-01T00:00:00+00:00"}]
+        monkeypatch.setenv("SUPABASE_URL", fake.url)
+        monkeypatch.setenv("SUPABASE_SERVICE_ROLE", FAKE_SERVICE_KEY)
+        monkeypatch.setattr(stripe, "api_key", "sk_test")
+        monkeypatch.setattr(stripe, "api_base", fake.url)
+        monkeypatch.setattr(payments, "_sessions", CheckoutSessions())
+        supabase_pool.close_pool()
+        try:
+            yield fake
+        finally:
+            supabase_pool.close_pool()
+
+
+def _checkout(amount=1500):
+    app = FastAPI()
+    app.include_router(payments.router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": "auth-1"}
+    return TestClient(app).post("/payments/checkout", json={
+        "job_id": JOB_ID, "amount_cents": amount, "customer_email": "payer@example.com",
+        "success_url": "prello://payment-success", "cancel_url": "prello://payment-cancel",
+    })
+
+
+def test_checkout_stores_the_session_on_the_job(fake):
+    first = _checkout().json()
+    assert fake.rows["jobs"][0]["checkout_session_id"] == first["session_id"]
+    payments._sessions = CheckoutSessions()  # a restart, or another worker
+    assert _checkout().json()["session_id"] == first["session_id"]
+
+
+def test_paid_session_is_not_handed_out_after_a_restart(fake):
+    first = _checkout().json()
+    fake.stripe_sessions[first["session_id"]]["status"] = "complete"  # paid; webhook not applied yet
+    payments._sessions = CheckoutSessions()
+
+    again = _checkout().json()
+    assert again["session_id"] != first["session_id"]
+    assert fake.rows["jobs"][0]["checkout_session_id"] == again["session_id"]
+
+
+def test_replayed_paid_session_is_not_handed_out(fake):
+    first = _checkout().json()
+    fake.stripe_sessions[first["session_id"]]["status"] = "complete"
+    fake.rows["jobs"][0].pop("checkout_session_id")  # nothing to look up: Stripe replays the create
+    payments._sessions = CheckoutSessions()
+    assert _checkout().json()["session_id"] != first["session_id"]
+
+
+def test_paid_or_unknown_job_is_refused(fake):
+    fake.rows["jobs"][0]["status"] = "completed_paid"
+    assert _checkout().status_code == 409
+    fake.rows["jobs"].clear()
+    assert _checkout().status_code == 404
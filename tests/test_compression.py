@@ -0,0 +1,124 @@
+# tests/test_compression.py
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, choose, qvalues
+
+BIG = b'{"rows":[' + b",".join(b'{"id":%d,"status":"pending"}' % i for i in range(200)) + b"]}"
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_bytes=1024)
+
+    @app.get("/big")
+    def big():
+        return Response(BIG, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok":true}', media_type="application/json")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b'{"n":%d}\n' % i for i in range(50)]), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: x\n\n" * 200]), media_type="text/event-stream")
+
+    @app.get("/png")
+    def png():
+        return Response(b"\x89PNG" + b"\0" * 4096, media_type="image/png")
+
+    @app.get("/cached")
+    def cached():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 4096)
+
+    return TestClient(app)
+
+
+def test_qvalues():
+    assert qvalues("gzip;q=0.5, br, zstd;q=0") == {"gzip": 0.5, "br": 1.0, "zstd": 0.0}
+    assert qvalues("gzip;q=nope") == {"gzip": 0.0}
+
+
+def test_choose_by_q_then_server_order():
+    assert choose("gzip", ("zstd", "br", "gzip")) == "gzip"
+    assert choose("gzip, br", ("zstd", "br", "gzip")) == "br"
+    assert choose("gzip;q=1, br;q=0.5", ("zstd", "br", "gzip")) == "gzip"
+    assert choose("*", ("zstd", "br", "gzip")) == "zstd"
+    assert choose("*, zstd;q=0", ("zstd", "br", "gzip")) == "br"
+    assert choose("identity", ("zstd", "br", "gzip")) is None
+    assert choose("", ("gzip",)) is None
+
+
+def test_gzip_response_is_varied_and_weakly_tagged():
+    r = _client().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"] == 'W/"v1"'
+    assert int(r.headers["content-length"]) < len(BIG)
+    assert r.content == BIG  # decoded by the client
+
+
+@pytest.mark.parametrize("accept", ["identity", ""])
+def test_identity_response_still_varies(accept):
+    r = _client().get("/big", headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"] == '"v1"'
+
+
+def test_small_bodies_skip_but_vary():
+    r = _client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+
+
+def test_not_modified_matches_the_encoded_representation():
+    r = _client().get("/cached", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 304
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"] == 'W/"v1"'
+    r = _client().get("/cached", headers={"Accept-Encoding": "identity"})
+    assert r.headers["etag"] == '"v1"'
+
+
+def test_streams_are_compressed_per_chunk():
+    r = _client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    assert r.text.count("\n") == 50
+
+
+def test_event_streams_and_binary_types_pass_through():
+    client = _client()
+    for path in ("/events", "/png"):
+        r = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in r.headers
+        assert "vary" not in r.headers
+    assert client.get("/text", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_budget_exhausted_sends_identity(monkeypatch):
+    monkeypatch.setattr(compression.budget, "allow", lambda: False)
+    r = _client().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("enc,module", [("br", "brotli"), ("zstd", "zstandard")])
+def test_optional_encoders(enc, module):
+    pytest.importorskip(module)
+    r = _client().get("/big", headers={"Accept-Encoding": f"gzip;q=0.5, {enc}"})
+    assert r.headers["content-encoding"] == enc
+    assert int(r.headers["content-length"]) < len(BIG)
+    assert r.content == BIG
@@ -0,0 +1,54 @@
+# tests/test_dbpool.py
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.dbpool import TimedQueuePool, engine_kwargs
+
+
+def _engine(monkeypatch, **env):
+    for k, v in {"DB_POOL_SIZE": "5", "DB_POOL_MAX_OVERFLOW": "10", "DB_POOL_MIN_OVERFLOW": "2",
+                 "DB_POOL_ADAPT_INTERVAL": "0", **env}.items():
+        monkeypatch.setenv(k, v)
+    return create_async_engine("sqlite+aiosqlite://", **engine_kwargs())
+
+
+def test_adaptive_pool_starts_at_floor(monkeypatch):
+    pool = _engine(monkeypatch).sync_engine.pool
+    assert isinstance(pool, TimedQueuePool)
+    assert pool.stats()["overflow_bounds"] == [2, 10]
+    assert pool.stats()["overflow_limit"] == 2
+
+
+def test_adaptation_grows_on_waits_and_shrinks_when_idle(monkeypatch):
+    pool = _engine(monkeypatch).sync_engine.pool
+    pool._window_slow = 1
+    pool._adapt()
+    assert pool._max_overflow == 4
+    pool._adapt()  # a window without waits gives one back
+    assert pool._max_overflow == 3
+
+
+def test_bounds_survive_dispose(monkeypatch):
+    engine = _engine(monkeypatch)
+    before = engine.sync_engine.pool
+    before._window_slow = 1
+    before._adapt()
+    before._adapt()
+    before._adapt()  # settle below the ceiling
+    asyncio.run(engine.dispose())
+    after = engine.sync_engine.pool
+    assert after is not before
+    assert after.stats()["overflow_bounds"] == [2, 10]
+    assert after.stats()["overflow_limit"] == 2
+    after._window_slow = 1
+    after._adapt()
+    assert after._max_overflow > 2  # can still grow
+
+
+def test_non_adaptive_keeps_configured_overflow(monkeypatch):
+    engine = _engine(monkeypatch, DB_POOL_ADAPTIVE="0")
+    asyncio.run(engine.dispose())
+    stats = engine.sync_engine.pool.stats()
+    assert stats["adaptive"] is False
+    assert stats["overflow_limit"] == 10
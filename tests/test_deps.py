@@ -0,0 +1,67 @@
+# tests/test_deps.py
+import asyncio
+import sqlite3
+import uuid
+
+from starlette.requests import Request
+
+from app import deps, repo
+
+
+def _get_user(monkeypatch, email):
+    auth_id = str(uuid.uuid4())
+
+    async def auth_user(token):
+        return {"id": auth_id, "email": email[0]}
+
+    monkeypatch.setattr(deps, "_auth_user", auth_user)
+    request = Request({"type": "http", "headers": []})
+    return auth_id, lambda: asyncio.run(deps.get_user(request, "Bearer t"))
+
+
+def _lookups(monkeypatch):
+    calls = []
+    real = repo.get_user_by_auth_id
+
+    async def spy(db, auth_user_id):
+        calls.append(auth_user_id)
+        return await real(db, auth_user_id)
+
+    monkeypatch.setattr(repo, "get_user_by_auth_id", spy)
+    return calls
+
+
+def test_first_request_creates_the_row_then_it_is_cached(db_path, monkeypatch):
+    auth_id, get_user = _get_user(monkeypatch, ["a@example.com"])
+    lookups = _lookups(monkeypatch)
+    row = get_user()
+    assert row["auth_user_id"] == auth_id and row["email"] == "a@example.com"
+    assert get_user() == row
+    assert lookups == [auth_id]
+
+
+def test_changed_auth_email_updates_and_invalidates_the_row(db_path, monkeypatch):
+    email = ["old@example.com"]
+    auth_id, get_user = _get_user(monkeypatch, email)
+    before = get_user()
+
+    email[0] = "new@example.com"  # changed in Supabase Auth
+    after = get_user()
+    assert after["id"] == before["id"]
+    assert after["email"] == "new@example.com"
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("select email from users where auth_user_id = ?", (auth_id,)).fetchone() == (
+            "new@example.com",)
+
+    lookups = _lookups(monkeypatch)
+    assert get_user() == after  # cached again
+    assert lookups == []
+
+
+def test_invalidate_user_forces_a_reread(db_path, monkeypatch):
+    auth_id, get_user = _get_user(monkeypatch, ["a@example.com"])
+    get_user()
+    lookups = _lookups(monkeypatch)
+    deps.invalidate_user(auth_id)
+    get_user()
+    assert lookups == [auth_id]
@@ -0,0 +1,67 @@
+# tests/test_listcache.py
+import asyncio
+import time
+import uuid
+
+from app.changes import publish
+from app.listcache import ListCache, MemoryBackend, list_cache
+
+
+def _get(cache, kind, uid, loads, shape="all"):
+    async def load():
+        loads.append(uid)
+        return b"%d" % len(loads), None
+
+    return asyncio.run(cache.get_or_load(kind, uid, shape, load))[0]
+
+
+def test_serves_until_its_kind_changes():
+    uid, loads = str(uuid.uuid4()), []
+    assert _get(list_cache, "jobs", uid, loads) == b"1"
+    assert _get(list_cache, "jobs", uid, loads) == b"1"
+
+    asyncio.run(publish(uid, ("clients",), "create"))  # another kind: jobs stay cached
+    assert _get(list_cache, "jobs", uid, loads) == b"1"
+    asyncio.run(publish(uid, ("jobs", "clients"), "create"))
+    assert _get(list_cache, "jobs", uid, loads) == b"2"
+
+    assert _get(list_cache, "jobs", uid, loads, shape="pending") == b"3"  # shapes are separate
+    assert _get(list_cache, "jobs", str(uuid.uuid4()), loads) == b"4"  # and so are users
+
+
+def test_page_loaded_across_a_write_is_not_served():
+    cache = ListCache()
+
+    async def run():
+        async def load():
+            await cache.invalidate("jobs", "u")  # the write lands while the query runs
+            return b"stale", None
+
+        await cache.get_or_load("jobs", "u", "all", load)
+
+        async def fresh():
+            return b"fresh", None
+
+        return await cache.get_or_load("jobs", "u", "all", fresh)
+
+    assert asyncio.run(run()) == (b"fresh", None)
+    assert cache.stats()["misses"] == 2
+
+
+def test_generations_are_bounded_and_never_reused():
+    cache = ListCache(MemoryBackend(gen_maxsize=2))
+    loads = []
+    assert _get(cache, "jobs", "a", loads) == b"1"
+    asyncio.run(cache.invalidate("jobs", "b"))
+    asyncio.run(cache.invalidate("jobs", "c"))  # evicts a's generation
+    assert cache.stats()["backend"]["generations"] == 2
+    # a fresh generation, not a's old one: the entry stored under it stays orphaned
+    assert _get(cache, "jobs", "a", loads) == b"2"
+
+
+def test_expired_generation_does_not_resurrect_entries():
+    cache = ListCache(MemoryBackend(gen_ttl=0.05), ttl=60)
+    loads = []
+    assert _get(cache, "jobs", "a", loads) == b"1"
+    time.sleep(0.1)
+    assert _get(cache, "jobs", "a", loads) == b"2"
@@ -0,0 +1,79 @@
+# tests/test_outbox.py
+import asyncio
+import time
+
+from app.outbox import Outbox, OutboxWorker
+
+
+def _outbox(*ids):
+    box = Outbox(":memory:")
+    for i in ids:
+        box.put(i, "checkout.session.completed", {"id": i})
+    return box
+
+
+def _due(box):
+    box._conn.execute("update stripe_events set next_attempt_at = 0 where status = 'pending'")
+
+
+def _row(box, event_id):
+    return box._conn.execute(
+        "select status, attempts, next_attempt_at, last_error from stripe_events where event_id = ?", (event_id,)
+    ).fetchone()
+
+
+def test_duplicate_deliveries_are_dropped():
+    box = _outbox("evt_1")
+    assert box.put("evt_1", "checkout.session.completed", {"id": "evt_1"}) is False
+    assert box.stats() == {"pending": 1}
+
+
+def test_claim_leases_instead_of_deleting():
+    box = _outbox("evt_1", "evt_2")
+    assert [e["id"] for e in box.claim(10)] == ["evt_1", "evt_2"]
+    assert box.claim(10) == []  # leased
+    _due(box)  # the lease ran out: the worker died mid-batch
+    assert [e["attempts"] for e in box.claim(10)] == [2, 2]
+
+
+def test_a_bad_event_does_not_hold_back_its_batch():
+    box = _outbox("evt_1", "evt_bad", "evt_3")
+    applied = []
+
+    async def handler(events):
+        if any(e["id"] == "evt_bad" for e in events):
+            raise RuntimeError("boom")
+        applied.extend(e["id"] for e in events)
+
+    worker = OutboxWorker(box, handler, base_backoff=10)
+    assert asyncio.run(worker.drain_once()) == 3
+    assert applied == ["evt_1", "evt_3"]
+    assert box.stats() == {"done": 2, "pending": 1}
+    status, attempts, _, error = _row(box, "evt_bad")
+    assert (status, attempts, error) == ("pending", 1, "boom")
+    assert worker.stats()["failed_batches"] == 1
+    assert worker.stats()["failed_events"] == 1
+
+
+def test_retries_back_off_then_dead_letter():
+    box = _outbox("evt_bad")
+
+    async def handler(events):
+        raise RuntimeError("still broken")
+
+    worker = OutboxWorker(box, handler, base_backoff=1, max_backoff=3, max_attempts=4)
+    seen = []
+
+    async def drain():
+        for _ in range(4):
+            _due(box)
+            await worker.drain_once()
+            status, _, next_at, _ = _row(box, "evt_bad")
+            seen.append((status, round(next_at - time.time())))
+
+    asyncio.run(drain())
+    assert seen[:3] == [("pending", 1), ("pending", 2), ("pending", 3)]  # doubling, capped
+    assert seen[3][0] == "dead"
+    _due(box)
+    assert box.claim(10) == []  # dead events are never claimed again
+    assert worker.stats()["dead"] == 1
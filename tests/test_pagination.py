@@ -0,0 +1,86 @@
+# tests/test_pagination.py
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import aiter_rows, decode_cursor, encode_cursor, keyset_filter, keyset_sql, split_page
+
+
+def _rows(n):
+    # newest first, like the list queries; the last two have no created_at
+    rows = [{"id": f"{i:04d}", "created_at": f"2024-01-{28 - i:02d}T10:00:00+00:00"} for i in range(n - 2)]
+    return [{"id": "9999", "created_at": None}, {"id": "9998", "created_at": None}] + rows
+
+
+def test_cursor_round_trip():
+    ts = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    token = encode_cursor({"id": "abc", "created_at": ts})
+    assert "=" not in token
+    assert decode_cursor(token) == (ts.isoformat(), "abc")
+    assert decode_cursor(encode_cursor({"id": "abc", "created_at": None})) == (None, "abc")
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", encode_cursor({"id": None, "created_at": "x"})])
+def test_bad_cursor_is_400(token):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(token)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_sql():
+    ts = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    sql, params = keyset_sql(encode_cursor({"id": "abc", "created_at": ts}))
+    assert sql == "(created_at, id) < (:cursor_created_at, :cursor_id)"
+    assert params == {"cursor_created_at": ts, "cursor_id": "abc"}
+
+    sql, params = keyset_sql(encode_cursor({"id": "abc", "created_at": None}))
+    assert "created_at is not null" in sql
+    assert params == {"cursor_id": "abc"}
+
+    with pytest.raises(HTTPException):
+        keyset_sql(encode_cursor({"id": "abc", "created_at": "yesterday"}))
+
+
+def test_keyset_filter_quotes_timestamps():
+    token = encode_cursor({"id": "abc", "created_at": "2024-05-01T12:30:00+00:00"})
+    assert keyset_filter(token) == (
+        'created_at.lt."2024-05-01T12:30:00+00:00",'
+        'and(created_at.eq."2024-05-01T12:30:00+00:00",id.lt."abc")'
+    )
+    assert keyset_filter(encode_cursor({"id": "abc", "created_at": None})) == (
+        'and(created_at.is.null,id.lt."abc"),created_at.not.is.null'
+    )
+
+
+def test_split_page_only_sets_a_cursor_when_more_rows_exist():
+    rows = _rows(5)
+    page, cursor = split_page(rows, 5)
+    assert page == rows and cursor is None
+    page, cursor = split_page(rows, 3)
+    assert page == rows[:3]
+    assert decode_cursor(cursor) == (rows[2]["created_at"], rows[2]["id"])
+
+
+def _after(rows, cursor):
+    """What keyset_sql selects, in (created_at desc nulls first, id desc) order."""
+    if cursor is None:
+        return rows
+    created_at, row_id = decode_cursor(cursor)
+    if created_at is None:
+        return [r for r in rows if (r["created_at"] is None and r["id"] < row_id) or r["created_at"] is not None]
+    return [r for r in rows if r["created_at"] is not None and (r["created_at"], r["id"]) < (created_at, row_id)]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 10])
+def test_pages_walk_every_row_once_across_null_timestamps(page_size):
+    rows = _rows(7)
+
+    async def fetch(cursor, n):
+        return _after(rows, cursor)[:n]
+
+    async def walk():
+        return [r async for r in aiter_rows(fetch, None, page_size)]
+
+    assert asyncio.run(walk()) == rows
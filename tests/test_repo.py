@@ -0,0 +1,73 @@
+# tests/test_repo.py
+import asyncio
+import sqlite3
+
+from app import repo
+from app.db import session_scope
+from app.pagination import split_page
+from bench import sqlite_db
+
+
+def _run(fn):
+    async def go():
+        async with session_scope() as db:
+            out = await fn(db)
+            await db.commit()
+            return out
+
+    return asyncio.run(go())
+
+
+def test_insert_user_returns_the_existing_row_on_conflict(db_path):
+    first = _run(lambda db: repo.insert_user(db, "auth-1", "a@example.com"))
+    again = _run(lambda db: repo.insert_user(db, "auth-1", "other@example.com"))
+    assert again["id"] == first["id"]
+    assert again["email"] == "a@example.com"  # do nothing: the first insert wins
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("select count(*) from users").fetchone() == (1,)
+
+
+def test_mark_paid_by_sessions_reports_old_status_once(db_path):
+    uid = sqlite_db.seed(db_path, "auth-1", clients=1, jobs=3)
+    jobs = _run(lambda db: repo.list_jobs(db, uid))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("update jobs set checkout_session_id = 'cs_1' where id = ?", (jobs[0]["id"],))
+        conn.execute("update jobs set checkout_session_id = 'cs_2', status = 'completed_unpaid' where id = ?",
+                     (jobs[1]["id"],))
+
+    paid = _run(lambda db: repo.mark_paid_by_sessions(db, ["cs_1", "cs_2", "cs_unknown"]))
+    assert {(r["id"], r["old_status"]) for r in paid} == {
+        (jobs[0]["id"], "active_unscheduled"), (jobs[1]["id"], "completed_unpaid"),
+    }
+    assert all(r["user_id"] == uid and r["price_cents"] >= 1000 for r in paid)
+    assert _run(lambda db: repo.mark_paid_by_sessions(db, ["cs_1", "cs_2"])) == []  # a replay changes nothing
+    assert _run(lambda db: repo.mark_paid_by_sessions(db, [])) == []
+    statuses = {j["id"]: j["status"] for j in _run(lambda db: repo.list_jobs(db, uid))}
+    assert statuses[jobs[2]["id"]] == "active_unscheduled"
+
+
+def test_list_jobs_pages_by_keyset(db_path):
+    uid = sqlite_db.seed(db_path, "auth-1", clients=2, jobs=7)
+    everything = _run(lambda db: repo.list_jobs(db, uid))
+    seen, cursor = [], None
+    while True:
+        rows, cursor = split_page(_run(lambda db: repo.list_jobs(db, uid, None, cursor, 3 + 1)), 3)
+        seen += rows
+        if not cursor:
+            break
+    assert [r["id"] for r in seen] == [r["id"] for r in everything]
+    assert len(seen) == 7
+
+
+def test_bulk_inserts_keep_input_order(db_path):
+    uid = sqlite_db.seed(db_path, "auth-1", clients=0, jobs=0)
+    clients = _run(lambda db: repo.insert_clients(db, uid, [{"name": f"C{i}"} for i in range(5)]))
+    assert [c["name"] for c in clients] == [f"C{i}" for i in range(5)]
+    found = _run(lambda db: repo.find_clients_by_names(db, uid, ["C1", "C3", "nope"]))
+    assert sorted(c["name"] for c in found) == ["C1", "C3"]
+
+    jobs = _run(lambda db: repo.insert_jobs(db, uid, [
+        {"client_id": clients[i % 5]["id"], "title": f"J{i}", "price_cents": i, "status": "active_unscheduled"}
+        for i in range(4)
+    ]))
+    assert [j["price_cents"] for j in jobs] == [0, 1, 2, 3]
@@ -0,0 +1,112 @@
+# tests/test_sync.py
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import db, repo
+from app.deps import get_user
+from app.sync import decode_cursor, encode_cursor, router as sync_router
+from bench import sqlite_db
+
+
+def _client(uid):
+    app = FastAPI()
+    app.include_router(sync_router)
+    app.dependency_overrides[get_user] = lambda: {"id": uid}
+    return TestClient(app)
+
+
+def _log(path, uid, *entries):
+    """Append (entity, id, op) entries the way the write paths do."""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "insert into change_log (user_id, entity, entity_id, op) values (?, ?, ?, ?)",
+            [(uid, entity, i, op) for entity, i, op in entries],
+        )
+
+
+def _seeded(path, clients=2, jobs=3):
+    uid = sqlite_db.seed(path, "auth-1", clients=clients, jobs=jobs)
+    with sqlite3.connect(path) as conn:
+        client_ids = [r[0] for r in conn.execute("select id from clients order by name")]
+        job_ids = [r[0] for r in conn.execute("select id from jobs order by title")]
+    _log(path, uid, *[("client", i, "upsert") for i in client_ids], *[("job", i, "upsert") for i in job_ids])
+    return uid, client_ids, job_ids
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(None) == 0
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+@pytest.mark.parametrize("token", ["nope", encode_cursor(1)[1:]])
+def test_bad_cursor_is_400(db_path, token):
+    uid = sqlite_db.seed(db_path, "auth-1", clients=0, jobs=0)
+    r = _client(uid).get("/sync", params={"since": token})
+    assert r.status_code == 400
+    assert r.json() == {"detail": "Invalid cursor"}
+
+
+def test_first_sync_then_only_the_delta(db_path):
+    uid, client_ids, job_ids = _seeded(db_path)
+    client = _client(uid)
+    full = client.get("/sync").json()
+    assert full["has_more"] is False
+    assert [c["id"] for c in full["clients"]] == client_ids
+    assert [j["id"] for j in full["jobs"]] == job_ids
+    assert full["deleted"] == {"jobs": [], "clients": []}
+
+    idle = client.get("/sync", params={"since": full["cursor"]}).json()
+    assert (idle["cursor"], idle["jobs"], idle["clients"]) == (full["cursor"], [], [])
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("update jobs set status = 'completed_paid' where id = ?", (job_ids[1],))
+    _log(db_path, uid, ("job", job_ids[1], "upsert"))
+    delta = client.get("/sync", params={"since": full["cursor"]}).json()
+    assert [(j["id"], j["status"]) for j in delta["jobs"]] == [(job_ids[1], "completed_paid")]
+    assert delta["clients"] == []
+
+
+def test_pages_follow_has_more(db_path):
+    uid, client_ids, job_ids = _seeded(db_path)
+    client, since, seen, pages = _client(uid), None, [], 0
+    while True:
+        page = client.get("/sync", params={"since": since or "", "limit": 2}).json()
+        seen += [c["id"] for c in page["clients"]] + [j["id"] for j in page["jobs"]]
+        since, pages = page["cursor"], pages + 1
+        if not page["has_more"]:
+            break
+    assert pages == 3  # 5 entries, 2 per page
+    assert seen == client_ids + job_ids
+
+
+def test_tombstones_replace_earlier_upserts(db_path):
+    uid, _, job_ids = _seeded(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("delete from jobs where id = ?", (job_ids[0],))
+    _log(db_path, uid, ("job", job_ids[0], "delete"))
+    out = _client(uid).get("/sync").json()
+    assert out["deleted"] == {"jobs": [job_ids[0]], "clients": []}
+    assert [j["id"] for j in out["jobs"]] == job_ids[1:]
+
+
+def test_compact_keeps_the_last_entry_per_row(db_path):
+    uid, _, job_ids = _seeded(db_path)
+    _log(db_path, uid, ("job", job_ids[0], "upsert"), ("job", job_ids[0], "upsert"))
+    before = _client(uid).get("/sync").json()
+
+    async def compact():
+        async with db.session_scope() as session:
+            dropped = await repo.compact_change_log(session)
+            await session.commit()
+        return dropped
+
+    assert asyncio.run(compact()) == 2
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("select count(*) from change_log").fetchone() == (5,)
+    after = _client(uid).get("/sync").json()
+    assert after["cursor"] == before["cursor"]
+    assert sorted(j["id"] for j in after["jobs"]) == sorted(j["id"] for j in before["jobs"])
@@ -0,0 +1,111 @@
+# tests/test_wire.py
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app import wire
+from app.compression import CompressionMiddleware
+from app.wire import WireFormatMiddleware, negotiate
+
+msgpack = pytest.importorskip("msgpack")
+
+JOB_ID = uuid.UUID("12345678-1234-5678-1234-567812345678")
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class JobIn(BaseModel):
+    title: str
+    price_cents: int
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(WireFormatMiddleware)
+    app.add_middleware(CompressionMiddleware, min_bytes=1024)  # outside, as in app/main.py
+
+    @app.get("/jobs")
+    def jobs():
+        return [{"id": str(JOB_ID), "created_at": CREATED.isoformat(), "n": i} for i in range(3)]
+
+    @app.post("/jobs")
+    def create(jobs: List[JobIn]):
+        return {"titles": [j.title for j in jobs], "total": sum(j.price_cents for j in jobs)}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b'{"n":1}\n', b'{"n":2}\n']), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def _vary(r):
+    return {v.strip() for v in r.headers.get("vary", "").split(",") if v.strip()}
+
+
+def test_negotiate():
+    mp = wire.FORMATS["application/msgpack"]
+    assert negotiate("") is None
+    assert negotiate("*/*") is None
+    assert negotiate("application/json") is None
+    assert negotiate("application/msgpack") is mp
+    assert negotiate("application/x-msgpack") is mp
+    assert negotiate("application/msgpack, application/json;q=0.5") is mp
+    assert negotiate("application/json, application/msgpack;q=0.5") is None
+    assert negotiate("application/msgpack;q=0") is None
+
+
+def test_json_is_the_default_and_varies_on_accept():
+    r = _client().get("/jobs")
+    assert r.headers["content-type"] == "application/json"
+    assert r.json()[0]["id"] == str(JOB_ID)
+    assert _vary(r) == {"Accept", "Accept-Encoding"}  # merged with the compression layer's
+
+
+def test_json_response_transcoded_to_msgpack():
+    r = _client().get("/jobs", headers={"Accept": "application/msgpack"})
+    assert r.headers["content-type"] == "application/msgpack"
+    assert int(r.headers["content-length"]) == len(r.content)
+    assert msgpack.unpackb(r.content) == _client().get("/jobs").json()
+    assert "Accept" in _vary(r)
+
+
+def test_msgpack_request_body_validates_like_json():
+    body = msgpack.packb([{"title": "a", "price_cents": 100}, {"title": "b", "price_cents": 250}])
+    r = _client().post("/jobs", content=body, headers={"Content-Type": "application/msgpack"})
+    assert r.status_code == 200
+    assert r.json() == {"titles": ["a", "b"], "total": 350}
+
+
+def test_malformed_body_is_400_in_the_asked_format():
+    r = _client().post("/jobs", content=b"\xc1", headers={
+        "Content-Type": "application/msgpack", "Accept": "application/msgpack",
+    })
+    assert r.status_code == 400
+    assert msgpack.unpackb(r.content) == {"detail": "Malformed application/msgpack body"}
+
+
+def test_streams_are_left_alone():
+    r = _client().get("/stream", headers={"Accept": "application/msgpack"})
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert r.text == '{"n":1}\n{"n":2}\n'
+    assert "Accept" not in _vary(r)
+
+
+def test_native_types_on_the_wire():
+    packed = wire.FORMATS["application/msgpack"].pack({"id": JOB_ID, "at": CREATED})
+    assert msgpack.unpackb(packed, timestamp=3) == {"id": JOB_ID.bytes, "at": CREATED}
+    # and back to JSON as strings when a binary body is handed to a route
+    assert wire.from_json(wire.to_json({"id": JOB_ID.bytes})) == {"id": str(JOB_ID)}
+
+
+def test_cbor():
+    cbor2 = pytest.importorskip("cbor2")
+    r = _client().get("/jobs", headers={"Accept": "application/cbor"})
+    assert r.headers["content-type"] == "application/cbor"
+    assert cbor2.loads(r.content)[2]["n"] == 2